@@ -2,14 +2,31 @@ import camera_kit.view.user as user
 from camera_kit.utilities import converter
 from camera_kit.view.display import Display
 from camera_kit.view.drawing import Drawing
+from camera_kit.view.depth_colorizer import DepthColorizer
 import camera_kit.utilities.base_logger as logger
+from camera_kit.camera.frameset import FrameSet
 from camera_kit.camera.camera_base import CameraBase
-from camera_kit.core import camera_manager, camera_factory
+from camera_kit.camera.camera_pool import CameraPool
+from camera_kit.camera.camera_feed import CameraFeed
+from camera_kit.camera.watchdog import CaptureMetrics, CaptureWatchdog, StaleFrameError
+from camera_kit.camera.latency import DeviceClock, LatencyTracer
+from camera_kit.core import camera_manager, camera_factory, camera_pool
 from camera_kit.calibration.camera_calibration import (
     CameraCalibration,
     ChessboardDescription,
 )
+from camera_kit.calibration.live_calibration import LiveCalibration
+from camera_kit.calibration.calibration_report import CalibrationReport
+from camera_kit.calibration.keyframe_selection import KeyframeSelector
 from camera_kit.detector.detector_base import DetectorBase
+from camera_kit.detector.aruco_detector import ArucoDetector
+from camera_kit.detector.pose_filter import PoseFilter, PoseTracker
+from camera_kit.detector import pose_log
+from camera_kit.detector.pose_log import PoseLogWriter
+from camera_kit.detector import detector_farm
+from camera_kit.detector.detector_farm import DetectionResult, DetectorFarm
+from camera_kit.pipeline.stages import Stage
+from camera_kit.pipeline.pipeline import Pipeline, StageStats
 
 
 __all__ = [
@@ -19,17 +36,41 @@ __all__ = [
     "user",
     "camera_manager",
     "camera_factory",
+    "camera_pool",
 
     # classes
     "Display",
     "Drawing",
+    "DepthColorizer",
     "CameraBase",
+    "CameraPool",
+    "CameraFeed",
+    "FrameSet",
+    "CaptureMetrics",
+    "CaptureWatchdog",
+    "StaleFrameError",
+    "DeviceClock",
+    "LatencyTracer",
     "CameraCalibration",
     "ChessboardDescription",
+    "KeyframeSelector",
+    "LiveCalibration",
+    "CalibrationReport",
+    "ArucoDetector",
+    "PoseFilter",
+    "PoseTracker",
+    "PoseLogWriter",
+    "DetectorFarm",
+    "DetectionResult",
+    "Pipeline",
+    "StageStats",
 
     # interfaces
     "DetectorBase",
+    "Stage",
 
     # modules
     "converter",
+    "detector_farm",
+    "pose_log",
 ]
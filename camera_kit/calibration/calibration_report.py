@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+# global
+import logging
+import cv2 as cv
+import numpy as np
+from pathlib import Path
+
+# local
+from camera_kit.utilities.projection import project_points_batch
+
+# typing
+from typing import Any, Sequence
+from numpy import typing as npt
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class CalibrationReport:
+    """ Result of a camera calibration with per-view and per-corner reprojection errors
+
+        rms:           Root-mean-square reprojection error over all used views [px]
+        view_names:    Names of the used views
+        view_errors:   Root-mean-square reprojection error of each used view [px]
+        corner_errors: Reprojection error of each corner of each used view [px]. Shape (N, M)
+        rejected:      Names of the views which were rejected as outliers
+    """
+    file_name = 'calibration_report.toml'
+
+    def __init__(self,
+                 intrinsic: npt.NDArray[np.float64],
+                 distortion: npt.NDArray[np.float64],
+                 r_vecs: npt.NDArray[np.float64],
+                 t_vecs: npt.NDArray[np.float64],
+                 view_names: Sequence[str],
+                 corner_errors: npt.NDArray[np.float64],
+                 rejected: Sequence[str] = ()):
+        self.intrinsic = intrinsic
+        self.distortion = distortion
+        self.r_vecs = r_vecs
+        self.t_vecs = t_vecs
+        self.view_names = list(view_names)
+        self.corner_errors = corner_errors
+        self.view_errors: npt.NDArray[np.float64] = np.sqrt(np.mean(corner_errors ** 2, axis=1))
+        self.rms = float(np.sqrt(np.mean(corner_errors ** 2))) if corner_errors.size else float('nan')
+        self.rejected = list(rejected)
+
+    @staticmethod
+    def reprojection_errors(obj_points: npt.NDArray[np.float32],
+                            img_points: Sequence[npt.NDArray[np.float32]],
+                            r_vecs: npt.ArrayLike,
+                            t_vecs: npt.ArrayLike,
+                            intrinsic: npt.NDArray[np.float64],
+                            distortion: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        """ Compute the reprojection error of every corner of every view in one vectorized projection
+
+        Args:
+            obj_points: Object points shared by all views. Shape (M, 3)
+            img_points: Detected image points of each view. Shape (M, 1, 2) each
+            r_vecs:     Rotation vector of each view
+            t_vecs:     Translation vector of each view
+            intrinsic:  Intrinsic camera matrix
+            distortion: Distortion parameters
+
+        Returns:
+            Euclidean corner errors in pixels with shape (N, M)
+        """
+        if len(img_points) == 0:
+            return np.zeros((0, len(obj_points)))
+        projected = project_points_batch(obj_points, r_vecs, t_vecs, intrinsic, distortion)
+        detected = np.stack([np.reshape(pts, (-1, 2)) for pts in img_points]).astype(np.float64)
+        return np.linalg.norm(projected - detected, axis=-1)  # type: ignore[no-any-return]
+
+    @staticmethod
+    def calibrate(obj_points: npt.NDArray[np.float32],
+                  img_points: Sequence[npt.NDArray[np.float32]],
+                  frame_size: tuple[int, int],
+                  view_names: Sequence[str],
+                  outlier_factor: float = 3.0,
+                  min_outlier_error: float = 1.0,
+                  max_iterations: int = 3,
+                  min_views: int = 5) -> CalibrationReport:
+        """ Run the camera calibration and iteratively drop outlier views. A view counts as outlier if its error is
+        above outlier_factor times the median view error and above min_outlier_error.
+
+        Args:
+            obj_points:        Object points shared by all views. Shape (M, 3)
+            img_points:        Detected image points of each view
+            frame_size:        Image size in pixels
+            view_names:        Name of each view, e.g. the image file name
+            outlier_factor:    Factor of the median view error above which views are rejected. Zero disables rejection
+            min_outlier_error: Minimal view error [px] for a view to be rejected
+            max_iterations:    Maximal number of rejection and re-solve iterations
+            min_views:         Views are only rejected as long as at least this number of views remains
+
+        Returns:
+            The calibration report
+        """
+        names = list(view_names)
+        points = list(img_points)
+        rejected: list[str] = []
+        for it in range(max_iterations + 1):
+            _, mtx, dist, r_vecs, t_vecs = cv.calibrateCamera(
+                [obj_points] * len(points), points, frame_size, None, None)
+            r_arr = np.reshape(np.asarray(r_vecs, dtype=np.float64), (-1, 3))
+            t_arr = np.reshape(np.asarray(t_vecs, dtype=np.float64), (-1, 3))
+            errors = CalibrationReport.reprojection_errors(obj_points, points, r_arr, t_arr, mtx, dist)
+            report = CalibrationReport(mtx, dist, r_arr, t_arr, names, errors, rejected)
+            if outlier_factor <= 0.0 or it == max_iterations:
+                break
+            threshold = max(outlier_factor * float(np.median(report.view_errors)), min_outlier_error)
+            outliers = report.view_errors > threshold
+            n_keep = int(np.count_nonzero(~outliers))
+            if not np.any(outliers) or n_keep < min_views:
+                break
+            LOGGER.debug(f"Reject {len(outliers) - n_keep} outlier views with error above {threshold:.3f} px")
+            rejected += [n for n, o in zip(names, outliers) if o]
+            names = [n for n, o in zip(names, outliers) if not o]
+            points = [p for p, o in zip(points, outliers) if not o]
+        return report
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            'rms': self.rms,
+            'intrinsic': self.intrinsic.tolist(),
+            'distortion': np.ravel(self.distortion).tolist(),
+            'rejected': self.rejected,
+            'views': [
+                {
+                    'name': name,
+                    'rms': float(self.view_errors[i]),
+                    'max': float(np.max(self.corner_errors[i])),
+                    'r_vec': self.r_vecs[i].tolist(),
+                    't_vec': self.t_vecs[i].tolist(),
+                }
+                for i, name in enumerate(self.view_names)
+            ],
+        }
+
+    def save(self, dir_path: Path | str) -> Path:
+        """ Save the report as calibration_report.toml
+
+        Args:
+            dir_path: Directory path, usually the directory of coefficients.toml
+
+        Returns:
+            File path of the report
+        """
+        import tomli_w
+        dp = Path(dir_path)
+        dp.mkdir(parents=True, exist_ok=True)
+        fp = dp.joinpath(self.file_name)
+        with fp.open(mode='wb') as f:
+            tomli_w.dump(self.to_dict(), f)
+        LOGGER.debug(f"Save calibration report in folder {str(dp)}")
+        return fp
@@ -8,13 +8,19 @@ import logging
 
 import cv2 as cv
 import numpy as np
-from tqdm import tqdm
 from pathlib import Path
 
 # local
 from camera_kit.camera import CameraCoefficient
 import camera_kit.view.user as user_signal
+from camera_kit.view.drawing import Drawing
 from camera_kit.camera.camera_base import CameraBase
+from camera_kit.calibration.live_calibration import LiveCalibration
+from camera_kit.calibration.calibration_report import CalibrationReport
+from camera_kit.calibration.keyframe_selection import KeyframeSelector
+
+# typing
+from numpy import typing as npt
 
 
 LOGGER = logging.getLogger(__name__)
@@ -39,6 +45,16 @@ class ChessboardDescription:
         self.field_size_m = chessboard_size_mm / 1000
         self.field_size_mm = chessboard_size_mm
 
+    def object_points(self) -> npt.NDArray[np.float32]:
+        """ Get the chessboard corner positions in board coordinates
+
+        Returns:
+            Corner points in [mm] like (0,0,0), (1,0,0), (2,0,0) ....,(6,5,0) times the field size
+        """
+        objp = np.zeros((self.n_rows * self.n_cols, 3), np.float32)
+        objp[:, :2] = np.mgrid[0:self.n_rows, 0:self.n_cols].T.reshape(-1, 2)
+        return objp * np.float32(self.field_size_mm)  # type: ignore[no-any-return]
+
 
 class CameraCalibration:
     """ Calibration class to find intrinsic and extrinsic values of a camera object """
@@ -46,12 +62,18 @@ class CameraCalibration:
     _find_corner_criteria = (cv.TERM_CRITERIA_EPS + cv.TERM_CRITERIA_MAX_ITER, 30, 0.001)
 
     @staticmethod
-    def record_images(camera: CameraBase, dir_path: str = "") -> None:
+    def record_images(camera: CameraBase,
+                      dir_path: str = "",
+                      board: ChessboardDescription | None = None,
+                      selector: KeyframeSelector | None = None) -> None:
         """ Function to recording camera calibration images
 
         Args:
             camera:   Camera object
             dir_path: Optional a path to the directory where the images should be stored.
+            board:    Optional chessboard object. If given, images are recorded automatically until the coverage
+                      targets are reached
+            selector: Optional keyframe selector for automatic recording with non-default settings
 
         """
         # Create target directory
@@ -62,6 +84,12 @@ class CameraCalibration:
         if not camera.alive:
             camera.start()
 
+        if selector is None and board is not None:
+            selector = KeyframeSelector(board)
+        if selector is not None:
+            CameraCalibration._record_keyframes(camera, target_dir, selector)
+            return
+
         file_count = 1
         LOGGER.info(f"Type 'S' to store a new recording. Type 'Q' or 'ESC' to finish recording.")
         while True:
@@ -80,27 +108,162 @@ class CameraCalibration:
                 break
 
     @staticmethod
-    def find_coeffs(camera: CameraBase, board: ChessboardDescription, dir_path: str = "", display: bool = False
-                    ) -> CameraCoefficient:
+    def _record_keyframes(camera: CameraBase, target_dir: Path, selector: KeyframeSelector) -> None:
+        """ Helper function to record calibration images automatically
+
+        Args:
+            camera:     Camera object
+            target_dir: Directory where the images are stored
+            selector:   Keyframe selector which decides about new recordings
+        """
+        LOGGER.info(f"Move the chessboard slowly in front of the camera. Type 'Q' or 'ESC' to finish recording.")
+        while not selector.done:
+            img = camera.get_color_frame()
+            is_keyframe, corners = selector.evaluate(img)
+            if is_keyframe:
+                file_path = target_dir.joinpath(f"calib_img_{selector.n_keyframes:02}.png")
+                cv.imwrite(os.fspath(file_path), img)
+                LOGGER.info(f"Record new image with id {selector.n_keyframes:02} "
+                            f"(coverage {100 * selector.coverage:.0f}%)")
+                LOGGER.debug(f"Image recording path: {file_path}")
+            preview = img.copy()
+            if corners is not None:
+                cv.drawChessboardCorners(preview, selector.board.board_size, corners, True)
+            preview = Drawing.add_text(
+                preview, f"images: {selector.n_keyframes}  coverage: {100 * selector.coverage:.0f}%", (10, 10))
+            camera.render(preview)
+            if user_signal.stop():
+                LOGGER.info("The recording process is terminated by the user.")
+                break
+        else:
+            LOGGER.info(f"Coverage targets reached with {selector.n_keyframes} images.")
+        LOGGER.info(f"Recordings can be found under '{target_dir}'")
+
+    @staticmethod
+    def calibrate_live(camera: CameraBase,
+                       board: ChessboardDescription,
+                       dir_path: str = "",
+                       selector: KeyframeSelector | None = None,
+                       stability_target: float = 0.002) -> CameraCoefficient:
+        """ Method to record calibration images and solve the camera coefficients at the same time. The preview shows
+        the current reprojection error and how much the coefficients still change.
+
+        Args:
+            camera:           The camera object
+            board:            A Chessboard object
+            dir_path:         Optional a path to the directory where the calibration images should be stored.
+            selector:         Optional keyframe selector with non-default settings
+            stability_target: Relative change of the intrinsic values below which the calibration counts as converged
+
+        Returns:
+            The camera coefficients. Raises a RuntimeError if the recording ended with too few views for a solution
+        """
+        target_dir = Path(dir_path) if dir_path else camera.cam_info_dir.joinpath('calibration', 'imgs')
+        shutil.rmtree(target_dir, ignore_errors=True)
+        target_dir.mkdir(parents=True)
+
+        if not camera.alive:
+            camera.start()
+
+        selector = KeyframeSelector(board) if selector is None else selector
+        live = LiveCalibration(board, camera.frame_size)
+        live.start()
+        LOGGER.info(f"Move the chessboard slowly in front of the camera. Type 'Q' or 'ESC' to finish recording.")
+        try:
+            while True:
+                img = camera.get_color_frame()
+                if selector.done:
+                    # The selection is complete. Corners are only searched for the preview
+                    is_keyframe = False
+                    corners = selector.find_corners(cv.cvtColor(img, cv.COLOR_BGR2GRAY))
+                else:
+                    is_keyframe, corners = selector.evaluate(img)
+                if is_keyframe and corners is not None:
+                    gray = cv.cvtColor(img, cv.COLOR_BGR2GRAY)
+                    corners = cv.cornerSubPix(
+                        gray, corners, (11, 11), (-1, -1), CameraCalibration._find_corner_criteria)
+                    live.add_view(corners)
+                    file_path = target_dir.joinpath(f"calib_img_{selector.n_keyframes:02}.png")
+                    cv.imwrite(os.fspath(file_path), img)
+                    LOGGER.debug(f"Image recording path: {file_path}")
+                preview = img.copy()
+                if corners is not None:
+                    cv.drawChessboardCorners(preview, board.board_size, corners, True)
+                rms, stability = live.rms, live.stability
+                preview = Drawing.add_text(
+                    preview, f"views: {live.n_solved_views}/{live.n_views}  rms: {rms:.3f} px  "
+                             f"stability: {100 * stability:.2f}%", (10, 10))
+                camera.render(preview)
+                if user_signal.stop():
+                    LOGGER.info("The recording process is terminated by the user.")
+                    break
+                if selector.done and (live.n_solved_views == live.n_views or live.n_views < live.min_views):
+                    # No more views are added, so the solution doesn't change anymore
+                    if stability < stability_target:
+                        LOGGER.info(f"Calibration converged with {live.n_views} views.")
+                    else:
+                        LOGGER.warning(f"Keyframe selection is done, but the calibration didn't converge. Relative "
+                                       f"change of the last solution: {100 * stability:.2f}%")
+                    break
+        finally:
+            live.stop()
+        # Make sure the final solution includes all views
+        if live.n_solved_views != live.n_views:
+            live.solve()
+        if live.n_solved_views < live.min_views:
+            LOGGER.error(f"Calibration not successful. Recorded {live.n_views} views, {live.min_views} are required")
+            raise RuntimeError(f"Not enough views to solve the camera coefficients ({live.n_views}/{live.min_views})")
+        LOGGER.info(f"Re-projection error: {live.rms:.3f} px")
+        LOGGER.info(f"Recordings can be found under '{target_dir}'")
+        return live.coefficients(camera.name)
+
+    @staticmethod
+    def find_coeffs(camera: CameraBase, board: ChessboardDescription, dir_path: str = "", display: bool = False,
+                    outlier_factor: float | None = None, report_dir: str = "") -> CameraCoefficient:
         """ Method to find intrinsic and distortion camera parameters
 
         Args:
-            camera:   The camera object
-            board:    A Chessboard object
-            dir_path: Optional a path to the directory where the calibration images are stored.
-            display:  Option to show calibration results
+            camera:         The camera object
+            board:          A Chessboard object
+            dir_path:       Optional a path to the directory where the calibration images are stored.
+            display:        Option to show calibration results
+            outlier_factor: Optional factor of the median view error. Views with a larger error are rejected.
+                            Default is to use all views
+            report_dir:     Optional a path to the directory where the calibration report should be stored.
 
         Returns:
             The camera coefficients
         """
+        cc, report = CameraCalibration.find_coeffs_report(camera, board, dir_path, display, outlier_factor)
+        if report is not None and report_dir:
+            report.save(report_dir)
+        return cc
+
+    @staticmethod
+    def find_coeffs_report(camera: CameraBase,
+                           board: ChessboardDescription,
+                           dir_path: str = "",
+                           display: bool = False,
+                           outlier_factor: float | None = None) -> tuple[CameraCoefficient, CalibrationReport | None]:
+        """ Method to find intrinsic and distortion camera parameters together with the calibration report
+
+        Args:
+            camera:         The camera object
+            board:          A Chessboard object
+            dir_path:       Optional a path to the directory where the calibration images are stored.
+            display:        Option to show calibration results
+            outlier_factor: Optional factor of the median view error. Views with a larger error are rejected.
+                            Default is to use all views
+
+        Returns:
+            (The camera coefficients; The calibration report or None if the calibration was not successful)
+        """
         # Prepare object points, like (0,0,0), (1,0,0), (2,0,0) ....,(6,5,0)
-        objp = np.zeros((board.n_rows * board.n_cols, 3), np.float32)
-        objp[:, :2] = np.mgrid[0:board.n_rows, 0:board.n_cols].T.reshape(-1, 2)
-        objp = objp * board.field_size_mm
+        objp = board.object_points()
 
-        # Arrays to store object points and image points from all the images.
-        obj_points = []  # 3d point in real world space
+        # Arrays to store image points and names of all usable images.
         img_points = []  # 2d points in image plane.
+        view_names = []
 
         # Get the directory path to the calibration images
         dp = Path(dir_path) if dir_path else camera.cam_info_dir.joinpath('calibration', 'imgs')
@@ -108,9 +271,11 @@ class CameraCalibration:
             raise NotADirectoryError(f"Folder with path {dp} not found.")
 
         # Read calibration images and find chessboard corners
-        img_paths = list(dp.glob("*.png"))
+        img_paths = sorted(dp.glob("*.png"))
         n_imgs = len(img_paths)
+        report: CalibrationReport | None = None
         if n_imgs > 0:
+            from tqdm import tqdm
             LOGGER.info(f"Using {n_imgs} images to find camera coefficients.")
             usable_imgs = 0
             for i in tqdm(range(n_imgs), ascii=True, ncols=99):
@@ -120,9 +285,9 @@ class CameraCalibration:
                 # Find chessboard corners
                 ret, corners = cv.findChessboardCorners(gray, board.board_size, CameraCalibration._find_chessboard_flags)
                 if ret:
-                    obj_points.append(objp)
                     corners = cv.cornerSubPix(gray, corners, (11, 11), (-1, -1), CameraCalibration._find_corner_criteria)
                     img_points.append(corners)
+                    view_names.append(img_paths[i].name)
                     usable_imgs += 1
                     if display:
                         # Draw and display the corners
@@ -134,26 +299,24 @@ class CameraCalibration:
                 # ########################### #
                 # ####### CALIBRATION ####### #
                 # ########################### #
-                rep_err, camera_mtx, dist_coeffs, r_vecs, t_vecs = cv.calibrateCamera(
-                    obj_points, img_points, camera.frame_size, None, None
-                )
+                report = CalibrationReport.calibrate(
+                    objp, img_points, camera.frame_size, view_names, outlier_factor=outlier_factor or 0.0)
 
                 LOGGER.debug('\nCalibration result:')
-                LOGGER.debug('\nRe-projection error:\n%s', rep_err)
-                LOGGER.debug('\nCamera intrinsic coefficients:\n%s', camera_mtx)
-                LOGGER.debug('\nDistortion coefficients:\n%s', dist_coeffs.tolist())
-                LOGGER.debug('\nRotation vectors:')
-                for r_v in [v.tolist() for v in r_vecs]:
-                    LOGGER.debug(r_v)
-                LOGGER.debug('\nTranslation vectors:')
-                for t_v in [v.tolist() for v in t_vecs]:
-                    LOGGER.debug(t_v)
+                LOGGER.debug('\nRe-projection error:\n%s', report.rms)
+                LOGGER.debug('\nCamera intrinsic coefficients:\n%s', report.intrinsic)
+                LOGGER.debug('\nDistortion coefficients:\n%s', report.distortion.tolist())
+                LOGGER.debug('\nRe-projection error per view:')
+                for name, err in zip(report.view_names, report.view_errors):
+                    LOGGER.debug(f"{name}: {err:.3f}")
+                if report.rejected:
+                    LOGGER.info(f"Rejected {len(report.rejected)} outlier images: {report.rejected}")
 
                 # Store camera coefficients
                 cc = CameraCoefficient(camera.name)
-                cc.intrinsic = camera_mtx
-                cc.distortion = dist_coeffs
-                LOGGER.info(f"Calibration successfully")
+                cc.intrinsic = report.intrinsic
+                cc.distortion = report.distortion
+                LOGGER.info(f"Calibration successfully. Re-projection error: {report.rms:.3f} px")
             else:
                 cc = CameraCoefficient(camera.name)
                 LOGGER.warning(f"Could not find chessboard corners in the records. Calibration not successfully")
@@ -161,4 +324,4 @@ class CameraCalibration:
             LOGGER.warning(f"Not enough image records to run calibration")
             cc = CameraCoefficient(camera.name)
 
-        return cc
+        return cc, report
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+# global
+import logging
+import cv2 as cv
+import numpy as np
+
+# typing
+from typing import TYPE_CHECKING
+from numpy import typing as npt
+if TYPE_CHECKING:
+    from camera_kit.calibration.camera_calibration import ChessboardDescription
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class KeyframeSelector:
+    """ Helper class to select calibration images automatically from a live stream
+
+        A frame is accepted as keyframe if
+        - the chessboard is found in a downscaled copy of the frame
+        - the board region is sharp enough (variance of the Laplacian)
+        - the board covers new image regions or its pose differs enough from all stored keyframes
+    """
+    _find_chessboard_flags = cv.CALIB_CB_ADAPTIVE_THRESH + cv.CALIB_CB_FAST_CHECK + cv.CALIB_CB_NORMALIZE_IMAGE
+
+    def __init__(self,
+                 board: ChessboardDescription,
+                 check_width: int = 480,
+                 blur_threshold: float = 100.0,
+                 min_pose_diff: float = 0.05,
+                 grid_size: tuple[int, int] = (6, 4),
+                 coverage_target: float = 0.85,
+                 min_images: int = 15,
+                 max_images: int = 60):
+        """ Keyframe selector initialization
+
+        Args:
+            board:           A chessboard object
+            check_width:     Image width in pixels used for the board detection
+            blur_threshold:  Minimal variance of the Laplacian inside the board region
+            min_pose_diff:   Minimal mean displacement of the outer board corners to all stored keyframes. The value
+                             is relative to the image diagonal
+            grid_size:       Number of image cells (columns, rows) used to measure the image coverage
+            coverage_target: Fraction of image cells which have to be covered by board corners
+            min_images:      Minimal number of keyframes before the selection is done
+            max_images:      Maximal number of keyframes
+        """
+        self.board = board
+        self.check_width = check_width
+        self.blur_threshold = blur_threshold
+        self.min_pose_diff = min_pose_diff
+        self.grid_size = grid_size
+        self.coverage_target = coverage_target
+        self.min_images = min_images
+        self.max_images = max_images
+        self.coverage_grid = np.zeros((grid_size[1], grid_size[0]), dtype=bool)
+        self._outer_corners: list[npt.NDArray[np.float64]] = []
+
+    @property
+    def n_keyframes(self) -> int:
+        return len(self._outer_corners)
+
+    @property
+    def coverage(self) -> float:
+        """ Fraction of image cells covered by board corners of the stored keyframes """
+        return float(np.mean(self.coverage_grid))
+
+    @property
+    def done(self) -> bool:
+        """ True if the coverage target and the minimal number of keyframes are reached """
+        if self.n_keyframes >= self.max_images:
+            return True
+        return self.n_keyframes >= self.min_images and self.coverage >= self.coverage_target
+
+    def find_corners(self, gray: npt.NDArray[np.uint8]) -> npt.NDArray[np.float32] | None:
+        """ Cheap chessboard detection on a downscaled copy of the image
+
+        Args:
+            gray: Gray scale image
+
+        Returns:
+            Chessboard corners in pixel coordinates of the original image or None if the board was not found
+        """
+        height, width = gray.shape[:2]
+        scale = min(1.0, self.check_width / width)
+        small = cv.resize(gray, None, fx=scale, fy=scale, interpolation=cv.INTER_AREA) if scale < 1.0 else gray
+        ret, corners = cv.findChessboardCorners(small, self.board.board_size, self._find_chessboard_flags)
+        if not ret:
+            return None
+        return (corners / scale).astype(np.float32)  # type: ignore[no-any-return]
+
+    def sharpness(self, gray: npt.NDArray[np.uint8], corners: npt.NDArray[np.float32]) -> float:
+        """ Variance of the Laplacian inside the bounding box of the board
+
+        Args:
+            gray:    Gray scale image
+            corners: Chessboard corners
+
+        Returns:
+            Sharpness measure. Small values indicate blurry images
+        """
+        x, y, w, h = cv.boundingRect(corners)
+        roi = gray[max(y, 0):y + h, max(x, 0):x + w]
+        if roi.size == 0:
+            return 0.0
+        return float(cv.Laplacian(roi, cv.CV_64F).var())
+
+    def _outer(self, corners: npt.NDArray[np.float32], diagonal: float) -> npt.NDArray[np.float64]:
+        pts = corners.reshape(self.board.n_cols, self.board.n_rows, 2)
+        return np.array([pts[0, 0], pts[0, -1], pts[-1, -1], pts[-1, 0]], dtype=np.float64) / diagonal
+
+    def _cells(self, corners: npt.NDArray[np.float32], frame_size: tuple[int, int]) -> npt.NDArray[np.bool_]:
+        cells = np.zeros_like(self.coverage_grid)
+        pts = corners.reshape(-1, 2)
+        col = np.clip((pts[:, 0] / frame_size[0] * self.grid_size[0]).astype(int), 0, self.grid_size[0] - 1)
+        row = np.clip((pts[:, 1] / frame_size[1] * self.grid_size[1]).astype(int), 0, self.grid_size[1] - 1)
+        cells[row, col] = True
+        return cells
+
+    def evaluate(self, img: npt.NDArray[np.uint8]) -> tuple[bool, npt.NDArray[np.float32] | None]:
+        """ Check if the image is a new keyframe. Accepted frames are added to the selection.
+
+        Args:
+            img: Color image
+
+        Returns:
+            (True if the image is a new keyframe; Chessboard corners or None if the board was not found)
+        """
+        gray = cv.cvtColor(img, cv.COLOR_BGR2GRAY)
+        corners = self.find_corners(gray)
+        if corners is None:
+            return False, None
+        if self.sharpness(gray, corners) < self.blur_threshold:
+            return False, corners
+        height, width = gray.shape[:2]
+        outer = self._outer(corners, float(np.hypot(width, height)))
+        cells = self._cells(corners, (width, height))
+        new_cells = bool(np.any(cells & ~self.coverage_grid))
+        if self._outer_corners:
+            diffs = np.linalg.norm(np.stack(self._outer_corners) - outer, axis=-1).mean(axis=-1)
+            new_pose = bool(np.min(diffs) >= self.min_pose_diff)
+        else:
+            new_pose = True
+        if not (new_cells or new_pose):
+            return False, corners
+        self._outer_corners.append(outer)
+        self.coverage_grid |= cells
+        LOGGER.debug(f"Accept keyframe {self.n_keyframes} with coverage {100 * self.coverage:.0f}%")
+        return True, corners
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+# global
+import logging
+import cv2 as cv
+import numpy as np
+from threading import Event, Lock, Thread
+
+# local
+from camera_kit.camera import CameraCoefficient
+
+# typing
+from typing import TYPE_CHECKING
+from numpy import typing as npt
+if TYPE_CHECKING:
+    from camera_kit.calibration.camera_calibration import ChessboardDescription
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class LiveCalibration:
+    """ Online camera calibration. Chessboard views are collected in a running set and a background worker
+        re-solves the camera coefficients whenever new views arrive.
+
+        The first solution and every n-th solution is a full calibration. In between, the solver is seeded with the
+        previous coefficients and runs with a reduced number of iterations.
+    """
+    _full_criteria = (cv.TERM_CRITERIA_EPS + cv.TERM_CRITERIA_MAX_ITER, 30, 1e-6)
+    _refine_criteria = (cv.TERM_CRITERIA_EPS + cv.TERM_CRITERIA_MAX_ITER, 5, 1e-4)
+
+    def __init__(self,
+                 board: ChessboardDescription,
+                 frame_size: tuple[int, int],
+                 min_views: int = 5,
+                 full_solve_every: int = 10):
+        """ Live calibration initialization
+
+        Args:
+            board:            A chessboard object
+            frame_size:       Image size in pixels
+            min_views:        Minimal number of views before the first solution is computed
+            full_solve_every: Number of incremental refinements between two full calibrations
+        """
+        self.board = board
+        self.frame_size = frame_size
+        self.min_views = max(min_views, 1)
+        self.full_solve_every = full_solve_every
+        self._objp = board.object_points()
+        self._img_points: list[npt.NDArray[np.float32]] = []
+        self._lock = Lock()
+        self._new_view = Event()
+        self._thread: Thread | None = None
+        self.alive = False
+        # Latest solution
+        self._n_solved = 0
+        self._n_solves = 0
+        self._rms = float('nan')
+        self._stability = float('nan')
+        self._intrinsic: npt.NDArray[np.float64] | None = None
+        self._distortion: npt.NDArray[np.float64] | None = None
+
+    @property
+    def n_views(self) -> int:
+        with self._lock:
+            return len(self._img_points)
+
+    @property
+    def n_solved_views(self) -> int:
+        """ Number of views used for the latest solution """
+        with self._lock:
+            return self._n_solved
+
+    @property
+    def rms(self) -> float:
+        """ Root-mean-square reprojection error of the latest solution in pixels """
+        with self._lock:
+            return self._rms
+
+    @property
+    def stability(self) -> float:
+        """ Maximal relative change of fx, fy, cx, cy between the last two solutions """
+        with self._lock:
+            return self._stability
+
+    def start(self) -> None:
+        if self._thread is None:
+            self.alive = True
+            self._thread = Thread(target=self.update, args=(), daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self.alive = False
+        self._new_view.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def add_view(self, corners: npt.NDArray[np.float32]) -> None:
+        """ Add the chessboard corners of a new view to the running set
+
+        Args:
+            corners: Refined chessboard corners in pixel coordinates
+        """
+        with self._lock:
+            self._img_points.append(np.asarray(corners, dtype=np.float32).reshape(-1, 1, 2))
+        self._new_view.set()
+
+    def solve(self) -> None:
+        """ Solve the camera coefficients for all views collected so far """
+        with self._lock:
+            img_points = list(self._img_points)
+            intrinsic, distortion = self._intrinsic, self._distortion
+            n_solves = self._n_solves
+        if len(img_points) < self.min_views:
+            return
+        obj_points = [self._objp] * len(img_points)
+        if intrinsic is None or distortion is None or n_solves % self.full_solve_every == 0:
+            rms, mtx, dist, _, _ = cv.calibrateCamera(
+                obj_points, img_points, self.frame_size, None, None, criteria=self._full_criteria)
+        else:
+            rms, mtx, dist, _, _ = cv.calibrateCamera(
+                obj_points, img_points, self.frame_size, intrinsic.copy(), distortion.copy(),
+                flags=cv.CALIB_USE_INTRINSIC_GUESS, criteria=self._refine_criteria)
+        with self._lock:
+            if self._intrinsic is not None:
+                prev = np.array([self._intrinsic[0, 0], self._intrinsic[1, 1],
+                                 self._intrinsic[0, 2], self._intrinsic[1, 2]])
+                curr = np.array([mtx[0, 0], mtx[1, 1], mtx[0, 2], mtx[1, 2]])
+                self._stability = float(np.max(np.abs(curr - prev) / np.abs(prev)))
+            self._intrinsic = mtx
+            self._distortion = dist
+            self._rms = float(rms)
+            self._n_solved = len(img_points)
+            self._n_solves += 1
+        LOGGER.debug(f"Live calibration with {len(img_points)} views. RMS: {rms:.3f} px")
+
+    def update(self) -> None:
+        """ Worker loop which re-solves the coefficients whenever there are new views """
+        while self.alive:
+            self._new_view.wait()
+            self._new_view.clear()
+            if self.alive:
+                self.solve()
+
+    def coefficients(self, name: str) -> CameraCoefficient:
+        """ Get the latest solution
+
+        Args:
+            name: Camera name
+
+        Returns:
+            The camera coefficients. Default values if there is no solution yet
+        """
+        cc = CameraCoefficient(name)
+        with self._lock:
+            if self._intrinsic is not None and self._distortion is not None:
+                cc.intrinsic = self._intrinsic.copy()
+                cc.distortion = self._distortion.copy()
+        return cc
@@ -2,21 +2,76 @@ from __future__ import annotations
 
 # global
 import tomli
-import tomli_w
 import logging
+import cv2 as cv
 import numpy as np
 from pathlib import Path
-from tomlkit import document
+from threading import Lock
+# local
+from camera_kit.utilities.projection import (
+    project_camera_points,
+    project_points_batch,
+    project_points_transformed,
+    undistort_normalized,
+)
 # typing
+from typing import Any, Callable, Tuple, TypeVar
 from numpy import typing as npt
 
 LOGGER = logging.getLogger(__name__)
 
+_T = TypeVar('_T')
+
+# Process wide cache of parsed coefficient files
+# Key: resolved file path; Value: (mtime_ns, size, intrinsic, distortion)
+_coeffs_cache: dict[Path, Tuple[int, int, npt.NDArray[np.float64], npt.NDArray[np.float64]]] = {}
+_coeffs_cache_lock = Lock()
+
+
+def clear_coefficient_cache() -> None:
+    """ Remove all parsed coefficient files from the process wide cache """
+    with _coeffs_cache_lock:
+        _coeffs_cache.clear()
+
+
+def _read_coefficient_file(fp: Path) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """ Helper function to read a coefficient file. Files are parsed once per modification and then served from
+        the process wide cache. A binary .npz file is read without toml parsing.
+
+    Args:
+        fp: Path to a coefficients .toml or .npz file
+
+    Returns:
+        Copies of the intrinsic matrix and the distortion parameters
+    """
+    key = fp.resolve()
+    stat = key.stat()
+    with _coeffs_cache_lock:
+        entry = _coeffs_cache.get(key)
+    if entry is None or entry[0] != stat.st_mtime_ns or entry[1] != stat.st_size:
+        if key.suffix == '.npz':
+            with np.load(key) as data:
+                intrinsic = np.array(data['intrinsic'], dtype=np.float64)
+                distortion = np.array(data['distortion'], dtype=np.float64)
+        else:
+            with key.open(mode='rb') as f:
+                coeffs = tomli.load(f)
+            intrinsic = np.array(coeffs['intrinsic'], dtype=np.float64)
+            distortion = np.array(coeffs['distortion'], dtype=np.float64)
+        entry = (stat.st_mtime_ns, stat.st_size, intrinsic, distortion)
+        with _coeffs_cache_lock:
+            _coeffs_cache[key] = entry
+        LOGGER.debug(f"Parsed camera coefficient file {str(key)}")
+    return entry[2].copy(), entry[3].copy()
+
 
 class CameraCoefficient:
     """ Class to represent camera coefficients
         intrinsic: Intrinsic camera matrix for the raw (distorted) images
         distortion: The distortion parameters
+
+        Quantities derived from the coefficients are computed on first request and reused until the intrinsic or
+        distortion values change.
     """
     def __init__(self, name: str):
         """ Class initialization
@@ -25,16 +80,208 @@ class CameraCoefficient:
             name: Camera name
         """
         self.file_path = Path.cwd().joinpath('camera_info', name, 'calibration', 'coefficients.toml')
-        self.intrinsic: npt.NDArray[np.float64] = np.identity(3)
-        self.distortion: npt.NDArray[np.float64] = np.zeros(4)
+        self._intrinsic: npt.NDArray[np.float64] = np.identity(3)
+        self._distortion: npt.NDArray[np.float64] = np.zeros(4)
+        self._derived: dict[Any, Any] = {}
+        self._derived_key = b""
+
+    @property
+    def intrinsic(self) -> npt.NDArray[np.float64]:
+        return self._intrinsic
+
+    @intrinsic.setter
+    def intrinsic(self, value: npt.NDArray[np.float64]) -> None:
+        self._intrinsic = value
+        self._derived = {}
+
+    @property
+    def distortion(self) -> npt.NDArray[np.float64]:
+        return self._distortion
+
+    @distortion.setter
+    def distortion(self, value: npt.NDArray[np.float64]) -> None:
+        self._distortion = value
+        self._derived = {}
+
+    def _memoize(self, key: Any, factory: Callable[[], _T]) -> _T:
+        """ Helper function to compute a derived quantity once. The cache is dropped when the coefficient values
+            change, also if the arrays are modified in place.
+        """
+        derived_key = self._intrinsic.tobytes() + self._distortion.tobytes()
+        if derived_key != self._derived_key:
+            self._derived = {}
+            self._derived_key = derived_key
+        if key not in self._derived:
+            self._derived[key] = factory()
+        return self._derived[key]  # type: ignore[no-any-return]
+
+    @staticmethod
+    def _read_only(*arrays: npt.NDArray[Any]) -> None:
+        for arr in arrays:
+            arr.flags.writeable = False
+
+    @property
+    def intrinsic_inv(self) -> npt.NDArray[np.float64]:
+        """ Inverse of the intrinsic camera matrix """
+        def _inv() -> npt.NDArray[np.float64]:
+            inv = np.linalg.inv(self._intrinsic).astype(np.float64)
+            self._read_only(inv)
+            return inv
+        return self._memoize('intrinsic_inv', _inv)
+
+    def optimal_intrinsic(self, frame_size: tuple[int, int], alpha: float = 0.0
+                          ) -> tuple[npt.NDArray[np.float64], tuple[int, int, int, int]]:
+        """ Get the optimal intrinsic matrix for undistorted images
+
+        Args:
+            frame_size: Image size in pixels (width, height)
+            alpha:      Free scaling parameter between 0 (only valid pixels) and 1 (all source pixels)
+
+        Returns:
+            (New intrinsic camera matrix; Valid pixel region of interest as (x, y, width, height))
+        """
+        def _optimal() -> tuple[npt.NDArray[np.float64], tuple[int, int, int, int]]:
+            mtx, roi = cv.getOptimalNewCameraMatrix(self._intrinsic, self._distortion, frame_size, alpha, frame_size)
+            self._read_only(mtx)
+            return mtx, tuple(int(v) for v in roi)
+        return self._memoize(('optimal_intrinsic', tuple(frame_size), alpha), _optimal)
+
+    def undistort_maps(self, frame_size: tuple[int, int], alpha: float = 0.0
+                       ) -> tuple[npt.NDArray[Any], npt.NDArray[Any]]:
+        """ Get the pixel maps to undistort images with cv.remap
+
+        Args:
+            frame_size: Image size in pixels (width, height)
+            alpha:      Free scaling parameter between 0 (only valid pixels) and 1 (all source pixels)
+
+        Returns:
+            The two remapping maps in fixed point representation
+        """
+        def _maps() -> tuple[npt.NDArray[Any], npt.NDArray[Any]]:
+            new_mtx, _ = self.optimal_intrinsic(frame_size, alpha)
+            map_1, map_2 = cv.initUndistortRectifyMap(
+                self._intrinsic, self._distortion, None, new_mtx, frame_size, cv.CV_16SC2)
+            self._read_only(map_1, map_2)
+            return map_1, map_2
+        return self._memoize(('undistort_maps', tuple(frame_size), alpha), _maps)
+
+    def undistort_image(self, img: npt.NDArray[np.uint8], alpha: float = 0.0) -> npt.NDArray[np.uint8]:
+        """ Undistort an image using the cached remapping maps
+
+        Args:
+            img:   Raw (distorted) image
+            alpha: Free scaling parameter between 0 (only valid pixels) and 1 (all source pixels)
+
+        Returns:
+            The undistorted image
+        """
+        frame_size = (img.shape[1], img.shape[0])
+        map_1, map_2 = self.undistort_maps(frame_size, alpha)
+        return cv.remap(img, map_1, map_2, cv.INTER_LINEAR)  # type: ignore[no-any-return]
+
+    def pixel_to_normalized(self, points: npt.ArrayLike) -> npt.NDArray[np.float64]:
+        """ Convert pixel coordinates into normalized image coordinates without removing the distortion
 
-    def save(self, dir_path: Path | str = "") -> None:
+        Args:
+            points: Pixel coordinates with shape (..., 2)
+
+        Returns:
+            Normalized image coordinates with the same shape
+        """
+        pts = np.asarray(points, dtype=np.float64)
+        inv = self.intrinsic_inv
+        return pts @ inv[:2, :2].T + inv[:2, 2]  # type: ignore[no-any-return]
+
+    def normalized_to_pixel(self, points: npt.ArrayLike) -> npt.NDArray[np.float64]:
+        """ Convert normalized image coordinates into pixel coordinates without applying the distortion
+
+        Args:
+            points: Normalized image coordinates with shape (..., 2)
+
+        Returns:
+            Pixel coordinates with the same shape
+        """
+        pts = np.asarray(points, dtype=np.float64)
+        return pts @ self._intrinsic[:2, :2].T + self._intrinsic[:2, 2]  # type: ignore[no-any-return]
+
+    def undistort_points(self, points: npt.ArrayLike, normalized: bool = False) -> npt.NDArray[np.float64]:
+        """ Remove the lens distortion from pixel coordinates, e.g. from detected corners
+
+        Args:
+            points:     Pixel coordinates of the raw (distorted) image with shape (..., 2)
+            normalized: Return normalized image coordinates instead of pixel coordinates
+
+        Returns:
+            Undistorted coordinates with the same shape
+        """
+        xy = undistort_normalized(self.pixel_to_normalized(points), self._distortion)
+        return xy if normalized else self.normalized_to_pixel(xy)
+
+    def pixel_to_ray(self, points: npt.ArrayLike) -> npt.NDArray[np.float64]:
+        """ Get the viewing rays of pixels in the camera frame
+
+        Args:
+            points: Pixel coordinates of the raw (distorted) image with shape (..., 2)
+
+        Returns:
+            Unit direction vectors with shape (..., 3)
+        """
+        xy = self.undistort_points(points, normalized=True)
+        rays = np.concatenate([xy, np.ones(xy.shape[:-1] + (1,))], axis=-1)
+        return rays / np.linalg.norm(rays, axis=-1, keepdims=True)  # type: ignore[no-any-return]
+
+    def ray_to_pixel(self, points: npt.ArrayLike) -> npt.NDArray[np.float64]:
+        """ Project points or rays given in the camera frame into the raw (distorted) image
+
+        Args:
+            points: Points or direction vectors in the camera frame with shape (..., 3)
+
+        Returns:
+            Pixel coordinates with shape (..., 2)
+        """
+        return project_camera_points(points, self._intrinsic, self._distortion)
+
+    def project_points(self,
+                       obj_points: npt.ArrayLike,
+                       r_vecs: npt.ArrayLike,
+                       t_vecs: npt.ArrayLike) -> npt.NDArray[np.float64]:
+        """ Project object points for one or many poses in a single vectorized pass
+
+        Args:
+            obj_points: Object points with shape (M, 3) shared by all poses or (N, M, 3) for one set per pose
+            r_vecs:     Rotation vectors with shape (3,) or (N, 3)
+            t_vecs:     Translation vectors with shape (3,) or (N, 3)
+
+        Returns:
+            Image points with shape (N, M, 2)
+        """
+        return project_points_batch(obj_points, r_vecs, t_vecs, self._intrinsic, self._distortion)
+
+    def project_poses(self, obj_points: npt.ArrayLike, poses: Any) -> npt.NDArray[np.float64]:
+        """ Project object points for many poses given as homogeneous transformations
+
+        Args:
+            obj_points: Object points with shape (M, 3) shared by all poses or (N, M, 3) for one set per pose
+            poses:      Object poses in the camera frame. A SE3 object with one or many values or matrices with
+                        shape (4, 4) or (N, 4, 4)
+
+        Returns:
+            Image points with shape (N, M, 2)
+        """
+        mats = np.asarray(poses.A if hasattr(poses, 'A') else poses, dtype=np.float64).reshape(-1, 4, 4)
+        return project_points_transformed(obj_points, mats[:, :3, :3], mats[:, :3, 3], self._intrinsic,
+                                          self._distortion)
+
+    def save(self, dir_path: Path | str = "", npz: bool = False) -> None:
         """ Class method to load camera coefficients
 
         Args:
             dir_path: Directory path to the intrinsic and distorted parameters
+            npz:      Option to store a binary copy as coefficients.npz next to the toml file
 
         """
+        import tomli_w
+        from tomlkit import document
         if dir_path:
             dir_path = Path(dir_path)
             if not dir_path.is_dir():
@@ -48,10 +295,21 @@ class CameraCoefficient:
 
         with self.file_path.open(mode='wb') as f:
             tomli_w.dump(toml, f)
+        npz_path = self.file_path.with_suffix('.npz')
+        if npz:
+            with npz_path.open(mode='wb') as f:
+                np.savez(f, intrinsic=self.intrinsic, distortion=self.distortion)
+        elif npz_path.is_file():
+            # Remove outdated binary copy
+            npz_path.unlink()
+        with _coeffs_cache_lock:
+            _coeffs_cache.pop(self.file_path.resolve(), None)
+            _coeffs_cache.pop(npz_path.resolve(), None)
         LOGGER.debug(f"Save new camera coefficients in folder {str(self.file_path.parent)}")
 
     def load(self, file_path: Path | str = "") -> None:
-        """ Class method to load camera coefficients
+        """ Class method to load camera coefficients. If there is an up-to-date binary coefficients.npz file next
+            to the toml file it is used instead.
 
         Args:
             file_path: File path to the intrinsic and distorted parameters
@@ -67,8 +325,8 @@ class CameraCoefficient:
             if not fp.is_file():
                 raise FileNotFoundError(f"File with default path '{str(fp)}' not found.")
 
-        with fp.open(mode='rb') as f:
-            coeffs = tomli.load(f)
-            self.intrinsic = np.array(coeffs['intrinsic'], dtype=np.float64)
-            self.distortion = np.array(coeffs['distortion'], dtype=np.float64)
+        npz_path = fp.with_suffix('.npz')
+        if fp.suffix != '.npz' and npz_path.is_file() and npz_path.stat().st_mtime_ns >= fp.stat().st_mtime_ns:
+            fp = npz_path
+        self.intrinsic, self.distortion = _read_coefficient_file(fp)
         LOGGER.debug(f"Load camera coefficients successfully.")
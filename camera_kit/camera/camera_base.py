@@ -2,14 +2,19 @@ from __future__ import annotations
 # global
 import abc
 import copy
+import time
 import logging
 import cv2 as cv
 import numpy as np
 from pathlib import Path
-from threading import Thread
+from threading import Condition, Event, Thread, current_thread, local
 # local
 from camera_kit.view.display import Display
 from camera_kit.camera import CameraCoefficient
+from camera_kit.camera.frameset import FrameSet, ImageViews, Roi, clip_roi, roi_slices
+from camera_kit.camera.frame_buffer import FrameBufferPool
+from camera_kit.camera.latency import DeviceClock, LatencyTracer
+from camera_kit.camera.watchdog import CaptureMetrics, CaptureWatchdog, StaleFrameError
 # typing
 from typing import Any
 from numpy import typing as npt
@@ -26,6 +31,27 @@ class CameraBase(metaclass=abc.ABCMeta):
     _frame_size = (0, 0)
     _thread: Thread | None = None
     _display: Display | None = None
+    _watchdog: CaptureWatchdog | None = None
+    # Records the latency of the frames if tracing is enabled
+    tracer: LatencyTracer | None = None
+    _restarting = False
+    # A paused stream keeps the device open but skips the processing and publishing of frames
+    paused = False
+    # Maximal time in seconds to wait for the capture thread on shutdown and restart
+    join_timeout = 5.0
+    # Rate at which received frames are processed and published. Zero processes every frame
+    target_fps = 0.0
+    # Process and publish a frame only if a consumer requests it
+    on_demand = False
+    _next_process = 0.0
+    # Time when the latest frame was received from the device [s] (time.time)
+    _arrived_at = 0.0
+    # Frame rate the device is expected to deliver. Used to detect stalled streams
+    expected_fps = 30.0
+    # Behavior if a consumer requests a stale frame: 'ignore', 'warn' or 'raise'
+    stale_policy = "warn"
+    # Region (x, y, width, height) which the capture loop processes. Pixels outside the region stay black
+    capture_roi: Roi | None = None
 
     def __new__(cls, *args: Any, **kwargs: Any) -> CameraBase:
         if not isinstance(cls._instance, cls):
@@ -41,6 +67,8 @@ class CameraBase(metaclass=abc.ABCMeta):
         """
         if self._frame_size != frame_size:
             self.end()
+        # A running stream of the same camera is reused as it is, e.g. when it is re-acquired from a camera pool
+        warm = self.alive and self._name == name
         if self._name != name:
             self.remove_display()
 
@@ -50,13 +78,31 @@ class CameraBase(metaclass=abc.ABCMeta):
         self.cam_info_dir = Path.cwd().joinpath('camera_info', self._name)
         self.coeffs_path = Path(self.cam_info_dir).joinpath('calibration', 'coefficients.toml')
 
-        # Color frame
-        self.color_frame = cv.cvtColor(np.zeros((3,) + self._frame_size, dtype=np.uint8).T, cv.COLOR_RGB2BGR)
-        self.depth_frame = np.zeros((3,) + self._frame_size, dtype=np.uint8).T
-        # Camera coefficients
-        self.cc = CameraCoefficient(self._name)
-        self.is_calibrated = False
-        self.log_calib_msg = True
+        if not warm:
+            # Color frame
+            self._seq_id = -1
+            self._frameset = FrameSet(
+                cv.cvtColor(np.zeros((3,) + self._frame_size, dtype=np.uint8).T, cv.COLOR_RGB2BGR))
+            self._started_at = time.time()
+            self._warned_stale = False
+            self.metrics = CaptureMetrics()
+            self._demand = Event()
+            self._frame_cond = Condition()
+            # Frame set of the latest request per consumer thread
+            self._consumed = local()
+            # Maps device timestamps onto the host clock
+            self._device_clock = DeviceClock()
+            # Reused output buffers of the capture loop
+            self._color_buffers = FrameBufferPool()
+            self.depth_frame = np.zeros((3,) + self._frame_size, dtype=np.uint8).T
+            self._depth_views = ImageViews(self.depth_frame)
+            # Named regions of interest, e.g. the area of a socket
+            self.roi_presets: dict[str, Roi] = {}
+            self.capture_roi = None
+            # Camera coefficients
+            self.cc = CameraCoefficient(self._name)
+            self.is_calibrated = False
+            self.log_calib_msg = True
         if launch:
             self.start()
 
@@ -68,14 +114,339 @@ class CameraBase(metaclass=abc.ABCMeta):
     def frame_size(self) -> tuple[int, int]:
         return self._frame_size
 
+    @property
+    def color_frame(self) -> npt.NDArray[np.uint8]:
+        return self._frameset.color
+
+    @color_frame.setter
+    def color_frame(self, frame: npt.NDArray[np.uint8]) -> None:
+        self._publish(frame)
+
+    def _publish(self,
+                 color: npt.NDArray[np.uint8],
+                 depth: npt.NDArray[np.uint16] | None = None,
+                 depth_scale: float = 0.0,
+                 hw_timestamp: float = float('nan'),
+                 host_timestamp: float = float('nan'),
+                 capture_time: float = float('nan')) -> FrameSet:
+        """ Publish a new frame set with a single reference swap. Published arrays are made read-only.
+
+        Args:
+            color:          Color image
+            depth:          Optional raw depth image aligned to the color image
+            depth_scale:    Factor to convert raw depth values into meters
+            hw_timestamp:   Device timestamp of the frame [ms]
+            host_timestamp: Time when the frame arrived at the host [s]. Default is the time when the capture loop
+                            registered the frame or, without registration, now
+            capture_time:   Exposure time in the host clock [s]. Default is the device timestamp mapped onto the host
+                            clock or, without device timestamp, the host timestamp
+
+        Returns:
+            The published frame set
+        """
+        now = time.time()
+        if host_timestamp != host_timestamp:
+            arrived_at, last_arrival = self._arrived_at, self._frameset.host_timestamp
+            # The registered arrival belongs to this frame if it's newer than the previous frame set
+            host_timestamp = arrived_at if arrived_at > 0.0 and not arrived_at <= last_arrival else now
+        if capture_time != capture_time:
+            capture_time = (host_timestamp if hw_timestamp != hw_timestamp
+                            else self._device_clock.to_host(hw_timestamp, host_timestamp))
+        color = color.view()
+        color.flags.writeable = False
+        if depth is not None:
+            depth = depth.view()
+            depth.flags.writeable = False
+        self._seq_id += 1
+        frameset = FrameSet(color, depth, depth_scale, hw_timestamp, host_timestamp, self._seq_id, capture_time)
+        self._frameset = frameset
+        self.metrics.frames += 1
+        with self._frame_cond:
+            self._frame_cond.notify_all()
+        tracer = self.tracer
+        if tracer is not None:
+            tracer.record(self._name, 'arrival', frameset, host_timestamp)
+            tracer.record(self._name, 'publish', frameset, now)
+        return frameset
+
+    def _consume(self, frameset: FrameSet) -> FrameSet:
+        """ Register the frame set a consumer thread requested """
+        self._consumed.frameset = frameset
+        tracer = self.tracer
+        if tracer is not None:
+            tracer.record(self._name, 'consume', frameset)
+        return frameset
+
+    def enable_tracing(self, tracer: LatencyTracer | None = None) -> LatencyTracer:
+        """ Record the latency of the frames from capture to publishing, consumption, detection and rendering
+
+        Args:
+            tracer: Tracer which can be shared with other cameras. Default is a new tracer
+
+        Returns:
+            The latency tracer
+        """
+        self.tracer = LatencyTracer() if tracer is None else tracer
+        return self.tracer
+
+    def disable_tracing(self) -> None:
+        self.tracer = None
+
+    def set_throttle(self, target_fps: float = 0.0, on_demand: bool = False) -> None:
+        """ Limit the processing of received frames. The capture loop keeps draining the device, so published frames
+        stay fresh, but post-processing runs only for the frames that are published.
+
+        Args:
+            target_fps: Maximal rate at which frames are processed and published. Zero processes every frame
+            on_demand:  Process and publish a frame only if a consumer requests it. Consumers wait for the next
+                        received frame
+        """
+        if target_fps < 0.0:
+            raise ValueError(f"Target frame rate must not be negative")
+        self.target_fps = target_fps
+        self.on_demand = on_demand
+        self._next_process = 0.0
+
+    def _frame_arrived(self) -> bool:
+        """ Register a frame received by the capture loop
+
+        Returns:
+            True if the frame should be processed and published. Otherwise, the frame is dropped
+        """
+        now = time.time()
+        self._arrived_at = now
+        if self.paused:
+            return False
+        if self.on_demand:
+            if not self._demand.is_set():
+                self.metrics.skipped += 1
+                return False
+            self._demand.clear()
+            return True
+        if self.target_fps > 0.0:
+            if now < self._next_process:
+                self.metrics.skipped += 1
+                return False
+            period = 1.0 / self.target_fps
+            # Keep the average rate without catching up after slow frames
+            self._next_process = max(self._next_process + period, now + 0.5 * period)
+        return True
+
+    def _request_frame(self) -> None:
+        """ Wait for a freshly processed frame set in on demand mode """
+        if not self.on_demand or not self.alive or self.paused or current_thread() is self._thread:
+            return
+        seq_id = self._frameset.seq_id
+        self._demand.set()
+        with self._frame_cond:
+            self._frame_cond.wait_for(lambda: self._frameset.seq_id > seq_id or not self.alive, self.stale_timeout)
+
+    @property
+    def seq_id(self) -> int:
+        """ Sequence id of the latest frame set """
+        return self._frameset.seq_id
+
+    @property
+    def last_arrival(self) -> float:
+        """ Time when the latest frame was received from the device [s]. Dropped frames count as well """
+        host_timestamp = self._frameset.host_timestamp
+        return self._arrived_at if host_timestamp != host_timestamp else max(host_timestamp, self._arrived_at)
+
+    def frame_age(self) -> float:
+        """ Time in seconds since the latest frame arrived or since the stream was started if there is no frame """
+        return time.time() - max(self.last_arrival, self._started_at)
+
+    @property
+    def stale_timeout(self) -> float:
+        """ Frame age in seconds after which frames count as stale """
+        if self._watchdog is not None:
+            return self._watchdog.stall_timeout
+        return max(10.0 / self.expected_fps if self.expected_fps > 0.0 else 0.0, 1.0)
+
+    @property
+    def is_stale(self) -> bool:
+        """ True if the stream is running but no new frame arrived within the stale timeout """
+        return self.alive and not self.paused and self.frame_age() > self.stale_timeout
+
+    def _check_stale(self) -> None:
+        if self.stale_policy == "ignore":
+            return
+        if not self.is_stale:
+            self._warned_stale = False
+        elif self.stale_policy == "raise":
+            raise StaleFrameError(f"Camera '{self._name}' delivered no new frame since {self.frame_age():.2f} s")
+        elif not self._warned_stale:
+            LOGGER.warning(f"Camera '{self._name}' delivered no new frame since {self.frame_age():.2f} s")
+            self._warned_stale = True
+
+    def _running(self) -> bool:
+        """ Condition of the capture loop. False if the stream ended or the capture thread got replaced """
+        return self.alive and self._thread is current_thread()
+
+    def enable_watchdog(self, **kwargs: Any) -> CaptureWatchdog:
+        """ Supervise the stream and restart the device if it stalls
+
+        Args:
+            kwargs: Settings of the CaptureWatchdog
+
+        Returns:
+            The watchdog object
+        """
+        self.disable_watchdog()
+        self._watchdog = CaptureWatchdog(self, **kwargs)
+        self._watchdog.start()
+        return self._watchdog
+
+    def disable_watchdog(self) -> None:
+        if self._watchdog is not None:
+            watchdog, self._watchdog = self._watchdog, None
+            if watchdog._thread is not current_thread():
+                watchdog.stop()
+            else:
+                watchdog.alive = False
+
+    def pause(self) -> None:
+        """ Keep the device streaming but stop processing and publishing frames """
+        self.paused = True
+
+    def resume(self, wait: bool = True) -> bool:
+        """ Continue publishing frames after a pause
+
+        Args:
+            wait: Block until the first new frame set is published or the stale timeout expired
+
+        Returns:
+            True if the stream delivers frames again or if not waited for
+        """
+        if not self.paused:
+            return True
+        seq_id = self.seq_id
+        self._started_at = t_resume = time.time()
+        self.paused = False
+        if not wait or not self.alive:
+            return True
+        t_end = time.monotonic() + self.stale_timeout
+        # In on demand mode frames are published only on request. Receiving a frame is sufficient
+        while self.seq_id <= seq_id and not (self.on_demand and self._arrived_at > t_resume):
+            if time.monotonic() > t_end:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def restart(self) -> None:
+        """ Restart the device while keeping display and watchdog """
+        display, self._display = self._display, None
+        self._restarting = True
+        try:
+            self.end()
+            self.start()
+        finally:
+            self._restarting = False
+            self._display = display
+
+    def add_roi_preset(self, name: str, roi: Roi) -> None:
+        """ Store a named region of interest which can be used instead of the region in the frame requests
+
+        Args:
+            name: Name of the region
+            roi:  Region (x, y, width, height) in pixels
+        """
+        self.roi_presets[name] = clip_roi(roi, self._frame_size)
+
+    def _resolve_roi(self, roi: Roi | str | None) -> Roi | None:
+        if isinstance(roi, str):
+            if roi not in self.roi_presets:
+                raise KeyError(f"Camera '{self._name}' has no region preset '{roi}'")
+            return self.roi_presets[roi]
+        return roi
+
+    def set_capture_roi(self, roi: Roi | str | None) -> None:
+        """ Restrict the processing of the capture loop to a region. Frames keep their size and geometry, so camera
+        coefficients stay valid, but the pixels outside the region are black. Backends crop before their expensive
+        processing steps.
+
+        Args:
+            roi: Region (x, y, width, height) in pixels, name of a region preset or None to process the whole frame
+        """
+        roi = self._resolve_roi(roi)
+        self.capture_roi = None if roi is None else clip_roi(roi, self._frame_size)
+        self._reset_buffers()
+
+    def _reset_buffers(self) -> None:
+        """ Replace the output buffers of the capture loop. With a capture region the buffers are zeroed once, so
+        the pixels which are never written stay black.
+        """
+        self._color_buffers = FrameBufferPool(zeroed=self.capture_roi is not None)
+
+    def _capture_slices(self, image_shape: tuple[int, ...]) -> tuple[slice, slice] | None:
+        """ Slices of the capture region or None if the whole image must be processed. Images which don't have the
+        frame size, e.g. depth images of another resolution, are processed completely.
+        """
+        roi = self.capture_roi
+        if roi is None or tuple(image_shape[:2]) != (self._frame_size[1], self._frame_size[0]):
+            return None
+        return roi_slices(roi)
+
+    def get_frameset(self) -> FrameSet:
+        """ Get the latest frame set. Color and depth data always belong to the same capture. The arrays are
+        shared with other consumers and must not be modified.
+
+        Returns:
+            The latest frame set
+        """
+        if self.log_calib_msg and not self.is_calibrated:
+            LOGGER.debug("Camera is not calibrated. Coefficients are default values!")
+            self.log_calib_msg = False
+        self._request_frame()
+        self._check_stale()
+        return self._consume(self._frameset)
+
+    @property
+    def last_frameset(self) -> FrameSet | None:
+        """ Frame set which the calling thread received with its latest frame request, e.g. the frame set of the
+        image a detector processed. None if the thread didn't request a frame yet.
+        """
+        return getattr(self._consumed, 'frameset', None)
+
+    def wait_frameset(self, seq_id: int, timeout: float | None = None) -> FrameSet:
+        """ Wait for a frame set newer than the given one
+
+        Args:
+            seq_id:  Sequence id of the latest frame set the caller has seen
+            timeout: Maximal waiting time [s]. Default is the stale timeout
+
+        Returns:
+            The latest frame set. It's not newer than the given sequence id if the timeout expired or the camera ended
+        """
+        if self.on_demand:
+            self._request_frame()
+        with self._frame_cond:
+            self._frame_cond.wait_for(lambda: self._frameset.seq_id > seq_id or not self.alive,
+                                      self.stale_timeout if timeout is None else timeout)
+        return self.get_frameset()
+
     def _on_start(self) -> None:
         # Create thread
         if self._thread is None:
             self._thread = Thread(target=self.update, args=(), daemon=True)
+            self._started_at = time.time()
+            # The device clock may restart with the stream
+            self._device_clock.reset()
 
     def _on_end(self) -> None:
         self.alive = False
-        self._thread = None
+        self.paused = False
+        thread, self._thread = self._thread, None
+        if not self._restarting:
+            self.disable_watchdog()
+        # Wait for the capture loop before the device gets released and reopened. After a stall the loop may be
+        # blocked in the driver. Then the restart continues after the timeout and the loop exits on its own as soon
+        # as it notices the new thread.
+        if thread is not None and thread.is_alive() and thread is not current_thread():
+            thread.join(self.join_timeout)
+            if thread.is_alive():
+                LOGGER.warning(f"Capture thread of camera '{self._name}' didn't stop within "
+                               f"{self.join_timeout:.1f} s")
         self.remove_display()
 
     @property
@@ -85,17 +456,52 @@ class CameraBase(metaclass=abc.ABCMeta):
         else:
             raise RuntimeError(f"There is no display yet. Please add first via interface.")
 
-    def get_color_frame(self) -> npt.NDArray[np.uint8]:
+    def get_color_frame(self, roi: Roi | str | None = None, scale: float = 1.0) -> npt.NDArray[np.uint8]:
+        """ Get the latest color image
+
+        Args:
+            roi:   Region (x, y, width, height) in pixels or name of a region preset
+            scale: Scale factor
+
+        Returns:
+            A copy of the whole image. If a region or scale is requested, a read-only view instead. Scaled images
+            are computed once per frame and shared by all consumers which request the same region and scale
+        """
         if self.log_calib_msg and not self.is_calibrated:
             LOGGER.debug("Camera is not calibrated. Coefficients are default values!")
             self.log_calib_msg = False
-        return np.array(self.color_frame, dtype=np.uint8)
+        self._request_frame()
+        self._check_stale()
+        frameset = self._consume(self._frameset)
+        if roi is None and scale == 1.0:
+            return np.array(frameset.color, dtype=np.uint8)
+        return frameset.color_view(self._resolve_roi(roi), scale)
+
+    def _depth_view(self, roi: Roi | str | None, scale: float) -> npt.NDArray[np.uint8]:
+        """ Region of the colorized depth image. Scaled images are cached until the depth image changes. """
+        views = self._depth_views
+        if views.image is not self.depth_frame:
+            views = self._depth_views = ImageViews(self.depth_frame, cv.INTER_NEAREST)
+        return views.get(self._resolve_roi(roi), scale)  # type: ignore[no-any-return]
 
-    def get_depth_frame(self) -> npt.NDArray[np.uint8]:
+    def get_depth_frame(self, roi: Roi | str | None = None, scale: float = 1.0) -> npt.NDArray[np.uint8]:
+        """ Get the latest colorized depth image
+
+        Args:
+            roi:   Region (x, y, width, height) in pixels or name of a region preset
+            scale: Scale factor
+
+        Returns:
+            A copy of the whole image or, if a region or scale is requested, a read-only view
+        """
         if self.log_calib_msg and not self.is_calibrated:
             LOGGER.debug("Camera is not calibrated. Coefficients are default values!")
             self.log_calib_msg = False
-        return np.array(self.depth_frame, dtype=np.uint8)
+        self._request_frame()
+        self._check_stale()
+        if roi is None and scale == 1.0:
+            return np.array(self.depth_frame, dtype=np.uint8)
+        return self._depth_view(roi, scale)
 
     def add_display(self, name: str = "") -> None:
         if len(name) <= 0:
@@ -113,6 +519,10 @@ class CameraBase(metaclass=abc.ABCMeta):
         if frame is None:
             frame = self.get_color_frame()
         self.display.show(frame)
+        tracer, frameset = self.tracer, self.last_frameset
+        if tracer is not None and frameset is not None:
+            # A given frame is assumed to be derived from the latest frame set the thread requested
+            tracer.record(self._name, 'render', frameset)
 
     def load_coefficients(self, file_path: Path | str = "") -> None:
         """ Class method to load camera coefficients
@@ -124,18 +534,19 @@ class CameraBase(metaclass=abc.ABCMeta):
         self.cc.load(file_path)
         self.is_calibrated = True
 
-    def save_coefficients(self, cc: CameraCoefficient, dir_path: Path | str = "") -> None:
+    def save_coefficients(self, cc: CameraCoefficient, dir_path: Path | str = "", npz: bool = False) -> None:
         """ Set camera coefficients and save them in the (optionally) given file_path
         as coefficients.toml.
 
         Args:
             cc:       The camera intrinsic and distortion coefficient object
             dir_path: Optional directory path where the coefficients are saved
+            npz:      Option to store an additional binary copy as coefficients.npz
         """
         # Update camera coefficients
         self.cc = copy.copy(cc)
         self.is_calibrated = True
-        self.cc.save(dir_path)
+        self.cc.save(dir_path, npz)
 
     @abc.abstractmethod
     def start(self) -> None:
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
 # global
+import time
 import logging
 import cv2 as cv
 import numpy as np
 from numpy import typing as npt
 
 # local
+from camera_kit.camera.frameset import FrameSet, Roi
 from camera_kit.camera.camera_base import CameraBase
 
 
@@ -22,7 +24,7 @@ class CameraBuildIn(CameraBase):
     def __init__(self, name: str, frame_size: tuple[int, int] = (1280, 720), launch: bool = True) -> None:
         super().__init__(name, frame_size, launch)
 
-    def get_depth_frame(self) -> npt.NDArray[np.uint8]:
+    def get_depth_frame(self, roi: Roi | str | None = None, scale: float = 1.0) -> npt.NDArray[np.uint8]:
         raise NotImplementedError(f"Build in camera didn't provide depth information!")
 
     def start(self) -> None:
@@ -30,16 +32,51 @@ class CameraBuildIn(CameraBase):
         if not self.alive:
             # Create OpenCV video capture and start video stream
             self._cap = cv.VideoCapture(0)
+            if not self._cap.isOpened():
+                LOGGER.warning(f"Can't open video capture device of camera '{self._name}'")
+            fps = self._cap.get(cv.CAP_PROP_FPS)
+            if fps > 0.0:
+                self.expected_fps = fps
             self.alive = True
             assert self._thread
             self._thread.start()
 
+    def _publish_raw(self, raw_frame: npt.NDArray[np.uint8], hw_timestamp: float = float('nan')) -> FrameSet:
+        """ Resize a raw frame into a reused buffer and publish it. With a capture region only the region is resized """
+        width, height = self._frame_size
+        frame = self._color_buffers.get((height, width, 3))
+        if self.capture_roi is None:
+            cv.resize(raw_frame, self._frame_size, dst=frame, interpolation=cv.INTER_CUBIC)
+        else:
+            x, y, w, h = self.capture_roi
+            # Region of the raw frame which covers the capture region
+            s_x, s_y = raw_frame.shape[1] / width, raw_frame.shape[0] / height
+            raw_roi = raw_frame[int(y * s_y):int(np.ceil((y + h) * s_y)), int(x * s_x):int(np.ceil((x + w) * s_x))]
+            cv.resize(raw_roi, (w, h), dst=frame[y:y + h, x:x + w], interpolation=cv.INTER_CUBIC)
+        # The arrival time was registered when the frame got grabbed
+        return self._publish(frame, hw_timestamp=hw_timestamp)
+
     def update(self) -> None:
-        assert self._cap
-        while self.alive:
-            self.alive, raw_frame = self._cap.read()
-            if self.alive:
-                self.color_frame = cv.resize(raw_frame, self._frame_size, interpolation=cv.INTER_CUBIC)
+        cap = self._cap
+        assert cap
+        # Decoding buffer which is reused by every retrieve call
+        raw_frame: npt.NDArray[np.uint8] | None = None
+        while self._running():
+            # Grab every frame to keep the device buffer drained but decode only the frames which get published
+            success = cap.grab()
+            if success:
+                if not self._frame_arrived():
+                    continue
+                success, raw_frame = cap.retrieve(raw_frame)
+            if success:
+                assert raw_frame is not None
+                # Buffer timestamp of the capture backend, e.g. V4L2. Backends without timestamps report zero
+                hw_timestamp = cap.get(cv.CAP_PROP_POS_MSEC)
+                self._publish_raw(raw_frame, hw_timestamp if hw_timestamp > 0.0 else float('nan'))
+            else:
+                # Keep the thread alive. Consumers see stale frames and the watchdog can restart the device
+                self.metrics.read_errors += 1
+                time.sleep(1.0 / self.expected_fps)
 
     def end(self) -> None:
         self._on_end()
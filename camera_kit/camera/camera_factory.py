@@ -1,6 +1,8 @@
 from __future__ import annotations
 # global
+import sys
 import logging
+import importlib
 # local
 from camera_kit.camera.camera_base import CameraBase
 from camera_kit.utilities.base_logger import set_logging_level
@@ -9,22 +11,105 @@ from camera_kit.utilities.base_logger import set_logging_level
 from typing import Any, Type
 
 
+LOGGER = logging.getLogger(__name__)
+
+
 class CameraFactory:
 
+    # Entry point group for third party camera backends. The entry point name is used as camera type id
+    entry_point_group = "camera_kit.cameras"
+
     def __init__(self) -> None:
         self.cam_selection: dict[str, Type[CameraBase]] = {}
+        self._lazy_selection: dict[str, str] = {}
+        self._entry_points_loaded = False
 
     def available_cameras(self) -> list[str]:
-        return [cam.type_id for cam in self.cam_selection.values()]
-        # return [ CameraBuildIn.type_id, CameraRealSense.type_id]
+        self._load_entry_points()
+        return list(dict.fromkeys([*self._lazy_selection.keys(), *self.cam_selection.keys()]))
 
     def register(self, camera: Type[CameraBase]) -> None:
         self.cam_selection[camera.type_id] = camera
 
-    def create(self, name: str, logger_level: int = logging.INFO, **kwargs: Any) -> CameraBase:
-        set_logging_level(logger_level)
-        for cam_id in self.cam_selection.keys():
+    def register_lazy(self, type_id: str, import_path: str) -> None:
+        """ Register a camera class without importing its module. The module is imported on first creation.
+
+        Args:
+            type_id:     Camera type id
+            import_path: Import path of the camera class in the form 'package.module:ClassName'
+        """
+        if ':' not in import_path:
+            raise ValueError(f"Import path '{import_path}' doesn't match the format 'package.module:ClassName'")
+        self._lazy_selection[type_id] = import_path
+        # A lazy registration replaces an already imported class with the same type id
+        self.cam_selection.pop(type_id, None)
+
+    def get_camera_class(self, type_id: str) -> Type[CameraBase]:
+        """ Get the camera class of the given type id. Lazy registered classes are imported on first request.
+
+        Args:
+            type_id: Camera type id
+
+        Returns:
+            The camera class
+        """
+        if type_id in self.cam_selection:
+            return self.cam_selection[type_id]
+        self._load_entry_points()
+        if type_id not in self._lazy_selection:
+            raise KeyError(f"There is no camera class registered with type id '{type_id}'. "
+                           f"Available cameras are: {self.available_cameras()}")
+        module_name, class_name = self._lazy_selection[type_id].split(':', 1)
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError as e:
+            raise ImportError(f"Can't load camera class for type id '{type_id}' from module '{module_name}'. {e}"
+                              ) from e
+        camera = getattr(module, class_name)
+        if not (isinstance(camera, type) and issubclass(camera, CameraBase)):
+            raise TypeError(f"Object '{self._lazy_selection[type_id]}' is not a subclass of CameraBase")
+        self.cam_selection[type_id] = camera
+        LOGGER.debug(f"Loaded camera class '{camera.__name__}' for type id '{type_id}'")
+        return camera
+
+    def resolve(self, name: str) -> Type[CameraBase]:
+        """ Get the camera class which matches the camera name
+
+        Args:
+            name: Camera name starting with a registered type id
+
+        Returns:
+            The camera class
+        """
+        for cam_id in self.available_cameras():
             if name.startswith(cam_id):
-                return self.cam_selection[cam_id](name, **kwargs)
+                return self.get_camera_class(cam_id)
         raise KeyError(f"Cannot map '{name}' to camera class. "
                        f"Make sure camera name fits to one of the list: {self.available_cameras()}")
+
+    def create(self, name: str, logger_level: int = logging.INFO, watchdog: bool | dict[str, Any] = False,
+               target_fps: float = 0.0, on_demand: bool = False, **kwargs: Any) -> CameraBase:
+        set_logging_level(logger_level)
+        cam = self.resolve(name)(name, **kwargs)
+        # Skip the post-processing of frames which are not consumed
+        cam.set_throttle(target_fps, on_demand)
+        if watchdog:
+            # Restart the device automatically if the stream stalls
+            cam.enable_watchdog(**(watchdog if isinstance(watchdog, dict) else {}))
+        return cam
+
+    def _load_entry_points(self) -> None:
+        """ Register camera classes of third party packages which are advertised via entry points """
+        if self._entry_points_loaded:
+            return
+        self._entry_points_loaded = True
+        from importlib import metadata
+        if sys.version_info >= (3, 10):
+            eps = list(metadata.entry_points(group=self.entry_point_group))
+        else:
+            eps = list(metadata.entry_points().get(self.entry_point_group, []))
+        for ep in eps:
+            if ep.name in self._lazy_selection or ep.name in self.cam_selection:
+                LOGGER.debug(f"Skip entry point '{ep.name}' since the type id is already registered")
+                continue
+            self.register_lazy(ep.name, ep.value)
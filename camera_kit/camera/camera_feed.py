@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+# global
+import numpy as np
+
+# local
+from camera_kit.camera.frameset import FrameSet
+from camera_kit.camera.camera_base import CameraBase
+
+# typing
+from typing import Any
+from numpy import typing as npt
+
+
+class CameraFeed(CameraBase):
+    """ Camera which publishes frames handed over by the caller, e.g. recorded images or frames of another process.
+        Unlike the device cameras, every feed is an independent instance.
+    """
+
+    type_id = "feed"
+
+    def __new__(cls, *args: Any, **kwargs: Any) -> CameraFeed:
+        return object.__new__(cls)
+
+    def __init__(self, name: str, frame_size: tuple[int, int] = (1, 1)) -> None:
+        """ Camera feed
+
+        Args:
+            name:       Name of the camera. Used to load the coefficients
+            frame_size: Image size in pixels of the initial black frame
+        """
+        super().__init__(name, frame_size, launch=False)
+
+    def feed(self,
+             frame: npt.NDArray[np.uint8],
+             hw_timestamp: float = float('nan'),
+             capture_time: float = float('nan')) -> FrameSet:
+        """ Publish a frame
+
+        Args:
+            frame:        Color image
+            hw_timestamp: Capture timestamp of the frame [ms]
+            capture_time: Exposure time of the frame in the host clock [s]. Default is derived from the timestamp
+
+        Returns:
+            The published frame set
+        """
+        self._frame_arrived()
+        return self._publish(frame, hw_timestamp=hw_timestamp, capture_time=capture_time)
+
+    def start(self) -> None:
+        pass
+
+    def update(self) -> None:
+        pass
+
+    def end(self) -> None:
+        self._on_end()
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+# global
+import atexit
+import logging
+from threading import Lock, Thread, Timer, current_thread
+
+# local
+from camera_kit.camera.camera_base import CameraBase
+from camera_kit.camera.camera_factory import CameraFactory
+
+# typing
+from typing import Any
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class CameraPool:
+    """ Keeps released cameras open for an idle timeout. Re-acquiring a camera with a compatible configuration
+        reuses the running stream instead of re-opening the device.
+    """
+
+    def __init__(self, factory: CameraFactory, idle_timeout: float = 30.0, pause: bool = True) -> None:
+        """ Camera pool initialization
+
+        Args:
+            factory:      Factory to create the cameras
+            idle_timeout: Time in seconds a released camera is kept open
+            pause:        Pause released cameras. The device keeps streaming but frames are not processed
+        """
+        self.factory = factory
+        self.idle_timeout = idle_timeout
+        self.pause = pause
+        self._lock = Lock()
+        # Released cameras and the timers which end them
+        self._idle: dict[CameraBase, Timer] = {}
+        # Expired cameras and the timer threads which are ending them
+        self._ending: dict[CameraBase, Thread] = {}
+        atexit.register(self.shutdown)
+
+    def __contains__(self, cam: CameraBase) -> bool:
+        return cam in self._idle
+
+    def __len__(self) -> int:
+        return len(self._idle)
+
+    def acquire(self, name: str, logger_level: int = logging.INFO, **kwargs: Any) -> CameraBase:
+        """ Get a camera from the pool or create it. An idle camera of the same class is reused if its stream
+        configuration is compatible. Otherwise, the camera restarts with the new configuration.
+
+        Args:
+            name:         Name of the camera
+            logger_level: Logging level
+            kwargs:       Camera settings
+
+        Returns:
+            The running camera
+        """
+        cam_class = self.factory.resolve(name)
+        with self._lock:
+            # Cameras are singletons per class. Keep the idle camera from being ended while it gets re-initialized
+            idle = [cam for cam in self._idle if type(cam) is cam_class]
+            for cam in idle:
+                self._idle.pop(cam).cancel()
+            ending = [thread for cam, thread in self._ending.items() if type(cam) is cam_class]
+        # A camera which expired just now must be ended before it can be created again
+        for thread in ending:
+            thread.join()
+        cam = self.factory.create(name, logger_level, **kwargs)
+        if cam in idle and cam.alive:
+            LOGGER.debug(f"Reuse running camera '{cam.name}'")
+        if not cam.resume():
+            LOGGER.warning(f"Camera '{cam.name}' delivered no frame after resume")
+        return cam
+
+    def release(self, cam: CameraBase, idle_timeout: float | None = None) -> None:
+        """ Give a camera back to the pool. The camera is ended after the idle timeout unless it gets re-acquired.
+
+        Args:
+            cam:          The camera
+            idle_timeout: Time in seconds the camera is kept open. Default is the idle timeout of the pool
+        """
+        idle_timeout = self.idle_timeout if idle_timeout is None else idle_timeout
+        if idle_timeout <= 0.0 or not cam.alive:
+            self._discard(cam)
+            cam.end()
+            return
+        if self.pause:
+            cam.pause()
+        timer = Timer(idle_timeout, self._expire, args=(cam,))
+        timer.daemon = True
+        with self._lock:
+            previous = self._idle.pop(cam, None)
+            if previous is not None:
+                previous.cancel()
+            self._idle[cam] = timer
+        timer.start()
+
+    def _discard(self, cam: CameraBase) -> None:
+        with self._lock:
+            timer = self._idle.pop(cam, None)
+        if timer is not None:
+            timer.cancel()
+
+    def _expire(self, cam: CameraBase) -> None:
+        with self._lock:
+            if self._idle.get(cam) is not current_thread():
+                # The camera got re-acquired or released again meanwhile
+                return
+            del self._idle[cam]
+            self._ending[cam] = current_thread()
+        # Ending joins the capture thread, which must not block acquire and release of other cameras
+        LOGGER.debug(f"Close idle camera '{cam.name}'")
+        try:
+            cam.end()
+        finally:
+            with self._lock:
+                self._ending.pop(cam, None)
+
+    def shutdown(self) -> None:
+        """ End all idle cameras and wait until their capture threads stopped """
+        with self._lock:
+            idle, self._idle = self._idle, {}
+            ending = list(self._ending.values())
+        for cam, timer in idle.items():
+            timer.cancel()
+            if timer.is_alive():
+                timer.join()
+            cam.end()
+        for thread in ending:
+            thread.join()
@@ -1,15 +1,20 @@
 from __future__ import annotations
 
 # global
+import time
 import logging
-import cv2 as cv
 import numpy as np
 import pyrealsense2 as rs
+from threading import Lock
 
 # local
+from camera_kit.camera.frameset import FrameSet, Roi
+from camera_kit.camera.frame_buffer import FrameBufferPool
+from camera_kit.view.depth_colorizer import DepthColorizer
 from camera_kit.camera.camera_base import CameraBase
 
 # typing
+from typing import Any
 from numpy import typing as npt
 
 
@@ -19,12 +24,102 @@ LOGGER = logging.getLogger(__name__)
 class CameraRealSense(CameraBase):
 
     type_id = "realsense"
+    # Alignment modes of the depth and color stream
+    align_modes = ("none", "depth_to_color", "color_to_depth", "on_demand")
     _rs_cfg: rs.config | None = None
     _rs_pipeline: rs.pipeline | None = None
+    _depth_scale = 0.0
+    _stream_cfg: tuple[Any, ...] = ()
 
-    def __init__(self, name: str, frame_size: tuple[int, int] = (1280, 720), launch: bool = True) -> None:
+    def __init__(self,
+                 name: str,
+                 frame_size: tuple[int, int] = (1280, 720),
+                 launch: bool = True,
+                 fps: int = 30,
+                 depth_size: tuple[int, int] | None = None,
+                 depth_fps: int | None = None,
+                 align: str = "depth_to_color",
+                 decimation: int = 0,
+                 spatial_filter: bool = False,
+                 temporal_filter: bool = False,
+                 depth_range: tuple[float, float] = (0.0, 8.5)) -> None:
+        """ Intel RealSense camera
+
+        Args:
+            name:            Name of the camera
+            frame_size:      Color image size in pixels
+            launch:          Start the stream immediately
+            fps:             Frame rate of the color stream
+            depth_size:      Depth image size in pixels. Default is the color image size
+            depth_fps:       Frame rate of the depth stream. Default is the color frame rate
+            align:           Alignment mode. One of 'none', 'depth_to_color', 'color_to_depth' or 'on_demand'.
+                             With 'on_demand' depth is aligned to color only when a frame set with depth is requested
+            decimation:      Magnitude of the decimation filter. Values below two disable the filter
+            spatial_filter:  Enable the edge preserving spatial filter
+            temporal_filter: Enable the temporal filter
+            depth_range:     Near and far depth of the depth visualization [m]
+        """
+        if align not in self.align_modes:
+            raise ValueError(f"Unknown alignment mode '{align}'. Choose one of {self.align_modes}")
+        if fps <= 0 or (depth_fps is not None and depth_fps <= 0):
+            raise ValueError(f"Frame rates must be positive")
+        stream_cfg = (tuple(frame_size), fps, tuple(depth_size or frame_size), depth_fps or fps,
+                      align, decimation, spatial_filter, temporal_filter)
+        if self.alive and self._stream_cfg != stream_cfg:
+            # Stream configuration changed. Restart with the new settings
+            self.end()
+        self.fps = fps
+        self.expected_fps = float(fps)
+        self.depth_size: tuple[int, int] = tuple(depth_size or frame_size)  # type: ignore[assignment]
+        self.depth_fps = depth_fps or fps
+        self.align_mode = align
+        self.decimation = decimation
+        self.spatial_filter = spatial_filter
+        self.temporal_filter = temporal_filter
+        self._stream_cfg = stream_cfg
+        if not self.alive:
+            self._filters: list[Any] = []
+            self._align: rs.align | None = None
+            self._align_lock = Lock()
+            # Raw frames of the latest frame set which are aligned on request. Swapped under the pending lock, which
+            # isn't held during the alignment so the capture thread never waits for a consumer
+            self._pending_lock = Lock()
+            self._pending: tuple[FrameSet, Any] | None = None
+            self._aligned: FrameSet | None = None
+            # Reused output buffers. Depth is written by the capture thread or, in on demand mode, by the consumer
+            self._depth_buffers = FrameBufferPool()
+            self._colorized_buffers = FrameBufferPool()
+            self.depth_colorizer = DepthColorizer()
+        self.depth_colorizer.set_range(*depth_range)
         super().__init__(name, frame_size, launch)
 
+    def _configure_streams(self, rs_cfg: rs.config) -> None:
+        """ Enable the depth and color stream with the configured profiles """
+        rs_cfg.enable_stream(rs.stream.depth, self.depth_size[0], self.depth_size[1], rs.format.z16, self.depth_fps)
+        rs_cfg.enable_stream(rs.stream.color, self._frame_size[0], self._frame_size[1], rs.format.bgr8, self.fps)
+
+    def _create_processing_blocks(self) -> None:
+        """ Create the depth filters and the alignment block. Filters run before the alignment. """
+        self._filters = []
+        if self.decimation >= 2:
+            decimation = rs.decimation_filter()
+            decimation.set_option(rs.option.filter_magnitude, self.decimation)
+            self._filters.append(decimation)
+        if self.spatial_filter or self.temporal_filter:
+            # Spatial and temporal filters work best in the disparity domain
+            self._filters.append(rs.disparity_transform(True))
+            if self.spatial_filter:
+                self._filters.append(rs.spatial_filter())
+            if self.temporal_filter:
+                self._filters.append(rs.temporal_filter())
+            self._filters.append(rs.disparity_transform(False))
+        if self.align_mode == "color_to_depth":
+            self._align = rs.align(rs.stream.depth)
+        elif self.align_mode in ("depth_to_color", "on_demand"):
+            self._align = rs.align(rs.stream.color)
+        else:
+            self._align = None
+
     def start(self) -> None:
         self._on_start()
         if not self.alive:
@@ -44,15 +139,17 @@ class CameraRealSense(CameraBase):
                     found_rgb = True
                     break
             if not found_rgb:
-                LOGGER.error("The demo requires Depth camera with Color sensor")
-                exit(0)
+                self._rs_cfg = None
+                self._rs_pipeline = None
+                raise RuntimeError(f"RealSense camera {device_product_line} has no color sensor")
             # Get depth sensor scale
             depth_sensor = device.first_depth_sensor()
-            depth_scale = depth_sensor.get_depth_scale()
-            LOGGER.debug(f"Depth Scale is: {depth_scale}")
+            self._depth_scale = depth_sensor.get_depth_scale()
+            self.depth_colorizer.depth_scale = self._depth_scale
+            LOGGER.debug(f"Depth Scale is: {self._depth_scale}")
             # Configure streams
-            self._rs_cfg.enable_stream(rs.stream.depth, self._frame_size[0], self._frame_size[1], rs.format.z16, 30)
-            self._rs_cfg.enable_stream(rs.stream.color, self._frame_size[0], self._frame_size[1], rs.format.bgr8, 30)
+            self._configure_streams(self._rs_cfg)
+            self._create_processing_blocks()
             # Start streaming
             self._rs_pipeline.start(self._rs_cfg)
             # Start thread
@@ -60,41 +157,162 @@ class CameraRealSense(CameraBase):
             assert self._thread
             self._thread.start()
 
+    def _process(self, frames: Any) -> Any:
+        """ Run the depth filters on a frame set """
+        for f in self._filters:
+            frames = f.process(frames).as_frameset()
+        return frames
+
     def update(self) -> None:
         assert self._rs_cfg
-        assert self._rs_pipeline
-        align_to = rs.stream.color
-        align = rs.align(align_to)
-        while self.alive:
+        pipeline = self._rs_pipeline
+        assert pipeline
+        while self._running():
             # Wait for a coherent pair of frames: depth and color
-            frames = self._rs_pipeline.wait_for_frames()
-            # Align the depth frame to the color frame
-            aligned_frames = align.process(frames)
-
-            # Get aligned frames
-            aligned_depth_frame = aligned_frames.get_depth_frame()
-            color_frame = aligned_frames.get_color_frame()
-
+            try:
+                frames = pipeline.wait_for_frames()
+            except RuntimeError as e:
+                # Keep the thread alive. Consumers see stale frames and the watchdog can restart the device
+                if self._running():
+                    self.metrics.read_errors += 1
+                    LOGGER.debug(f"Can't receive frames from camera '{self._name}': {e}")
+                    time.sleep(1.0 / self.expected_fps)
+                continue
+            if not self._frame_arrived():
+                # Drop the frame before filtering, alignment and colorizing
+                continue
+            frames = self._process(frames)
+            if self.align_mode == "on_demand":
+                color_frame = frames.get_color_frame()
+                if not color_frame:
+                    continue
+                # Keep the raw frames to align them when depth gets requested
+                frames.keep()
+                host_timestamp, capture_time = self._frame_times(color_frame)
+                frameset = self._publish(self._copy_roi(color_frame, self._color_buffers),
+                                         hw_timestamp=color_frame.get_timestamp(), host_timestamp=host_timestamp,
+                                         capture_time=capture_time)
+                with self._pending_lock:
+                    self._pending = (frameset, frames)
+                continue
+            if self._align is not None:
+                # Align the depth and the color frame
+                frames = self._align.process(frames)
+            depth_frame = frames.get_depth_frame()
+            color_frame = frames.get_color_frame()
             # Validate that both frames are valid
-            if not aligned_depth_frame or not color_frame:
+            if not depth_frame or not color_frame:
                 continue
             else:
-                # Convert images to numpy arrays
-                self.color_frame = np.asanyarray(color_frame.get_data(), dtype=np.uint8)
-                pixel_distance_in_meters = aligned_depth_frame.get_distance(2 * 35, 2 * 117)
-                # print(pixel_distance_in_meters)
-                depth_image = np.asanyarray(aligned_depth_frame.get_data(), dtype=np.uint16)
-                # print((self.depth_scale * depth_image[2*224, 2*207]))
-                # self.depth_frame = depth_image
-                # Apply colormap on depth image (image must be converted to 8-bit per pixel first)
-                self.depth_frame = cv.applyColorMap(cv.convertScaleAbs(depth_image, alpha=0.03), cv.COLORMAP_TURBO)
-
-    def get_depth_frame(self) -> npt.NDArray[np.uint8]:
-        return self.depth_frame
+                self._publish_frames(color_frame, depth_frame)
+
+    @staticmethod
+    def _frame_times(frame: Any) -> tuple[float, float]:
+        """ Arrival time at the host and capture time of a RealSense frame in the host clock [s]. NaN if unknown """
+        host_timestamp = float('nan')
+        if frame.supports_frame_metadata(rs.frame_metadata_value.time_of_arrival):
+            # The driver stamps the arrival in the system clock before the frame passes the processing queues
+            host_timestamp = 1e-3 * frame.get_frame_metadata(rs.frame_metadata_value.time_of_arrival)
+        capture_time = float('nan')
+        if frame.get_frame_timestamp_domain() == rs.timestamp_domain.global_time:
+            # librealsense maps the device clock onto the host clock itself
+            capture_time = 1e-3 * frame.get_timestamp()
+        return host_timestamp, capture_time
+
+    @staticmethod
+    def _copy_frame(frame: Any, buffers: FrameBufferPool) -> npt.NDArray[Any]:
+        """ Copy the data of a RealSense frame into a reused buffer. This returns the frame to the driver's frame
+        pool immediately instead of when the last consumer releases the published array.
+        """
+        data = np.asanyarray(frame.get_data())
+        buffer = buffers.get(data.shape, data.dtype)
+        np.copyto(buffer, data)
+        return buffer
+
+    def _copy_roi(self, frame: Any, buffers: FrameBufferPool) -> npt.NDArray[Any]:
+        """ Copy only the capture region of a RealSense frame into a reused buffer """
+        data = np.asanyarray(frame.get_data())
+        sl = self._capture_slices(data.shape)
+        if sl is None:
+            return self._copy_frame(frame, buffers)
+        buffer = buffers.get(data.shape, data.dtype)
+        np.copyto(buffer[sl], data[sl])
+        return buffer
+
+    def _colorize(self, depth_image: npt.NDArray[np.uint16]) -> npt.NDArray[np.uint8]:
+        """ Colorize the depth image for visualization. With a capture region only the region is colorized """
+        colorized = self._colorized_buffers.get(depth_image.shape + (3,))
+        sl = self._capture_slices(depth_image.shape)
+        if sl is None:
+            return self.depth_colorizer.colorize(depth_image, colorized)
+        self.depth_colorizer.colorize(depth_image[sl], colorized[sl])
+        return colorized
+
+    def _reset_buffers(self) -> None:
+        super()._reset_buffers()
+        zeroed = self.capture_roi is not None
+        self._depth_buffers = FrameBufferPool(zeroed=zeroed)
+        self._colorized_buffers = FrameBufferPool(zeroed=zeroed)
+
+    def _publish_frames(self, color_frame: Any, depth_frame: Any) -> FrameSet:
+        # Copy the images into reused buffers
+        color_image = self._copy_roi(color_frame, self._color_buffers)
+        depth_image = self._copy_roi(depth_frame, self._depth_buffers)
+        self.depth_frame = self._colorize(depth_image)
+        # Publish color and depth data of the same frameset at once
+        host_timestamp, capture_time = self._frame_times(color_frame)
+        return self._publish(color_image, depth_image, self._depth_scale, color_frame.get_timestamp(),
+                             host_timestamp, capture_time)
+
+    def _align_pending(self) -> None:
+        """ Align the latest raw frames in the caller thread if depth data is requested in on demand mode """
+        pending = self._pending
+        if pending is None or self._align is None:
+            return
+        frameset, frames = pending
+        with self._align_lock:
+            if self._pending is not pending:
+                return
+            aligned = self._align.process(frames)
+            depth_frame = aligned.get_depth_frame()
+            if not depth_frame:
+                return
+            depth_image = self._copy_roi(depth_frame, self._depth_buffers).view()
+            depth_image.flags.writeable = False
+            self.depth_frame = self._colorize(depth_image)
+            aligned_set = FrameSet(frameset.color, depth_image, self._depth_scale, frameset.hw_timestamp,
+                                   frameset.host_timestamp, frameset.seq_id, frameset.capture_time)
+            with self._pending_lock:
+                # Keep a newer frame set which the capture thread published during the alignment
+                if self._pending is pending:
+                    self._pending = None
+            self._aligned = aligned_set
+
+    def get_frameset(self) -> FrameSet:
+        frameset = super().get_frameset()
+        if self.align_mode == "on_demand":
+            self._align_pending()
+            aligned = self._aligned
+            # The aligned frame set replaces its color-only counterpart if no newer frame set arrived meanwhile
+            if aligned is not None and aligned.seq_id >= frameset.seq_id:
+                self._consumed.frameset = aligned
+                return aligned
+        return frameset
+
+    def get_depth_frame(self, roi: Roi | str | None = None, scale: float = 1.0) -> npt.NDArray[np.uint8]:
+        if self.align_mode == "on_demand":
+            self._align_pending()
+        # The colorized image is a reused buffer. Consumers get a copy or a read-only view of it
+        return super().get_depth_frame(roi, scale)
 
     def end(self) -> None:
         self._on_end()
         if self._rs_pipeline is not None:
-            self._rs_pipeline.stop()
+            try:
+                self._rs_pipeline.stop()
+            except RuntimeError as e:
+                LOGGER.debug(f"Can't stop pipeline of camera '{self._name}': {e}")
             self._rs_cfg = None
             self._rs_pipeline = None
+        self._pending = None
+        self._aligned = None
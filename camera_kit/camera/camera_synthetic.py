@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+# global
+import time
+import logging
+import cv2 as cv
+import numpy as np
+
+# local
+from camera_kit.camera import CameraCoefficient
+from camera_kit.camera.frameset import FrameSet, Roi, roi_slices
+from camera_kit.camera.camera_base import CameraBase
+from camera_kit.utilities.projection import undistort_normalized
+
+# typing
+from typing import Any, Sequence, TYPE_CHECKING
+from numpy import typing as npt
+if TYPE_CHECKING:
+    import spatialmath as sm
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class CameraSynthetic(CameraBase):
+    """ Camera which renders a calibration board at scripted poses. The frames are rendered with the camera
+        coefficients including distortion and come with the ground truth pose of the board.
+
+        The board frame has its origin in the top left inner corner of a chessboard or in the top left corner of the
+        first marker of an ArUco grid board. The x-axis points right, the y-axis down and the z-axis into the board.
+    """
+
+    type_id = "synthetic"
+    background_value = 128
+    pixels_per_field = 64
+
+    def __init__(self,
+                 name: str,
+                 frame_size: tuple[int, int] = (1280, 720),
+                 launch: bool = True,
+                 poses: Sequence[sm.SE3] | None = None,
+                 board: str = "chessboard",
+                 board_size: tuple[int, int] = (10, 7),
+                 field_size: float = 0.03,
+                 marker_separation: float = 0.006,
+                 aruco_dict: int = cv.aruco.DICT_4X4_50,
+                 cc: CameraCoefficient | None = None,
+                 fps: float = 30.0,
+                 noise_std: float = 0.0,
+                 blur_size: int = 0,
+                 loop: bool = True,
+                 seed: int | None = None,
+                 latency: float = 0.0) -> None:
+        """ Synthetic camera
+
+        Args:
+            name:              Name of the camera
+            frame_size:        Image size in pixels
+            launch:            Start the stream immediately
+            poses:             Poses of the board in the camera frame. Default are random poses in front of the camera
+            board:             Board type 'chessboard' or 'aruco'
+            board_size:        Number of chessboard fields or ArUco markers (columns, rows)
+            field_size:        Size of a chessboard field or an ArUco marker [m]
+            marker_separation: Gap between two ArUco markers [m]
+            aruco_dict:        OpenCV id of the ArUco dictionary
+            cc:                Camera coefficients. Default is a pinhole camera without distortion
+            fps:               Frame rate of the stream
+            noise_std:         Standard deviation of additive gaussian pixel noise
+            blur_size:         Kernel size of a gaussian blur. Zero disables blurring
+            loop:              Restart with the first pose after the last one. Otherwise, the last pose is kept
+            seed:              Seed of the random number generator
+            latency:           Emulated time between the exposure and the arrival of a frame at the host [s]
+        """
+        super().__init__(name, frame_size, launch=False)
+        self.board = board
+        self.board_size = board_size
+        self.field_size = field_size
+        self.marker_separation = marker_separation
+        self.aruco_dict = aruco_dict
+        self.fps = fps
+        self.expected_fps = fps
+        self.noise_std = noise_std
+        self.blur_size = blur_size
+        self.loop = loop
+        self.latency = latency
+        self._rng = np.random.default_rng(seed)
+        if cc is None:
+            cc = CameraCoefficient(name)
+            width, height = frame_size
+            cc.intrinsic = np.array([[width, 0.0, (width - 1) / 2],
+                                     [0.0, width, (height - 1) / 2],
+                                     [0.0, 0.0, 1.0]])
+        self.cc = cc
+        self.is_calibrated = True
+        self._texture, self._texture_scale, self._texture_offset = self._create_texture()
+        self._rays: npt.NDArray[np.float64] | None = None
+        self._rays_key = b""
+        self.poses: list[npt.NDArray[np.float64]] = [
+            self._as_matrix(p) for p in (poses if poses is not None else self.random_poses(50, seed=seed))]
+        # Latest frame set and matching board pose. Published with a single reference swap
+        self._sample: tuple[FrameSet, npt.NDArray[np.float64]] = (self._frameset, np.full((4, 4), np.nan))
+        if launch:
+            self.start()
+
+    @staticmethod
+    def _as_matrix(pose: Any) -> npt.NDArray[np.float64]:
+        return np.array(pose.A if hasattr(pose, 'A') else pose, dtype=np.float64).reshape(4, 4)
+
+    @property
+    def board_extent(self) -> tuple[float, float]:
+        """ Width and height of the pattern area of the board [m] """
+        if self.board == 'aruco':
+            step = self.field_size + self.marker_separation
+            return (self.board_size[0] * step - self.marker_separation,
+                    self.board_size[1] * step - self.marker_separation)
+        # Distance between the outer inner corners of the chessboard
+        return (self.board_size[0] - 2) * self.field_size, (self.board_size[1] - 2) * self.field_size
+
+    def random_poses(self,
+                     n_poses: int,
+                     distance: float = 0.5,
+                     max_tilt: float = 0.6,
+                     max_offset: float = 0.1,
+                     seed: int | None = None) -> list[sm.SE3]:
+        """ Create random board poses in front of the camera, e.g. for calibration benchmarks
+
+        Args:
+            n_poses:    Number of poses
+            distance:   Mean distance between camera and board [m]
+            max_tilt:   Maximal tilt of the board around its x- and y-axis [rad]
+            max_offset: Maximal lateral offset of the board center [m]
+            seed:       Seed of the random number generator
+
+        Returns:
+            List of board poses in the camera frame
+        """
+        import spatialmath as sm
+        rng = np.random.default_rng(seed)
+        width, height = self.board_extent
+        poses = []
+        for _ in range(n_poses):
+            rx, ry = rng.uniform(-max_tilt, max_tilt, 2)
+            rz = rng.uniform(-0.2, 0.2)
+            x, y = rng.uniform(-max_offset, max_offset, 2)
+            z = distance * rng.uniform(0.8, 1.2)
+            pose = (sm.SE3.Trans(x, y, z) * sm.SE3.Rx(rx) * sm.SE3.Ry(ry) * sm.SE3.Rz(rz)
+                    * sm.SE3.Trans(-width / 2, -height / 2, 0.0))
+            poses.append(pose)
+        return poses
+
+    def _create_texture(self) -> tuple[npt.NDArray[np.uint8], float, float]:
+        """ Create the board image
+
+        Returns:
+            (Board image; Texture pixels per meter; Texture pixel offset of the board origin)
+        """
+        ppf = self.pixels_per_field
+        if self.board == 'chessboard':
+            n_x, n_y = self.board_size
+            fields = (np.indices((n_y, n_x)).sum(axis=0) % 2).astype(np.uint8) * 255
+            pattern = np.kron(fields, np.ones((ppf, ppf), dtype=np.uint8))
+            texture = np.pad(pattern, ppf, constant_values=255)
+            # Origin is the first inner corner
+            offset = 2.0 * ppf
+        elif self.board == 'aruco':
+            dictionary = cv.aruco.getPredefinedDictionary(self.aruco_dict)
+            grid = cv.aruco.GridBoard(self.board_size, self.field_size, self.marker_separation, dictionary)
+            width, height = self.board_extent
+            size = (int(round(width / self.field_size * ppf)), int(round(height / self.field_size * ppf)))
+            pattern = grid.generateImage(size, marginSize=0, borderBits=1)
+            texture = np.pad(pattern, ppf, constant_values=255)
+            offset = float(ppf)
+        else:
+            raise ValueError(f"Unknown board type '{self.board}'. Use 'chessboard' or 'aruco'")
+        return texture, ppf / self.field_size, offset
+
+    def _pixel_rays(self) -> npt.NDArray[np.float64]:
+        """ Normalized undistorted image coordinates of all pixels. Recomputed if the coefficients change. """
+        key = self.cc.intrinsic.tobytes() + self.cc.distortion.tobytes()
+        if self._rays is None or key != self._rays_key:
+            width, height = self._frame_size
+            k = self.cc.intrinsic
+            u, v = np.meshgrid(np.arange(width, dtype=np.float64), np.arange(height, dtype=np.float64))
+            y_d = (v - k[1, 2]) / k[1, 1]
+            x_d = (u - k[0, 2]) / k[0, 0]
+            rays = undistort_normalized(np.stack([x_d, y_d], axis=-1), self.cc.distortion)
+            self._rays = rays.reshape(height, width, 2)
+            self._rays_key = key
+        return self._rays
+
+    def render_pose(self,
+                    pose: sm.SE3 | npt.NDArray[np.float64],
+                    dst: npt.NDArray[np.uint8] | None = None,
+                    roi: Roi | None = None) -> npt.NDArray[np.uint8]:
+        """ Render the board at the given pose
+
+        Args:
+            pose: Board pose in the camera frame
+            dst:  Optional output buffer of the frame size
+            roi:  Optional region (x, y, width, height) in pixels. Only this region of the output is rendered
+
+        Returns:
+            Color image
+        """
+        mat = self._as_matrix(pose)
+        # Homography from board plane to normalized image coordinates and its inverse
+        h_mat = np.column_stack([mat[:3, 0], mat[:3, 1], mat[:3, 3]])
+        h_inv = np.linalg.inv(h_mat)
+        rays = self._pixel_rays()
+        if roi is not None:
+            rays = rays[roi_slices(roi)]
+        plane = rays[..., 0:1] * h_inv[:, 0] + rays[..., 1:2] * h_inv[:, 1] + h_inv[:, 2]
+        w = plane[..., 2]
+        # Pixels which see the back side or look away from the board are mapped outside the texture
+        w = np.where(w > 0.0, w, np.nan)
+        map_x = (plane[..., 0] / w * self._texture_scale + self._texture_offset - 0.5).astype(np.float32)
+        map_y = (plane[..., 1] / w * self._texture_scale + self._texture_offset - 0.5).astype(np.float32)
+        np.nan_to_num(map_x, copy=False, nan=-1.0)
+        np.nan_to_num(map_y, copy=False, nan=-1.0)
+        gray = cv.remap(self._texture, map_x, map_y, cv.INTER_LINEAR,
+                        borderMode=cv.BORDER_CONSTANT, borderValue=self.background_value)
+        if self.blur_size > 0:
+            k_size = self.blur_size | 1
+            gray = cv.GaussianBlur(gray, (k_size, k_size), 0)
+        if self.noise_std > 0.0:
+            noise = self._rng.normal(0.0, self.noise_std, gray.shape)
+            gray = np.clip(gray + noise, 0, 255).astype(np.uint8)
+        if roi is None:
+            return cv.cvtColor(gray, cv.COLOR_GRAY2BGR, dst=dst)  # type: ignore[no-any-return]
+        if dst is None:
+            width, height = self._frame_size
+            dst = np.zeros((height, width, 3), dtype=np.uint8)
+        cv.cvtColor(gray, cv.COLOR_GRAY2BGR, dst=dst[roi_slices(roi)])
+        return dst
+
+    def get_pose(self) -> tuple[int, sm.SE3]:
+        """ Get the ground truth pose of the board in the current frame
+
+        Returns:
+            (Sequence id of the frame set; Board pose in the camera frame)
+        """
+        import spatialmath as sm
+        frameset, pose = self._sample
+        return frameset.seq_id, sm.SE3(pose, check=False)
+
+    def get_frame_and_pose(self) -> tuple[npt.NDArray[np.uint8], sm.SE3]:
+        """ Get the current frame together with the matching ground truth pose
+
+        Returns:
+            (Color image; Board pose in the camera frame)
+        """
+        import spatialmath as sm
+        self._request_frame()
+        frameset, pose = self._sample
+        self._consume(frameset)
+        return np.array(frameset.color, dtype=np.uint8), sm.SE3(pose, check=False)
+
+    def get_depth_frame(self, roi: Roi | str | None = None, scale: float = 1.0) -> npt.NDArray[np.uint8]:
+        raise NotImplementedError(f"Synthetic camera didn't provide depth information!")
+
+    def start(self) -> None:
+        self._on_start()
+        if not self.alive:
+            self.alive = True
+            assert self._thread
+            self._thread.start()
+
+    def update(self) -> None:
+        period = 1.0 / self.fps if self.fps > 0.0 else 0.0
+        idx = 0
+        start_time = next_time = time.perf_counter()
+        while self._running() and self.poses:
+            pose = self.poses[idx]
+            if self._frame_arrived():
+                exposed_at = time.time()
+                width, height = self._frame_size
+                frame = self.render_pose(pose, self._color_buffers.get((height, width, 3)), self.capture_roi)
+                # Emulate a device clock in milliseconds which ticks at the scripted frame rate
+                hw_timestamp = 1e3 * (next_time - start_time)
+                # Emulate the transfer to the host
+                time.sleep(max(0.0, exposed_at + self.latency - time.time()))
+                frameset = self._publish(frame, hw_timestamp=hw_timestamp, host_timestamp=time.time(),
+                                         capture_time=exposed_at)
+                self._sample = (frameset, pose)
+            idx += 1
+            if idx >= len(self.poses):
+                idx = 0 if self.loop else len(self.poses) - 1
+            next_time += period
+            time.sleep(max(0.0, next_time - time.perf_counter()))
+
+    def end(self) -> None:
+        self._on_end()
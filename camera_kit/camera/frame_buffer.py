@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+# global
+import logging
+import weakref
+import threading
+import numpy as np
+from collections import deque
+
+# typing
+from typing import Any, Deque
+from numpy import typing as npt
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class _BufferLease:
+    """ Owner of a handed out buffer. All arrays derived from the handed out buffer keep the lease alive, so the
+        buffer returns to the pool when the last of them is released.
+    """
+    __slots__ = ('__array_interface__', '_storage', '__weakref__')
+
+    def __init__(self, storage: npt.NDArray[Any]) -> None:
+        self.__array_interface__ = storage.__array_interface__
+        self._storage = storage
+
+
+class FrameBufferPool:
+    """ Reusable output buffers of a capture loop. A buffer is handed out again only if no published frame set or
+        other consumer still references it, so the pool grows to the number of frames consumers hold at the same time.
+    """
+
+    def __init__(self, size: int = 3, max_size: int = 32, zeroed: bool = False) -> None:
+        """ Frame buffer pool initialization
+
+        Args:
+            size:     Number of buffers which are allocated up front
+            max_size: Maximal number of buffers. If all buffers are in use, a temporary buffer is allocated
+            zeroed:   Allocate buffers filled with zeros. Used if the capture loop writes only a region of the buffers
+        """
+        self.size = size
+        self.max_size = max_size
+        self._alloc = np.zeros if zeroed else np.empty
+        self._shape: tuple[int, ...] = ()
+        self._dtype: np.dtype[Any] = np.dtype(np.uint8)
+        self._storages: list[npt.NDArray[Any]] = []
+        # Indices of the buffers which aren't handed out. The oldest released buffer is handed out first, which
+        # keeps the most recently published buffers untouched as long as possible
+        self._free: Deque[int] = deque()
+        self._generation = 0
+        # Reentrant since a garbage collection inside get() can release a buffer
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._storages)
+
+    @property
+    def n_free(self) -> int:
+        """ Number of buffers which are not handed out """
+        return len(self._free)
+
+    def _release(self, generation: int, idx: int) -> None:
+        # Called when the last array of a handed out buffer is released. Possibly from another thread
+        with self._lock:
+            if generation == self._generation:
+                self._free.append(idx)
+
+    def _lease(self, idx: int) -> npt.NDArray[Any]:
+        lease = _BufferLease(self._storages[idx])
+        weakref.finalize(lease, self._release, self._generation, idx).atexit = False
+        return np.asarray(lease)
+
+    def get(self, shape: tuple[int, ...], dtype: npt.DTypeLike = np.uint8) -> npt.NDArray[Any]:
+        """ Get a buffer which is not referenced by any consumer. The content of the buffer is undefined unless the
+        pool allocates zeroed buffers, in which case it's zero up to what the capture loop wrote before.
+
+        Args:
+            shape: Shape of the buffer
+            dtype: Data type of the buffer
+
+        Returns:
+            The buffer
+        """
+        dtype = np.dtype(dtype)
+        with self._lock:
+            if tuple(shape) != self._shape or dtype != self._dtype:
+                # The frame format changed. Buffers still held by consumers are released by them
+                self._shape, self._dtype = tuple(shape), dtype
+                self._storages = [self._alloc(shape, dtype) for _ in range(self.size)]
+                self._free = deque(range(self.size))
+                self._generation += 1
+            if self._free:
+                return self._lease(self._free.popleft())
+            n_buffers = len(self._storages)
+            if n_buffers < self.max_size:
+                LOGGER.debug(f"All {n_buffers} frame buffers are in use. Grow the pool")
+                self._storages.append(self._alloc(shape, dtype))
+                return self._lease(n_buffers)
+        return self._alloc(shape, dtype)  # type: ignore[no-any-return]
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+# global
+import cv2 as cv
+import numpy as np
+
+# typing
+from typing import Any, Dict, Tuple
+from numpy import typing as npt
+
+
+# Rectangular image region (x, y, width, height) in pixels
+Roi = Tuple[int, int, int, int]
+
+
+def clip_roi(roi: Roi, image_size: tuple[int, int]) -> Roi:
+    """ Clip a region to the image bounds
+
+    Args:
+        roi:        Region (x, y, width, height) in pixels
+        image_size: Image size (width, height) in pixels
+
+    Returns:
+        The clipped region
+    """
+    x, y, w, h = (int(v) for v in roi)
+    x0, y0 = min(max(x, 0), image_size[0]), min(max(y, 0), image_size[1])
+    x1, y1 = min(max(x + w, x0), image_size[0]), min(max(y + h, y0), image_size[1])
+    if x1 <= x0 or y1 <= y0:
+        raise ValueError(f"Region {roi} doesn't overlap the image of size {image_size}")
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def roi_slices(roi: Roi) -> tuple[slice, slice]:
+    """ Row and column slices of a region """
+    x, y, w, h = roi
+    return slice(y, y + h), slice(x, x + w)
+
+
+class ImageViews:
+    """ Cropped and scaled views of an image. Crops are views without a copy. Scaled images are computed once and
+        shared by all requesters of the same region and scale. The image must not change while views are requested.
+    """
+    __slots__ = ('image', 'interpolation', '_scaled')
+
+    def __init__(self, image: npt.NDArray[Any], interpolation: int | None = None) -> None:
+        """ Image views
+
+        Args:
+            image:         Source image
+            interpolation: OpenCV interpolation of scaled images. Default is area interpolation for downscaling and
+                           linear interpolation for upscaling
+        """
+        self.image = image
+        self.interpolation = interpolation
+        self._scaled: Dict[Tuple[Roi | None, float], npt.NDArray[Any]] = {}
+
+    def get(self, roi: Roi | None = None, scale: float = 1.0) -> npt.NDArray[Any]:
+        """ Get a view of the image
+
+        Args:
+            roi:   Region (x, y, width, height) in pixels. It's clipped to the image. Default is the whole image
+            scale: Scale factor of the view
+
+        Returns:
+            Read-only view of the region, scaled by the given factor
+        """
+        if scale <= 0.0:
+            raise ValueError(f"Scale must be positive")
+        img = self.image
+        if roi is not None:
+            roi = clip_roi(roi, (img.shape[1], img.shape[0]))
+            img = img[roi_slices(roi)]
+        if scale == 1.0:
+            view: npt.NDArray[Any] = img.view()
+            view.flags.writeable = False
+            return view
+        key = (roi, float(scale))
+        scaled = self._scaled.get(key)
+        if scaled is None:
+            interpolation = self.interpolation
+            if interpolation is None:
+                interpolation = cv.INTER_AREA if scale < 1.0 else cv.INTER_LINEAR
+            size = (max(1, round(img.shape[1] * scale)), max(1, round(img.shape[0] * scale)))
+            scaled = cv.resize(img, size, interpolation=interpolation)
+            scaled.flags.writeable = False
+            # Concurrent requesters of the same view end up with the same array
+            scaled = self._scaled.setdefault(key, scaled)
+        return scaled
+
+
+class FrameSet:
+    """ Immutable bundle of all data captured at the same time. Cameras publish a new bundle with a single
+        reference swap so consumers always get matching color and depth data.
+
+        color:          Color image (BGR)
+        depth:          Raw depth image or None if the camera has no depth stream. Pixel aligned to the color image
+                        unless the camera is configured otherwise
+        depth_scale:    Factor to convert raw depth values into meters
+        hw_timestamp:   Device timestamp of the frame [ms]. NaN if the device doesn't provide timestamps
+        host_timestamp: Time when the frame arrived at the host [s] (time.time)
+        seq_id:         Sequence id of the frame. Increases by one with every published frame set
+        capture_time:   Time when the frame was exposed in the host clock [s] (time.time). Estimated from the device
+                        timestamp if the device clock isn't synchronized with the host. Equals the host timestamp if
+                        the device doesn't provide timestamps
+    """
+    __slots__ = ('color', 'depth', 'depth_scale', 'hw_timestamp', 'host_timestamp', 'seq_id', 'capture_time',
+                 '_color_views', '_depth_views')
+
+    color: npt.NDArray[np.uint8]
+    depth: npt.NDArray[np.uint16] | None
+    depth_scale: float
+    hw_timestamp: float
+    host_timestamp: float
+    seq_id: int
+    capture_time: float
+    _color_views: ImageViews
+    _depth_views: ImageViews | None
+
+    def __init__(self,
+                 color: npt.NDArray[np.uint8],
+                 depth: npt.NDArray[np.uint16] | None = None,
+                 depth_scale: float = 0.0,
+                 hw_timestamp: float = float('nan'),
+                 host_timestamp: float = float('nan'),
+                 seq_id: int = -1,
+                 capture_time: float | None = None) -> None:
+        set_attr = object.__setattr__
+        set_attr(self, 'color', color)
+        set_attr(self, 'depth', depth)
+        set_attr(self, 'depth_scale', depth_scale)
+        set_attr(self, 'hw_timestamp', hw_timestamp)
+        set_attr(self, 'host_timestamp', host_timestamp)
+        set_attr(self, 'seq_id', seq_id)
+        set_attr(self, 'capture_time', host_timestamp if capture_time is None else capture_time)
+        set_attr(self, '_color_views', ImageViews(color))
+        # Interpolation would mix depth values of foreground and background
+        set_attr(self, '_depth_views', None if depth is None else ImageViews(depth, cv.INTER_NEAREST))
+
+    def __setattr__(self, key: str, value: object) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self) -> str:
+        depth_shape = None if self.depth is None else self.depth.shape
+        return (f"{type(self).__name__}(seq_id={self.seq_id}, color={self.color.shape}, depth={depth_shape}, "
+                f"hw_timestamp={self.hw_timestamp}, host_timestamp={self.host_timestamp})")
+
+    def color_view(self, roi: Roi | None = None, scale: float = 1.0) -> npt.NDArray[np.uint8]:
+        """ Get a region of the color image. Regions are views without a copy, scaled images are computed once per
+        frame set and shared by all consumers.
+
+        Args:
+            roi:   Region (x, y, width, height) in pixels. Default is the whole image
+            scale: Scale factor
+
+        Returns:
+            Read-only color image
+        """
+        return self._color_views.get(roi, scale)  # type: ignore[no-any-return]
+
+    def depth_view(self, roi: Roi | None = None, scale: float = 1.0) -> npt.NDArray[np.uint16]:
+        """ Get a region of the raw depth image. Depth is scaled with nearest neighbor interpolation.
+
+        Args:
+            roi:   Region (x, y, width, height) in pixels. Default is the whole image
+            scale: Scale factor
+
+        Returns:
+            Read-only raw depth image
+        """
+        if self._depth_views is None:
+            raise RuntimeError("Frame set contains no depth data")
+        return self._depth_views.get(roi, scale)  # type: ignore[no-any-return]
+
+    @property
+    def depth_meters(self) -> npt.NDArray[np.float32]:
+        """ Depth image in meters """
+        if self.depth is None:
+            raise RuntimeError("Frame set contains no depth data")
+        return self.depth.astype(np.float32) * np.float32(self.depth_scale)  # type: ignore[no-any-return]
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+# global
+import time
+import logging
+import numpy as np
+from collections import deque
+from threading import Lock
+
+# typing
+from typing import Dict, Tuple, TYPE_CHECKING
+from numpy import typing as npt
+if TYPE_CHECKING:
+    from camera_kit.camera.frameset import FrameSet
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class DeviceClock:
+    """ Maps device timestamps onto the host clock. The offset between both clocks is the minimum of arrival time
+        minus device time over the latest frames, which assumes that the fastest transfers take almost no time.
+        Mapped times are therefore a lower bound of the true capture time.
+    """
+
+    # Offset change in seconds which is treated as a reset of the device clock
+    reset_threshold = 1.0
+
+    def __init__(self, window: int = 300) -> None:
+        """ Device clock initialization
+
+        Args:
+            window: Number of frames over which the minimal offset is taken. Limits the effect of clock drift
+        """
+        self._offsets: deque[float] = deque(maxlen=window)
+
+    def reset(self) -> None:
+        self._offsets.clear()
+
+    def to_host(self, hw_timestamp: float, arrival: float) -> float:
+        """ Map a device timestamp onto the host clock
+
+        Args:
+            hw_timestamp: Device timestamp of the frame [ms]
+            arrival:      Time when the frame arrived at the host [s] (time.time)
+
+        Returns:
+            Capture time in the host clock [s]
+        """
+        device_time = 1e-3 * hw_timestamp
+        offset = arrival - device_time
+        if self._offsets and offset - min(self._offsets) > self.reset_threshold:
+            LOGGER.debug("Device clock jumped. Reset clock offset")
+            self._offsets.clear()
+        self._offsets.append(offset)
+        return device_time + min(self._offsets)
+
+
+class LatencyTracer:
+    """ Collects the latency of frames from their capture to the processing stages. Cameras record the stages
+        'arrival' (frame received by the host), 'publish' (frame processed and published), 'consume' (frame requested
+        by a consumer) and 'render' (frame shown). Detectors record 'pose <detector>' when a pose is ready.
+    """
+
+    def __init__(self, capacity: int = 10000) -> None:
+        """ Latency tracer initialization
+
+        Args:
+            capacity: Number of latest samples which are kept per source and stage
+        """
+        self.capacity = capacity
+        self._lock = Lock()
+        self._samples: Dict[Tuple[str, str], npt.NDArray[np.float64]] = {}
+        self._counts: Dict[Tuple[str, str], int] = {}
+
+    def record(self, source: str, stage: str, frameset: FrameSet, timestamp: float | None = None) -> None:
+        """ Record the latency of a frame set at a stage
+
+        Args:
+            source:    Name of the camera
+            stage:     Name of the stage
+            frameset:  The processed frame set
+            timestamp: Time when the stage finished [s] (time.time). Default is now
+        """
+        t = time.time() if timestamp is None else timestamp
+        latency = t - frameset.capture_time
+        if latency != latency:
+            return
+        key = (source, stage)
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = np.empty(self.capacity)
+                self._counts[key] = 0
+            count = self._counts[key]
+            samples[count % self.capacity] = latency
+            self._counts[key] = count + 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+    def samples(self, source: str, stage: str) -> npt.NDArray[np.float64]:
+        """ Latest latencies [s] of a stage in recording order """
+        with self._lock:
+            key = (source, stage)
+            if key not in self._samples:
+                return np.zeros(0)
+            count, samples = self._counts[key], self._samples[key]
+            ordered: npt.NDArray[np.float64]
+            if count <= self.capacity:
+                ordered = samples[:count].copy()
+            else:
+                idx = count % self.capacity
+                ordered = np.concatenate([samples[idx:], samples[:idx]])
+            return ordered
+
+    def summary(self) -> dict[tuple[str, str], dict[str, float]]:
+        """ Latency distribution per source and stage
+
+        Returns:
+            Number of samples and mean, median, 90th and 99th percentile and maximum of the latency [ms]
+        """
+        with self._lock:
+            keys = list(self._samples)
+        result = {}
+        for source, stage in sorted(keys, key=lambda k: (k[0], self._stage_order(k[1]))):
+            lat = 1e3 * self.samples(source, stage)
+            if len(lat) == 0:
+                # Reset since the keys were taken
+                continue
+            p50, p90, p99 = np.percentile(lat, [50.0, 90.0, 99.0])
+            result[(source, stage)] = {'count': float(len(lat)), 'mean': float(np.mean(lat)), 'p50': float(p50),
+                                       'p90': float(p90), 'p99': float(p99), 'max': float(np.max(lat))}
+        return result
+
+    @staticmethod
+    def _stage_order(stage: str) -> int:
+        order = ('arrival', 'publish', 'consume', 'pose', 'render')
+        name = stage.split(' ', 1)[0]
+        return order.index(name) if name in order else len(order)
+
+    def report(self) -> str:
+        """ Table of the latency distribution since capture [ms] """
+        lines = [f"{'source':<16}{'stage':<26}{'count':>7}{'mean':>8}{'p50':>8}{'p90':>8}{'p99':>8}{'max':>8}"]
+        for (source, stage), s in self.summary().items():
+            lines.append(f"{source:<16}{stage:<26}{int(s['count']):>7}{s['mean']:>8.2f}{s['p50']:>8.2f}"
+                         f"{s['p90']:>8.2f}{s['p99']:>8.2f}{s['max']:>8.2f}")
+        return "\n".join(lines)
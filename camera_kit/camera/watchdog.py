@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+# global
+import time
+import logging
+from threading import Event, Thread
+
+# typing
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from camera_kit.camera.camera_base import CameraBase
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class StaleFrameError(RuntimeError):
+    """ Raised when a consumer requests a frame from a stalled camera stream """
+
+
+class CaptureMetrics:
+    """ Counters of a camera capture stream
+
+        frames:      Number of published frames
+        skipped:     Number of received frames which were dropped by the throttling without processing
+        read_errors: Number of failed frame reads
+        stalls:      Number of detected stream stalls
+        reconnects:  Number of successful device restarts
+    """
+
+    def __init__(self) -> None:
+        self.frames = 0
+        self.skipped = 0
+        self.read_errors = 0
+        self.stalls = 0
+        self.reconnects = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return dict(vars(self))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{k}={v}' for k, v in vars(self).items())})"
+
+
+class CaptureWatchdog:
+    """ Supervisor which detects stalled camera streams and restarts the device with exponential backoff """
+
+    def __init__(self,
+                 camera: CameraBase,
+                 stall_factor: float = 10.0,
+                 min_stall_time: float = 1.0,
+                 initial_backoff: float = 0.5,
+                 max_backoff: float = 30.0):
+        """ Watchdog initialization
+
+        Args:
+            camera:          The supervised camera
+            stall_factor:    Number of missed frame periods after which the stream counts as stalled
+            min_stall_time:  Minimal frame age in seconds after which the stream counts as stalled
+            initial_backoff: Waiting time in seconds after the first failed restart
+            max_backoff:     Maximal waiting time in seconds between two restarts
+        """
+        self.camera = camera
+        self.stall_factor = stall_factor
+        self.min_stall_time = min_stall_time
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.alive = False
+        self._stop = Event()
+        self._thread: Thread | None = None
+
+    @property
+    def stall_timeout(self) -> float:
+        """ Frame age in seconds after which the stream counts as stalled """
+        fps = self.camera.expected_fps
+        return max(self.stall_factor / fps if fps > 0.0 else 0.0, self.min_stall_time)
+
+    def start(self) -> None:
+        if self._thread is None:
+            self.alive = True
+            self._stop.clear()
+            self._thread = Thread(target=self.update, args=(), daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self.alive = False
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _wait_for_frame(self, since: float, timeout: float) -> bool:
+        """ Wait until the camera receives a frame after the given time [s] (time.time) """
+        t_end = time.monotonic() + timeout
+        while time.monotonic() < t_end:
+            if self.camera.last_arrival > since:
+                return True
+            if self._stop.wait(0.01):
+                return False
+        return False
+
+    def update(self) -> None:
+        backoff = self.initial_backoff
+        while not self._stop.wait(self.stall_timeout / 4.0):
+            cam = self.camera
+            if not cam.alive or cam.paused or cam.frame_age() <= self.stall_timeout:
+                continue
+            cam.metrics.stalls += 1
+            LOGGER.warning(f"Camera '{cam.name}' stalled. No new frame since {cam.frame_age():.2f} s. Restart device.")
+            while self.alive:
+                since = time.time()
+                try:
+                    cam.restart()
+                    recovered = self._wait_for_frame(since, self.stall_timeout)
+                except Exception as e:
+                    LOGGER.debug(f"Restart of camera '{cam.name}' failed: {e}")
+                    recovered = False
+                if recovered:
+                    cam.metrics.reconnects += 1
+                    LOGGER.info(f"Camera '{cam.name}' recovered after {cam.metrics.reconnects} reconnects in total")
+                    backoff = self.initial_backoff
+                    break
+                LOGGER.warning(f"Camera '{cam.name}' did not recover. Next restart in {backoff:.1f} s")
+                if self._stop.wait(backoff):
+                    break
+                backoff = min(2.0 * backoff, self.max_backoff)
@@ -5,8 +5,7 @@ from contextlib import contextmanager
 
 # local
 from camera_kit.camera.camera_base import CameraBase
-from camera_kit.camera.camera_build_in import CameraBuildIn
-from camera_kit.camera.camera_realsense import CameraRealSense
+from camera_kit.camera.camera_pool import CameraPool
 from camera_kit.camera.camera_factory import CameraFactory
 
 # typing
@@ -17,14 +16,28 @@ PosOrinType = Tuple[Tuple[float, float, float], Tuple[float, float, float, float
 
 
 camera_factory = CameraFactory()
-camera_factory.register(CameraBuildIn)
-camera_factory.register(CameraRealSense)
+# Backends are imported on first creation. This keeps optional drivers like pyrealsense2 out of the package import
+camera_factory.register_lazy("build_in", "camera_kit.camera.camera_build_in:CameraBuildIn")
+camera_factory.register_lazy("realsense", "camera_kit.camera.camera_realsense:CameraRealSense")
+camera_factory.register_lazy("synthetic", "camera_kit.camera.camera_synthetic:CameraSynthetic")
+# Released cameras stay open if the camera manager is asked to keep them alive
+camera_pool = CameraPool(camera_factory, idle_timeout=0.0)
 
 
 @contextmanager
-def camera_manager(name: str, logger_level: int = logging.INFO, **kwargs: Any) -> Iterator[CameraBase]:
-    cam = camera_factory.create(name, logger_level, **kwargs)
+def camera_manager(name: str, logger_level: int = logging.INFO, keep_alive: float = 0.0,
+                   **kwargs: Any) -> Iterator[CameraBase]:
+    """ Context manager which provides a running camera
+
+    Args:
+        name:         Name of the camera
+        logger_level: Logging level
+        keep_alive:   Time in seconds the device is kept open after the context exits. Entering the context again
+                      within this time reuses the open device. Zero ends the camera immediately
+        kwargs:       Camera settings
+    """
+    cam = camera_pool.acquire(name, logger_level, **kwargs)
     try:
         yield cam
     finally:
-        cam.end()
+        camera_pool.release(cam, keep_alive)
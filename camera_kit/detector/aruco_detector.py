@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+# global
+import logging
+import cv2 as cv
+import numpy as np
+from pathlib import Path
+
+# local
+from camera_kit.view.drawing import Drawing
+from camera_kit.detector.detector_base import DetectorBase
+from camera_kit.utilities.converter import cv_to_se3
+
+# typing
+from typing import Any, TYPE_CHECKING
+from numpy import typing as npt
+if TYPE_CHECKING:
+    import spatialmath as sm
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ArucoDetector(DetectorBase):
+    """ Detector to estimate the pose of a target made of one or more ArUco markers or of a ChArUco board
+
+    Configuration keys of the YAML file:
+        dictionary:           Name of the predefined ArUco dictionary, e.g. DICT_4X4_50
+        marker_size:          Side length of a marker [m]
+        marker_id:            Id of a single marker at the target origin (default: 0)
+        marker_positions:     Optional mapping of marker ids to marker center positions [x, y, z] in the target frame
+        grid_board:           Optional grid board with keys 'size' (columns, rows) and 'separation' [m]
+        charuco_board:        Optional ChArUco board with keys 'size' (squares in columns, rows) and 'square_size'
+                              [m]. The pose is estimated from the interpolated chessboard corners
+        min_markers:          Minimal number of detected target markers for a valid pose (default: 1)
+        refine:               Refine the pose seeded with the pose of the previous frame (default: true)
+        max_refine_error:     Reprojection error [px] above which a refined pose is replaced by a full solution
+                              (default: 2.0)
+        detector_parameters:  Optional attributes of cv.aruco.DetectorParameters
+    """
+
+    def __init__(self, config_file: Path | str):
+        super().__init__(config_file)
+        cfg = self.config_dict if self.config_dict is not None else {}
+        self.marker_size = float(cfg.get('marker_size', 0.05))
+        self.min_markers = int(cfg.get('min_markers', 1))
+        self.refine = bool(cfg.get('refine', True))
+        self.max_refine_error = float(cfg.get('max_refine_error', 2.0))
+        # OpenCV detector is created once
+        dict_name = str(cfg.get('dictionary', 'DICT_4X4_50'))
+        if not hasattr(cv.aruco, dict_name):
+            raise ValueError(f"Unknown ArUco dictionary '{dict_name}' in {self.config_fp.name}")
+        self.dictionary = cv.aruco.getPredefinedDictionary(getattr(cv.aruco, dict_name))
+        parameters = cv.aruco.DetectorParameters()
+        for key, value in cfg.get('detector_parameters', {}).items():
+            if not hasattr(parameters, key):
+                raise ValueError(f"Unknown ArUco detector parameter '{key}' in {self.config_fp.name}")
+            setattr(parameters, key, value)
+        self.detector = cv.aruco.ArucoDetector(self.dictionary, parameters)
+        self.charuco_detector: cv.aruco.CharucoDetector | None = None
+        if 'charuco_board' in cfg:
+            board_cfg = cfg['charuco_board']
+            board = cv.aruco.CharucoBoard(tuple(board_cfg['size']), float(board_cfg['square_size']), self.marker_size,
+                                          self.dictionary)
+            self.charuco_detector = cv.aruco.CharucoDetector(board, cv.aruco.CharucoParameters(), parameters)
+            # Object points of the chessboard corners in a lookup table indexed by corner id
+            self._obj_lut = np.asarray(board.getChessboardCorners(), dtype=np.float64).reshape(-1, 1, 3)
+            self._obj_known = np.ones(len(self._obj_lut), dtype=bool)
+            self._marker_known = np.zeros(int(np.max(board.getIds())) + 1, dtype=bool)
+            self._marker_known[np.asarray(board.getIds()).ravel()] = True
+        else:
+            # Object points of all target markers in a lookup table indexed by marker id
+            marker_points = self._marker_object_points(cfg)
+            n_ids = max(marker_points.keys()) + 1
+            self._obj_lut = np.zeros((n_ids, 4, 3), dtype=np.float64)
+            self._obj_known = np.zeros(n_ids, dtype=bool)
+            for m_id, pts in marker_points.items():
+                self._obj_lut[m_id] = pts
+                self._obj_known[m_id] = True
+            self._marker_known = self._obj_known
+        # Results of the latest detection
+        self.frame: npt.NDArray[np.uint8] | None = None
+        self.corners: npt.NDArray[np.float32] = np.zeros((0, 4, 2), dtype=np.float32)
+        self.ids: npt.NDArray[np.int32] = np.zeros(0, dtype=np.int32)
+        # Interpolated chessboard corners [px] and their ids of a ChArUco board
+        self.charuco_corners: npt.NDArray[np.float32] = np.zeros((0, 2), dtype=np.float32)
+        self.charuco_ids: npt.NDArray[np.int32] = np.zeros(0, dtype=np.int32)
+        self._r_vec: npt.NDArray[np.float64] | None = None
+        self._t_vec: npt.NDArray[np.float64] | None = None
+
+    def _marker_object_points(self, cfg: dict[str, Any]) -> dict[int, npt.NDArray[np.float64]]:
+        """ Helper function to get the marker corners in the target frame from the configuration """
+        if 'grid_board' in cfg:
+            board_cfg = cfg['grid_board']
+            board = cv.aruco.GridBoard(tuple(board_cfg['size']), self.marker_size,
+                                       float(board_cfg['separation']), self.dictionary)
+            ids = np.asarray(board.getIds()).ravel()
+            return {int(m_id): np.asarray(pts, dtype=np.float64).reshape(4, 3)
+                    for m_id, pts in zip(ids, board.getObjPoints())}
+        half = self.marker_size / 2.0
+        # Corner order and orientation of cv.aruco for single markers
+        corners = np.array([[-half, half, 0.0], [half, half, 0.0], [half, -half, 0.0], [-half, -half, 0.0]])
+        positions = cfg.get('marker_positions', {int(cfg.get('marker_id', 0)): [0.0, 0.0, 0.0]})
+        return {int(m_id): corners + np.asarray(pos, dtype=np.float64) for m_id, pos in positions.items()}
+
+    @property
+    def target_points(self) -> npt.NDArray[np.float64]:
+        return self._obj_lut[self._obj_known].reshape(-1, 3)  # type: ignore[no-any-return]
+
+    def _detect(self,
+                gray: npt.NDArray[np.uint8],
+                offset: tuple[int, int]) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]] | None:
+        """ Detect the target in a gray image
+
+        Args:
+            gray:   Gray image of the search region
+            offset: Position (x, y) of the search region in the frame [px]
+
+        Returns:
+            (Object points of the detected target corners; Their image points) or None if too few markers were found
+        """
+        self.charuco_corners = np.zeros((0, 2), dtype=np.float32)
+        self.charuco_ids = np.zeros(0, dtype=np.int32)
+        if self.charuco_detector is None:
+            corners, ids, _ = self.detector.detectMarkers(gray)
+        else:
+            charuco_corners, charuco_ids, corners, ids = self.charuco_detector.detectBoard(gray)
+        if ids is None or len(ids) == 0:
+            self.corners = np.zeros((0, 4, 2), dtype=np.float32)
+            self.ids = np.zeros(0, dtype=np.int32)
+            return None
+        self.corners = np.asarray(corners, dtype=np.float32).reshape(-1, 4, 2) + np.array(offset, dtype=np.float32)
+        self.ids = np.asarray(ids, dtype=np.int32).ravel()
+        # Select the markers which belong to the target
+        in_range = self.ids < len(self._marker_known)
+        valid = np.zeros(len(self.ids), dtype=bool)
+        valid[in_range] = self._marker_known[self.ids[in_range]]
+        n_markers = int(np.count_nonzero(valid))
+        if n_markers < self.min_markers or n_markers == 0:
+            return None
+        if self.charuco_detector is None:
+            return self._obj_lut[self.ids[valid]].reshape(-1, 3), self.corners[valid].reshape(-1, 2).astype(np.float64)
+        if charuco_ids is None or len(charuco_ids) < 4:
+            # solvePnP needs at least four corners
+            return None
+        self.charuco_corners = (np.asarray(charuco_corners, dtype=np.float32).reshape(-1, 2)
+                                + np.array(offset, dtype=np.float32))
+        self.charuco_ids = np.asarray(charuco_ids, dtype=np.int32).ravel()
+        return self._obj_lut[self.charuco_ids].reshape(-1, 3), self.charuco_corners.astype(np.float64)
+
+    def _find_pose(self) -> tuple[bool, sm.SE3]:
+        """ Detect the target markers and estimate the target pose with a single solvePnP over all detected corners
+
+        Returns:
+            (True if pose was found; Pose as SE(3) transformation matrix)
+        """
+        import spatialmath as sm
+        self.frame = self._color_frame()
+        roi = self.search_roi
+        if roi is None:
+            points = self._detect(cv.cvtColor(self.frame, cv.COLOR_BGR2GRAY), (0, 0))
+        else:
+            x, y, w, h = roi
+            points = self._detect(cv.cvtColor(self.frame[y:y + h, x:x + w], cv.COLOR_BGR2GRAY), (x, y))
+        if points is None:
+            self._r_vec = self._t_vec = None
+            return False, sm.SE3()
+        obj_pts, img_pts = points
+        cc = self.camera.cc
+        found = False
+        if self.refine and self._r_vec is not None and self._t_vec is not None:
+            found, r_vec, t_vec = cv.solvePnP(obj_pts, img_pts, cc.intrinsic, cc.distortion,
+                                              self._r_vec.copy(), self._t_vec.copy(),
+                                              useExtrinsicGuess=True, flags=cv.SOLVEPNP_ITERATIVE)
+            if found:
+                # Fall back to a full solution if the seed was too far away
+                proj_pts = cc.project_points(obj_pts, r_vec.ravel(), t_vec.ravel())[0]
+                err = np.sqrt(np.mean(np.sum((proj_pts - img_pts) ** 2, axis=1)))
+                found = bool(err <= self.max_refine_error)
+        if not found:
+            flags = cv.SOLVEPNP_IPPE if np.allclose(obj_pts[:, 2], obj_pts[0, 2]) else cv.SOLVEPNP_SQPNP
+            found, r_vec, t_vec = cv.solvePnP(obj_pts, img_pts, cc.intrinsic, cc.distortion, flags=flags)
+        if not found:
+            self._r_vec = self._t_vec = None
+            return False, sm.SE3()
+        self._r_vec, self._t_vec = r_vec, t_vec
+        return True, cv_to_se3(r_vec, t_vec)
+
+    def find_pose(self, render: bool = False) -> tuple[bool, sm.SE3]:
+        """ Method to find the target pose. The rendered image shows the detected markers and the target frame.
+
+        Args:
+            render:    If results should be shown on display or not
+
+        Returns:
+            (True if pose was found; Pose as SE(3) transformation matrix)
+        """
+        found, se3_mat = self._track_pose()
+        if render:
+            tracker = self._tracker
+            detected = tracker is None or tracker.detected
+            # Frames with a predicted pose show their image without markers
+            if detected and self.frame is not None:
+                img = self.frame
+            else:
+                assert self.frameset is not None
+                img = np.array(self.frameset.color, dtype=np.uint8)
+            if detected:
+                for m_corners, m_id in zip(self.corners, self.ids):
+                    img = Drawing.aruco_marker(img, m_corners, int(m_id))
+                for corner in self.charuco_corners:
+                    cv.circle(img, (int(corner[0]), int(corner[1])), Drawing.center_point_thickness,
+                              Drawing.edge_color, -1)
+            if found:
+                img = Drawing.frame_axes(self.camera, img, se3_mat, frame_length=self.marker_size / 2.0)
+            self.camera.render(img)
+        return found, se3_mat
@@ -2,18 +2,23 @@ from __future__ import annotations
 
 # global
 import abc
-import yaml
 import logging
-import spatialmath as sm
+import numpy as np
 from pathlib import Path
 
 # local
 from camera_kit.view.drawing import Drawing
+from camera_kit.camera.frameset import FrameSet, Roi
 from camera_kit.camera.camera_base import CameraBase
+from camera_kit.detector.pose_log import PoseLogWriter
+from camera_kit.detector.pose_filter import PoseTracker
 
 # typing
-from typing import Any
+from typing import Any, TYPE_CHECKING
+from numpy import typing as npt
 from camera_kit.core import PosOrinType
+if TYPE_CHECKING:
+    import spatialmath as sm
 
 
 LOGGER = logging.getLogger(__name__)
@@ -32,6 +37,7 @@ class DetectorBase(metaclass=abc.ABCMeta):
             raise FileNotFoundError(f"Can't find configuration file under: {config_fp}")
         self.config_fp = config_fp
         # load configuration
+        import yaml
         with self.config_fp.open("r") as filestream:
             try:
                 self.config_dict: dict[str, Any] = yaml.safe_load(filestream)
@@ -39,6 +45,14 @@ class DetectorBase(metaclass=abc.ABCMeta):
                 raise RuntimeError(f"Error while reading {self.config_fp.name} configuration. {e}")
 
         self._camera: CameraBase | None = None  # Camera reference
+        self._tracker: PoseTracker | None = None
+        self._result_log: PoseLogWriter | None = None
+        self.detector_id = 0
+        # Image region the detection is restricted to. Only used by detectors which support it
+        self.search_roi: Roi | None = None
+        # Frame set of the latest pose estimate and the frame set the running detection reads
+        self.frameset: FrameSet | None = None
+        self._input: FrameSet | None = None
 
     @property
     def camera(self) -> CameraBase:
@@ -57,6 +71,116 @@ class DetectorBase(metaclass=abc.ABCMeta):
         if not self._camera.is_calibrated:
             self._camera.load_coefficients()
 
+    @property
+    def target_points(self) -> npt.NDArray[np.float64] | None:
+        """ Points of the target in the target frame with shape (N, 3). Used to restrict the detection to the image
+        region of the predicted target. None if the detector doesn't provide them.
+        """
+        return None
+
+    @property
+    def tracker(self) -> PoseTracker | None:
+        return self._tracker
+
+    def enable_tracking(self, **kwargs: Any) -> PoseTracker:
+        """ Track the pose with a filter and run the detection only every n-th frame or when the pose uncertainty
+        grows too large. find_pose returns the predicted pose for frames without detection.
+
+        Args:
+            kwargs: Settings of the PoseTracker
+
+        Returns:
+            The pose tracker object
+        """
+        self._tracker = PoseTracker(**kwargs)
+        return self._tracker
+
+    def disable_tracking(self) -> None:
+        self._tracker = None
+
+    def enable_result_log(self, writer: PoseLogWriter, detector_id: int = 0) -> None:
+        """ Append every find_pose result to a binary pose log
+
+        Args:
+            writer:      Pose log writer. It can be shared by several detectors
+            detector_id: Id of this detector in the log
+        """
+        self._result_log = writer
+        self.detector_id = detector_id
+
+    def disable_result_log(self) -> None:
+        self._result_log = None
+
+    def _color_frame(self) -> npt.NDArray[np.uint8]:
+        """ Color image the detection runs on. Detectors read their input with it, so the pose belongs to the
+        frame set it is tracked and logged with.
+
+        Returns:
+            A copy of the color image
+        """
+        frameset = self._input
+        if frameset is None:
+            return self.camera.get_color_frame()
+        return np.array(frameset.color, dtype=np.uint8)
+
+    def _detect_tracked(self) -> tuple[bool, sm.SE3]:
+        """ Detection of the tracker. The search is restricted to the predicted target region first """
+        assert self._tracker is not None
+        target_points = self.target_points
+        roi = None
+        if target_points is not None:
+            image_size = None
+            if self._input is not None:
+                image_size = (self._input.color.shape[1], self._input.color.shape[0])
+            roi = self._tracker.predicted_roi(self.camera, target_points, image_size)
+        if roi is not None:
+            self.search_roi = roi
+            try:
+                found, se3_mat = self._find_pose()
+            finally:
+                self.search_roi = None
+            if found:
+                return found, se3_mat
+        return self._find_pose()
+
+    def _track_pose(self, frameset: FrameSet | None = None) -> tuple[bool, sm.SE3]:
+        """ Pose of a frame set. Detected on every frame without tracking, otherwise filtered or predicted
+
+        Args:
+            frameset: Frame set of the registered camera. Default is the latest frame set
+        """
+        if frameset is None:
+            frameset = self.camera.get_frameset()
+        self._input = frameset
+        try:
+            if self._tracker is None:
+                found, se3_mat = self._find_pose()
+            else:
+                found, se3_mat = self._tracker.step(frameset, self._detect_tracked)
+        finally:
+            self._input = None
+        self.frameset = frameset
+        if self._result_log is not None:
+            self._result_log.log(frameset.seq_id, found, se3_mat, frameset.host_timestamp, frameset.hw_timestamp,
+                                 self.detector_id, frameset.capture_time)
+        tracer = self.camera.tracer
+        if tracer is not None:
+            tracer.record(self.camera.name, f"pose {type(self).__name__}:{self.detector_id}", frameset)
+        return found, se3_mat
+
+    def estimate_pose(self, frameset: FrameSet | None = None) -> tuple[bool, sm.SE3]:
+        """ Method to get the object pose of a frame set without rendering. Tracking, the result log and latency
+        tracing apply like for find_pose.
+
+        Args:
+            frameset: Frame set of the registered camera, e.g. one published by a camera feed. Default is the latest
+                      frame set of the camera
+
+        Returns:
+            (True if pose was found; Pose as SE(3) transformation matrix)
+        """
+        return self._track_pose(frameset)
+
     def find_pose(self, render: bool = False) -> tuple[bool, sm.SE3]:
         """ Method to find object pose estimate
 
@@ -66,9 +190,10 @@ class DetectorBase(metaclass=abc.ABCMeta):
         Returns:
             (True if pose was found; Pose as SE(3) transformation matrix)
         """
-        img = self.camera.get_color_frame()
-        found, se3_mat = self._find_pose()
+        found, se3_mat = self._track_pose()
         if render:
+            assert self.frameset is not None
+            img = np.array(self.frameset.color, dtype=np.uint8)
             if found:
                 img = Drawing.frame_axes(self.camera, img, se3_mat, frame_length=0.01)
             self.camera.render(img)
@@ -0,0 +1,433 @@
+from __future__ import annotations
+
+# global
+import os
+import time
+import logging
+import cv2 as cv
+import numpy as np
+import multiprocessing
+from pathlib import Path
+from threading import Lock, Semaphore
+from multiprocessing import shared_memory
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+
+# local
+from camera_kit.camera import CameraCoefficient
+from camera_kit.camera.camera_base import CameraBase
+from camera_kit.camera.camera_feed import CameraFeed
+from camera_kit.detector.detector_base import DetectorBase
+
+# typing
+from typing import Any, Iterable, Iterator, Type, TYPE_CHECKING
+from numpy import typing as npt
+if TYPE_CHECKING:
+    import spatialmath as sm
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class DetectionResult:
+    """ Result of a detection in a worker process
+
+        seq_id:   Sequence id of the frame
+        source:   Origin of the frame, e.g. the image file name or the video frame index
+        found:    True if the pose was found
+        matrix:   Pose as homogeneous transformation matrix
+        duration: Processing time in the worker [s]
+    """
+    __slots__ = ('seq_id', 'source', 'found', 'matrix', 'duration')
+
+    def __init__(self, seq_id: int, source: Any, found: bool, matrix: npt.NDArray[np.float64], duration: float) -> None:
+        self.seq_id = seq_id
+        self.source = source
+        self.found = found
+        self.matrix = matrix
+        self.duration = duration
+
+    @property
+    def pose(self) -> sm.SE3:
+        """ Pose as SE(3) transformation matrix """
+        import spatialmath as sm
+        return sm.SE3(self.matrix, check=False)
+
+    def __repr__(self) -> str:
+        return (f"{type(self).__name__}(seq_id={self.seq_id}, source={self.source!r}, found={self.found}, "
+                f"duration={1e3 * self.duration:.1f} ms)")
+
+
+# State of a worker process
+_worker_detector: DetectorBase | None = None
+_worker_camera: CameraFeed | None = None
+_worker_memory: dict[str, shared_memory.SharedMemory] = {}
+
+
+def _init_worker(detector_class: Type[DetectorBase],
+                 config_file: str,
+                 camera_name: str,
+                 intrinsic: npt.NDArray[np.float64],
+                 distortion: npt.NDArray[np.float64]) -> None:
+    global _worker_detector, _worker_camera
+    _worker_camera = CameraFeed(camera_name)
+    _worker_camera.cc.intrinsic = intrinsic
+    _worker_camera.cc.distortion = distortion
+    _worker_camera.is_calibrated = True
+    _worker_detector = detector_class(config_file)
+    _worker_detector.register_camera(_worker_camera)
+
+
+def _detect(seq_id: int, source: Any, frame: npt.NDArray[np.uint8] | tuple[str, tuple[int, ...], str]
+            ) -> tuple[int, Any, bool, npt.NDArray[np.float64], float]:
+    assert _worker_detector is not None and _worker_camera is not None
+    t_start = time.perf_counter()
+    if isinstance(frame, tuple):
+        # Frame in a shared memory slot of the parent process
+        name, shape, dtype = frame
+        memory = _worker_memory.get(name)
+        if memory is None:
+            # The parent replaces the slots when the frames grow. Release the mappings of the smaller slots
+            nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            for old_name in [n for n, m in _worker_memory.items() if m.size < nbytes]:
+                _worker_memory.pop(old_name).close()
+            memory = _worker_memory[name] = shared_memory.SharedMemory(name)
+        # The parent reuses the slot after this call. Copy the frame into a buffer of the worker
+        image = _worker_camera._color_buffers.get(shape, dtype)
+        np.copyto(image, np.ndarray(shape, dtype=dtype, buffer=memory.buf))
+        _worker_camera.feed(image)
+        del image
+    else:
+        _worker_camera.feed(frame)
+    found, pose = _worker_detector._find_pose()
+    matrix = np.array(pose.A, dtype=np.float64)
+    return seq_id, source, bool(found), matrix, time.perf_counter() - t_start
+
+
+class DetectorFarm:
+    """ Runs a detector in several worker processes. Every worker owns a detector instance created from the same
+        configuration file. Frames are handed over through shared memory.
+
+        Results are either collected in sequence order (next_result, map) or newest-first for live streams
+        (latest_result). Stateful detectors, e.g. detectors which seed the pose with the previous frame, only see
+        a subset of the frames in each worker.
+    """
+
+    def __init__(self,
+                 detector_class: Type[DetectorBase],
+                 config_file: Path | str,
+                 camera: CameraBase | None = None,
+                 coefficients: Path | str | None = None,
+                 n_workers: int | None = None,
+                 max_pending: int | None = None,
+                 drop_stale: bool = False,
+                 start_method: str = "spawn") -> None:
+        """ Detector farm initialization
+
+        Args:
+            detector_class: DetectorBase subclass which is instantiated in every worker
+            config_file:    Configuration file of the detector
+            camera:         Camera whose name and coefficients are used by the workers
+            coefficients:   Path to a coefficients file which is used instead of the camera coefficients, e.g.
+                            for recorded images. Either the camera or the coefficients are required
+            n_workers:      Number of worker processes. Default is the number of CPUs
+            max_pending:    Maximal number of frames in flight. Default is twice the number of workers
+            drop_stale:     Drop queued frames which are not processed yet when a new frame is submitted and the
+                            farm is at capacity. Use for live streams where only the newest result matters
+            start_method:   Start method of the worker processes. 'spawn' is safe with running capture threads
+        """
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.n_workers
+        self.drop_stale = drop_stale
+        # Check everything the workers need here. Failures in the worker initializer only show up as broken pool
+        if not Path(config_file).is_file():
+            raise FileNotFoundError(f"Can't find configuration file under: {config_file}")
+        if coefficients is not None:
+            camera_name = camera.name if camera is not None else "detector_farm"
+            cc = CameraCoefficient(camera_name)
+            cc.load(coefficients)
+        elif camera is not None:
+            camera_name = camera.name
+            if not camera.is_calibrated:
+                camera.load_coefficients()
+            cc = camera.cc
+        else:
+            raise ValueError("Detector farm needs a camera or a coefficients file")
+        intrinsic, distortion = np.array(cc.intrinsic), np.array(cc.distortion)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_init_worker,
+            initargs=(detector_class, os.fspath(config_file), camera_name, intrinsic, distortion))
+        self._lock = Lock()
+        self._capacity = Semaphore(self.max_pending)
+        # Submitted frames in sequence order
+        self._pending: dict[int, Future[Any]] = {}
+        self._next_seq_id = 0
+        self._latest_seq_id = -1
+        # Shared memory slots. Each frame in flight occupies one slot
+        self._slot_size = 0
+        self._free_slots: list[shared_memory.SharedMemory] = []
+        self._slots: list[shared_memory.SharedMemory] = []
+        self.n_dropped = 0
+
+    def __enter__(self) -> DetectorFarm:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.shutdown()
+
+    def __len__(self) -> int:
+        """ Number of submitted frames whose results are not collected yet """
+        return len(self._pending)
+
+    @staticmethod
+    def _unlink(slots: Iterable[shared_memory.SharedMemory]) -> None:
+        for slot in slots:
+            slot.close()
+            slot.unlink()
+
+    def _acquire_slot(self, nbytes: int) -> shared_memory.SharedMemory | None:
+        replaced: list[shared_memory.SharedMemory] = []
+        with self._lock:
+            if nbytes > self._slot_size:
+                # Larger frames than before. Slots in use are unlinked when their frames are done
+                self._slot_size = nbytes
+                replaced, self._free_slots = self._free_slots, []
+                self._slots = [slot for slot in self._slots if slot not in replaced]
+        self._unlink(replaced)
+        with self._lock:
+            if self._free_slots:
+                return self._free_slots.pop()
+            if len(self._slots) >= 2 * self.max_pending:
+                return None
+            slot = shared_memory.SharedMemory(create=True, size=nbytes)
+            self._slots.append(slot)
+            return slot
+
+    def _release_slot(self, slot: shared_memory.SharedMemory) -> None:
+        with self._lock:
+            if slot not in self._slots:
+                return
+            if slot.size >= self._slot_size:
+                self._free_slots.append(slot)
+                return
+            # Slot of smaller frames
+            self._slots.remove(slot)
+        self._unlink([slot])
+
+    def _drop_queued(self) -> None:
+        """ Cancel the oldest frames which are not processed yet """
+        with self._lock:
+            futures = list(self._pending.items())
+        for seq_id, future in futures:
+            if future.cancel():
+                self.n_dropped += 1
+                return
+
+    def submit(self, frame: npt.NDArray[np.uint8], seq_id: int | None = None, source: Any = None) -> int:
+        """ Hand a frame over to the workers. Blocks while the maximal number of frames is in flight unless stale
+        frames are dropped.
+
+        Args:
+            frame:  Color image
+            seq_id: Sequence id of the frame. Default is the number of submitted frames. Ids must increase
+            source: Optional origin of the frame which is returned with the result
+
+        Returns:
+            The sequence id of the frame
+        """
+        if seq_id is None:
+            seq_id = self._next_seq_id
+        elif seq_id < self._next_seq_id:
+            raise ValueError(f"Sequence id {seq_id} isn't greater than the id of the previous frame")
+        self._next_seq_id = seq_id + 1
+        if self.drop_stale:
+            while not self._capacity.acquire(blocking=False):
+                self._drop_queued()
+                if self._capacity.acquire(timeout=0.01):
+                    break
+        else:
+            self._capacity.acquire()
+        frame = np.ascontiguousarray(frame)
+        slot = self._acquire_slot(frame.nbytes)
+        if slot is not None:
+            np.ndarray(frame.shape, dtype=frame.dtype, buffer=slot.buf)[...] = frame
+            task: Any = (slot.name, frame.shape, frame.dtype.str)
+        else:
+            task = frame
+        future = self._executor.submit(_detect, seq_id, source, task)
+        with self._lock:
+            self._pending[seq_id] = future
+
+        def _done(f: Future[Any]) -> None:
+            self._capacity.release()
+            if slot is not None:
+                self._release_slot(slot)
+        future.add_done_callback(_done)
+        return seq_id
+
+    def next_result(self, timeout: float | None = None) -> DetectionResult | None:
+        """ Get the result of the oldest submitted frame. Waits until it is processed. If the detection of the
+        frame failed, the exception of the worker is raised and the frame is removed, so the results of later
+        frames can still be collected.
+
+        Args:
+            timeout: Maximal waiting time [s]. Raises a TimeoutError if the frame isn't processed in time
+
+        Returns:
+            The result or None if there is no submitted frame. Dropped frames are skipped
+        """
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return None
+                seq_id = next(iter(self._pending))
+                future = self._pending[seq_id]
+            try:
+                result = DetectionResult(*future.result(timeout))
+            except CancelledError:
+                result = None
+            except Exception:
+                if not future.done():
+                    # Timeout. The frame stays pending
+                    raise
+                with self._lock:
+                    self._pending.pop(seq_id, None)
+                raise
+            with self._lock:
+                self._pending.pop(seq_id, None)
+            if result is not None:
+                self._latest_seq_id = max(self._latest_seq_id, result.seq_id)
+                return result
+
+    def latest_result(self) -> DetectionResult | None:
+        """ Get the result of the newest processed frame. Results of older frames are discarded.
+
+        Returns:
+            The newest result which is newer than the previously returned one or None
+        """
+        with self._lock:
+            done = [(seq_id, f) for seq_id, f in self._pending.items() if f.done()]
+            if not done:
+                return None
+            newest_id = done[-1][0]
+            for seq_id in [seq_id for seq_id in self._pending if seq_id <= newest_id]:
+                future = self._pending[seq_id]
+                if future.done() or future.cancel():
+                    del self._pending[seq_id]
+        result: DetectionResult | None = None
+        for seq_id, future in reversed(done):
+            if not future.cancelled():
+                result = DetectionResult(*future.result())
+                break
+        if result is None or result.seq_id <= self._latest_seq_id:
+            return None
+        self._latest_seq_id = result.seq_id
+        return result
+
+    def map(self, frames: Iterable[tuple[Any, npt.NDArray[np.uint8]]]) -> Iterator[DetectionResult]:
+        """ Process frames as fast as the workers allow and yield the results in sequence order
+
+        Args:
+            frames: Pairs of frame source and color image
+
+        Returns:
+            Iterator over the results
+        """
+        for source, frame in frames:
+            self.submit(frame, source=source)
+            # Hand out finished results early to keep memory bounded
+            while True:
+                with self._lock:
+                    oldest = next(iter(self._pending.values()), None)
+                if oldest is None or not oldest.done():
+                    break
+                result = self.next_result()
+                if result is not None:
+                    yield result
+        while self._pending:
+            result = self.next_result()
+            if result is not None:
+                yield result
+
+    def process_images(self, dir_path: Path | str, pattern: str = "*.png") -> Iterator[DetectionResult]:
+        """ Process all images of a directory. The image file name is used as result source.
+
+        Args:
+            dir_path: Directory of the images
+            pattern:  Glob pattern of the image files
+
+        Returns:
+            Iterator over the results in file name order
+        """
+        return self.map(iter_images(dir_path, pattern))
+
+    def process_video(self, file_path: Path | str) -> Iterator[DetectionResult]:
+        """ Process all frames of a video file. The frame index is used as result source.
+
+        Args:
+            file_path: Path to the video file
+
+        Returns:
+            Iterator over the results in frame order
+        """
+        return self.map(iter_video(file_path))
+
+    def shutdown(self, cancel_pending: bool = True) -> None:
+        """ Stop the worker processes and release the shared memory
+
+        Args:
+            cancel_pending: Drop frames which are not processed yet. Otherwise, wait until all frames are processed
+        """
+        with self._lock:
+            futures = list(self._pending.values())
+            self._pending.clear()
+        if cancel_pending:
+            for future in futures:
+                future.cancel()
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            slots, self._slots, self._free_slots = self._slots, [], []
+        self._unlink(slots)
+
+
+def iter_images(dir_path: Path | str, pattern: str = "*.png") -> Iterator[tuple[str, npt.NDArray[np.uint8]]]:
+    """ Read the images of a directory in file name order
+
+    Args:
+        dir_path: Directory of the images
+        pattern:  Glob pattern of the image files
+
+    Returns:
+        Iterator over pairs of file name and color image
+    """
+    for fp in sorted(Path(dir_path).glob(pattern)):
+        img = cv.imread(os.fspath(fp), cv.IMREAD_COLOR)
+        if img is None:
+            LOGGER.warning(f"Can't read image {fp}")
+            continue
+        yield fp.name, img
+
+
+def iter_video(file_path: Path | str) -> Iterator[tuple[int, npt.NDArray[np.uint8]]]:
+    """ Read the frames of a video file
+
+    Args:
+        file_path: Path to the video file
+
+    Returns:
+        Iterator over pairs of frame index and color image
+    """
+    cap = cv.VideoCapture(os.fspath(file_path))
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Can't open video file {file_path}")
+    try:
+        idx = 0
+        while True:
+            success, frame = cap.read()
+            if not success:
+                break
+            yield idx, frame
+            idx += 1
+    finally:
+        cap.release()
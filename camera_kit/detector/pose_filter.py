@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+# global
+import math
+import logging
+import cv2 as cv
+import numpy as np
+
+# local
+from camera_kit.camera.frameset import Roi, clip_roi
+
+# typing
+from typing import Any, Callable, TYPE_CHECKING
+from numpy import typing as npt
+if TYPE_CHECKING:
+    import spatialmath as sm
+    from camera_kit.camera.frameset import FrameSet
+    from camera_kit.camera.camera_base import CameraBase
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _as_matrix(pose: Any) -> npt.NDArray[np.float64]:
+    """ Homogeneous 4x4 matrix of a SE3 object or an array """
+    return np.asarray(getattr(pose, 'A', pose), dtype=np.float64).reshape(4, 4)
+
+
+def _exp_so3(vec: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    return cv.Rodrigues(np.asarray(vec, dtype=np.float64).reshape(3, 1))[0]  # type: ignore[no-any-return]
+
+
+def _log_so3(rot: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    return cv.Rodrigues(np.ascontiguousarray(rot))[0].ravel()  # type: ignore[no-any-return]
+
+
+class PoseFilter:
+    """ Constant velocity Kalman filter of a pose. The rotation is filtered on the Lie algebra of SO(3): the filter
+        state holds the pose and its error is expressed as translation and rotation vector in the camera frame.
+
+        State:      Position, orientation, linear velocity and angular velocity in the camera frame
+        Covariance: 12x12 matrix in the order position [m], rotation [rad], velocity [m/s], angular velocity [rad/s]
+    """
+
+    # Squared Mahalanobis distance of a measurement with six degrees of freedom which is exceeded with 0.1 %
+    # probability
+    gate_threshold = 22.46
+
+    def __init__(self,
+                 position_noise: float = 0.002,
+                 rotation_noise: float = 0.01,
+                 acceleration_noise: float = 0.2,
+                 angular_acceleration_noise: float = 0.5,
+                 initial_velocity_std: float = 0.5,
+                 initial_angular_velocity_std: float = 1.5) -> None:
+        """ Pose filter initialization
+
+        Args:
+            position_noise:               Standard deviation of measured positions [m]
+            rotation_noise:               Standard deviation of measured rotations [rad]
+            acceleration_noise:           Spectral density of the linear acceleration [m/s^2 / sqrt(Hz)]
+            angular_acceleration_noise:   Spectral density of the angular acceleration [rad/s^2 / sqrt(Hz)]
+            initial_velocity_std:         Standard deviation of the velocity after initialization [m/s]
+            initial_angular_velocity_std: Standard deviation of the angular velocity after initialization [rad/s]
+        """
+        self.measurement_cov = np.diag([position_noise ** 2] * 3 + [rotation_noise ** 2] * 3)
+        self.acceleration_noise = acceleration_noise
+        self.angular_acceleration_noise = angular_acceleration_noise
+        self.initial_velocity_std = initial_velocity_std
+        self.initial_angular_velocity_std = initial_angular_velocity_std
+        self.position = np.zeros(3)
+        self.rotation = np.eye(3)
+        self.velocity = np.zeros(3)
+        self.angular_velocity = np.zeros(3)
+        self.covariance = np.eye(12)
+        # Time of the state [s]
+        self.timestamp = float('nan')
+        self.initialized = False
+
+    def reset(self, pose: Any | None = None, timestamp: float = float('nan')) -> None:
+        """ Reset the filter. With a pose the state is initialized at rest at this pose
+
+        Args:
+            pose:      Measured pose as SE3 object or 4x4 matrix
+            timestamp: Time of the measurement [s]
+        """
+        self.velocity = np.zeros(3)
+        self.angular_velocity = np.zeros(3)
+        self.timestamp = timestamp
+        self.initialized = pose is not None
+        if pose is None:
+            self.position = np.zeros(3)
+            self.rotation = np.eye(3)
+            self.covariance = np.eye(12)
+            return
+        mat = _as_matrix(pose)
+        self.position = mat[:3, 3].copy()
+        self.rotation = mat[:3, :3].copy()
+        self.covariance = np.zeros((12, 12))
+        self.covariance[:6, :6] = self.measurement_cov
+        self.covariance[6:9, 6:9] = np.eye(3) * self.initial_velocity_std ** 2
+        self.covariance[9:, 9:] = np.eye(3) * self.initial_angular_velocity_std ** 2
+
+    @property
+    def pose_matrix(self) -> npt.NDArray[np.float64]:
+        """ Filtered pose as 4x4 matrix """
+        mat = np.eye(4)
+        mat[:3, :3] = self.rotation
+        mat[:3, 3] = self.position
+        return mat
+
+    @property
+    def pose_covariance(self) -> npt.NDArray[np.float64]:
+        """ Covariance of the position [m] and rotation [rad] with shape (6, 6) """
+        return self.covariance[:6, :6]
+
+    @property
+    def position_std(self) -> float:
+        """ Largest standard deviation of the position [m] """
+        return math.sqrt(float(np.max(np.linalg.eigvalsh(self.covariance[:3, :3]))))
+
+    @property
+    def rotation_std(self) -> float:
+        """ Largest standard deviation of the rotation [rad] """
+        return math.sqrt(float(np.max(np.linalg.eigvalsh(self.covariance[3:6, 3:6]))))
+
+    def predict(self, timestamp: float) -> None:
+        """ Propagate the state with constant velocity to the given time
+
+        Args:
+            timestamp: Target time [s]. Times before the state time are ignored
+        """
+        if not self.initialized:
+            return
+        dt = timestamp - self.timestamp
+        if not dt > 0.0:
+            return
+        self.position = self.position + self.velocity * dt
+        self.rotation = _exp_so3(self.angular_velocity * dt) @ self.rotation
+        f_mat = np.eye(12)
+        f_mat[0:3, 6:9] = np.eye(3) * dt
+        f_mat[3:6, 9:12] = np.eye(3) * dt
+        # Discretized white noise acceleration
+        q_mat = np.zeros((12, 12))
+        for i, q in ((0, self.acceleration_noise ** 2), (3, self.angular_acceleration_noise ** 2)):
+            block = q * np.array([[dt ** 3 / 3.0, dt ** 2 / 2.0], [dt ** 2 / 2.0, dt]])
+            eye = np.eye(3)
+            q_mat[i:i + 3, i:i + 3] = block[0, 0] * eye
+            q_mat[i:i + 3, i + 6:i + 9] = block[0, 1] * eye
+            q_mat[i + 6:i + 9, i:i + 3] = block[1, 0] * eye
+            q_mat[i + 6:i + 9, i + 6:i + 9] = block[1, 1] * eye
+        self.covariance = f_mat @ self.covariance @ f_mat.T + q_mat
+        self.timestamp = timestamp
+
+    def update(self, pose: Any, timestamp: float) -> bool:
+        """ Correct the state with a measured pose. The filter gets initialized by the first measurement
+
+        Args:
+            pose:      Measured pose as SE3 object or 4x4 matrix
+            timestamp: Time of the measurement [s]
+
+        Returns:
+            True if the measurement was accepted. Measurements which are too unlikely are rejected
+        """
+        if not self.initialized:
+            self.reset(pose, timestamp)
+            return True
+        self.predict(timestamp)
+        mat = _as_matrix(pose)
+        residual = np.concatenate([mat[:3, 3] - self.position, _log_so3(mat[:3, :3] @ self.rotation.T)])
+        s_mat = self.covariance[:6, :6] + self.measurement_cov
+        s_inv = np.linalg.inv(s_mat)
+        if float(residual @ s_inv @ residual) > self.gate_threshold:
+            return False
+        k_mat = self.covariance[:, :6] @ s_inv
+        delta = k_mat @ residual
+        self.position = self.position + delta[0:3]
+        self.rotation = _exp_so3(delta[3:6]) @ self.rotation
+        self.velocity = self.velocity + delta[6:9]
+        self.angular_velocity = self.angular_velocity + delta[9:12]
+        # Joseph form keeps the covariance symmetric and positive definite
+        i_kh = np.eye(12)
+        i_kh[:, :6] -= k_mat
+        self.covariance = i_kh @ self.covariance @ i_kh.T + k_mat @ self.measurement_cov @ k_mat.T
+        return True
+
+
+class PoseTracker:
+    """ Runs a detector only every n-th frame or when the pose uncertainty grows too large and predicts the pose of
+        the other frames with a pose filter. Attach it to a detector with DetectorBase.enable_tracking.
+    """
+
+    def __init__(self,
+                 detect_every: int = 5,
+                 max_position_std: float = 0.01,
+                 max_rotation_std: float = 0.05,
+                 max_misses: int = 3,
+                 roi_margin: float = 0.2,
+                 **kwargs: Any) -> None:
+        """ Pose tracker initialization
+
+        Args:
+            detect_every:     Run the detector every n-th frame
+            max_position_std: Position uncertainty [m] above which the detector runs on the next frame
+            max_rotation_std: Rotation uncertainty [rad] above which the detector runs on the next frame
+            max_misses:       Number of failed detections in a row after which the target counts as lost
+            roi_margin:       Margin around the predicted target as share of its size for region restricted
+                              detection. Negative values disable region restricted detection
+            kwargs:           Settings of the PoseFilter
+        """
+        if detect_every < 1:
+            raise ValueError(f"Detection interval must be at least one frame")
+        self.detect_every = detect_every
+        self.max_position_std = max_position_std
+        self.max_rotation_std = max_rotation_std
+        self.max_misses = max_misses
+        self.roi_margin = roi_margin
+        self.filter = PoseFilter(**kwargs)
+        # Sequence id of the latest frame and whether the detector ran on it
+        self.seq_id = -1
+        self.detected = False
+        self.found = False
+        self.n_frames = 0
+        self.n_detections = 0
+        self._since_detection = 0
+        self._misses = 0
+
+    def reset(self) -> None:
+        self.filter.reset()
+        self.found = False
+        self._misses = 0
+        self._since_detection = 0
+
+    @property
+    def pose_matrix(self) -> npt.NDArray[np.float64]:
+        return self.filter.pose_matrix
+
+    @property
+    def pose(self) -> sm.SE3:
+        """ Filtered or predicted pose of the latest frame """
+        import spatialmath as sm
+        return sm.SE3(self.filter.pose_matrix, check=False)
+
+    @property
+    def covariance(self) -> npt.NDArray[np.float64]:
+        """ Covariance of the position [m] and rotation [rad] of the latest frame with shape (6, 6) """
+        return self.filter.pose_covariance
+
+    def _needs_detection(self) -> bool:
+        f = self.filter
+        return (not self.found or self._misses > 0 or self._since_detection >= self.detect_every
+                or f.position_std > self.max_position_std or f.rotation_std > self.max_rotation_std)
+
+    def predicted_roi(self,
+                      camera: CameraBase,
+                      target_points: npt.ArrayLike,
+                      image_size: tuple[int, int] | None = None) -> Roi | None:
+        """ Image region which contains the target at the predicted pose
+
+        Args:
+            camera:        Camera of the images
+            target_points: Points of the target in the target frame with shape (N, 3)
+            image_size:    Image size in pixels (width, height). Default is the frame size of the camera
+
+        Returns:
+            The region (x, y, width, height) or None if the target isn't tracked
+        """
+        if not self.found or self.roi_margin < 0.0:
+            return None
+        pts = camera.cc.project_poses(target_points, self.filter.pose_matrix)[0]
+        if not np.all(np.isfinite(pts)):
+            return None
+        (x0, y0), (x1, y1) = pts.min(axis=0), pts.max(axis=0)
+        margin = self.roi_margin * max(x1 - x0, y1 - y0)
+        try:
+            return clip_roi((int(x0 - margin), int(y0 - margin), int(x1 - x0 + 2 * margin) + 1,
+                             int(y1 - y0 + 2 * margin) + 1),
+                            camera.frame_size if image_size is None else image_size)
+        except ValueError:
+            # Target predicted outside the image
+            return None
+
+    def step(self, frameset: FrameSet, detect: Callable[[], tuple[bool, sm.SE3]]) -> tuple[bool, sm.SE3]:
+        """ Get the pose of a frame set. Repeated calls for the same frame set return the same result
+
+        Args:
+            frameset: Frame set the detection runs on
+            detect:   Detection function which returns (True if pose was found; Pose) for the frame set
+
+        Returns:
+            (True if the target is tracked; Filtered, or for frames without detection, predicted pose)
+        """
+        if frameset.seq_id == self.seq_id:
+            return self.found, self.pose
+        self.seq_id = frameset.seq_id
+        self.n_frames += 1
+        self._since_detection += 1
+        # The capture time is in the host clock, so it stays monotonic when the device clock restarts
+        timestamp = frameset.capture_time
+        self.filter.predict(timestamp)
+        self.detected = self._needs_detection()
+        if not self.detected:
+            return self.found, self.pose
+        self.n_detections += 1
+        self._since_detection = 0
+        found, pose = detect()
+        if found and self.filter.update(pose, timestamp):
+            self.found = True
+            self._misses = 0
+            return True, self.pose
+        self._misses += 1
+        if found and self._misses > self.max_misses:
+            # The target moved in a way the motion model can't explain. Start over at the measurement
+            LOGGER.debug(f"Pose tracker lost the target. Reinitialize at the measured pose")
+            self.filter.reset(pose, timestamp)
+            self.found = True
+            self._misses = 0
+            return True, self.pose
+        if self._misses > self.max_misses:
+            self.reset()
+        return self.found, self.pose
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+# global
+import os
+import queue
+import logging
+import numpy as np
+from pathlib import Path
+from threading import Lock, Thread
+
+# local
+from camera_kit.utilities.converter import matrices_to_pq, pq_to_matrices
+
+# typing
+from typing import Any, BinaryIO, Dict
+from numpy import typing as npt
+
+
+LOGGER = logging.getLogger(__name__)
+
+# File layout: a header of fixed size followed by the records. Records are never modified once written
+_MAGIC = b"CKPOSLOG"
+_VERSION = 1
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('version', '<u4'), ('pose_format', '<u4'), ('record_size', '<u4'),
+                         ('reserved', 'V12')])
+
+# Record fields:
+#   seq_id:         Sequence id of the frame set the detector processed
+#   host_timestamp: Time when the frame arrived at the host [s] (time.time)
+#   hw_timestamp:   Device timestamp of the frame [ms]. NaN if the device doesn't provide timestamps
+#   capture_time:   Exposure time of the frame in the host clock [s]. With host_timestamp it gives the transfer
+#                   latency and with the time of the pose, e.g. from a latency tracer, the total latency
+#   pose:           4x4 matrix or position (xyz) and quaternion (xyzw)
+#   detector_id:    Id of the detector which produced the result
+#   found:          True if the pose was found
+RECORD_DTYPES: Dict[str, np.dtype[Any]] = {
+    'matrix': np.dtype([('seq_id', '<i8'), ('host_timestamp', '<f8'), ('hw_timestamp', '<f8'),
+                        ('capture_time', '<f8'), ('pose', '<f8', (4, 4)), ('detector_id', '<u2'), ('found', '?')],
+                       align=True),
+    'pq': np.dtype([('seq_id', '<i8'), ('host_timestamp', '<f8'), ('hw_timestamp', '<f8'),
+                    ('capture_time', '<f8'), ('pose', '<f8', (7,)), ('detector_id', '<u2'), ('found', '?')],
+                   align=True),
+}
+_FORMAT_CODES = {'matrix': 0, 'pq': 1}
+
+
+def _read_header(fp: Path) -> tuple[str, np.dtype[Any]]:
+    """ Pose format and record data type of a pose log file """
+    header = np.fromfile(fp, dtype=HEADER_DTYPE, count=1)
+    if len(header) != 1 or header['magic'][0] != _MAGIC:
+        raise ValueError(f"File {fp} is not a pose log")
+    if int(header['version'][0]) != _VERSION:
+        raise ValueError(f"Pose log {fp} has the unsupported version {int(header['version'][0])}")
+    codes = {v: k for k, v in _FORMAT_CODES.items()}
+    pose_format = codes.get(int(header['pose_format'][0]), "")
+    if not pose_format or RECORD_DTYPES[pose_format].itemsize != int(header['record_size'][0]):
+        raise ValueError(f"Pose log {fp} has an unknown record format")
+    return pose_format, RECORD_DTYPES[pose_format]
+
+
+def read_pose_log(file_path: Path | str) -> npt.NDArray[Any]:
+    """ Map the records of a pose log into memory without reading them. A partially written record at the end of
+    the file, e.g. after a crash, is ignored.
+
+    Args:
+        file_path: Path to the pose log
+
+    Returns:
+        Read-only structured array (np.memmap) of the records with the fields of RECORD_DTYPES
+    """
+    fp = Path(file_path)
+    _, dtype = _read_header(fp)
+    n_records = (fp.stat().st_size - HEADER_DTYPE.itemsize) // dtype.itemsize
+    if n_records <= 0:
+        # Empty files can't be mapped
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(fp, dtype=dtype, mode='r', offset=HEADER_DTYPE.itemsize, shape=(n_records,))
+
+
+def pose_matrices(records: npt.NDArray[Any]) -> npt.NDArray[np.float64]:
+    """ Poses of pose log records as 4x4 matrices
+
+    Args:
+        records: Records of a pose log
+
+    Returns:
+        Homogeneous transformation matrices with shape (N, 4, 4)
+    """
+    poses = records['pose']
+    if poses.shape[1:] == (4, 4):
+        return np.array(poses, dtype=np.float64)
+    return pq_to_matrices(poses)
+
+
+class PoseLogWriter:
+    """ Append-only binary log of detection results with fixed size records. Results are collected in chunks which
+        a background thread writes to the file, so logging doesn't block the detection loop.
+    """
+
+    def __init__(self, file_path: Path | str, pose_format: str = "matrix", chunk_size: int = 256) -> None:
+        """ Pose log writer initialization. Records are appended to an existing log of the same format.
+
+        Args:
+            file_path:   Path to the log file
+            pose_format: Pose representation. 'matrix' stores 4x4 matrices, 'pq' position and quaternion
+            chunk_size:  Number of records which are collected before they are handed to the writer thread
+        """
+        if pose_format not in RECORD_DTYPES:
+            raise ValueError(f"Unknown pose format '{pose_format}'. Choose one of {list(RECORD_DTYPES)}")
+        self.file_path = Path(file_path)
+        self.pose_format = pose_format
+        self.dtype = RECORD_DTYPES[pose_format]
+        self.chunk_size = chunk_size
+        self.n_records = 0
+        self._file = self._open()
+        self._lock = Lock()
+        self._chunk = self._new_chunk()
+        self._n_chunk = 0
+        self._queue: queue.Queue[npt.NDArray[Any] | None] = queue.Queue()
+        # First exception of the writer thread. Raised again by flush and close
+        self._error: Exception | None = None
+        self._thread = Thread(target=self._write_loop, args=(self._file,), name="pose-log-writer", daemon=True)
+        self._thread.start()
+
+    def _open(self) -> Any:
+        fp = self.file_path
+        if fp.exists() and fp.stat().st_size > 0:
+            pose_format, dtype = _read_header(fp)
+            if pose_format != self.pose_format:
+                raise ValueError(f"Pose log {fp} stores poses as '{pose_format}', not as '{self.pose_format}'")
+            f: BinaryIO = fp.open('r+b')
+            # Drop a partially written record
+            n_records = (fp.stat().st_size - HEADER_DTYPE.itemsize) // dtype.itemsize
+            f.truncate(HEADER_DTYPE.itemsize + n_records * dtype.itemsize)
+            f.seek(0, os.SEEK_END)
+            return f
+        fp.parent.mkdir(parents=True, exist_ok=True)
+        f = fp.open('wb')
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header['magic'] = _MAGIC
+        header['version'] = _VERSION
+        header['pose_format'] = _FORMAT_CODES[self.pose_format]
+        header['record_size'] = self.dtype.itemsize
+        f.write(header.tobytes())
+        return f
+
+    def _new_chunk(self) -> npt.NDArray[Any]:
+        # Poses are collected as matrices and converted by the writer thread
+        return np.zeros(self.chunk_size, dtype=RECORD_DTYPES['matrix'])
+
+    def log(self,
+            seq_id: int,
+            found: bool,
+            pose: Any,
+            host_timestamp: float = float('nan'),
+            hw_timestamp: float = float('nan'),
+            detector_id: int = 0,
+            capture_time: float = float('nan')) -> None:
+        """ Add a detection result to the log
+
+        Args:
+            seq_id:         Sequence id of the processed frame set
+            found:          True if the pose was found
+            pose:           Pose as SE3 object or 4x4 matrix
+            host_timestamp: Time when the frame arrived at the host [s]
+            hw_timestamp:   Device timestamp of the frame [ms]
+            detector_id:    Id of the detector
+            capture_time:   Exposure time of the frame in the host clock [s]
+        """
+        mat = getattr(pose, 'A', pose)
+        with self._lock:
+            if self._file is None:
+                raise RuntimeError(f"Pose log {self.file_path} is closed")
+            self._chunk[self._n_chunk] = (seq_id, host_timestamp, hw_timestamp, capture_time, mat, detector_id,
+                                            found)
+            self._n_chunk += 1
+            self.n_records += 1
+            if self._n_chunk >= self.chunk_size:
+                self._hand_over()
+
+    def _hand_over(self) -> None:
+        if self._n_chunk > 0:
+            self._queue.put(self._chunk[:self._n_chunk])
+            self._chunk = self._new_chunk()
+            self._n_chunk = 0
+
+    def _write_loop(self, file: Any) -> None:
+        while True:
+            chunk = self._queue.get()
+            try:
+                if chunk is None:
+                    return
+                records = chunk
+                if self.pose_format != 'matrix':
+                    records = np.zeros(len(chunk), dtype=self.dtype)
+                    for name in self.dtype.names or ():
+                        if name != 'pose':
+                            records[name] = chunk[name]
+                    records['pose'] = matrices_to_pq(chunk['pose'])
+                file.write(records.tobytes())
+                file.flush()
+            except Exception as e:
+                LOGGER.error(f"Can't write pose log {self.file_path}: {e}")
+                if self._error is None:
+                    self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"Can't write pose log {self.file_path}: {self._error}") from self._error
+
+    def flush(self) -> None:
+        """ Write all logged records to the file and wait until they are written. Raises a RuntimeError if the
+        writer thread failed to write records.
+        """
+        with self._lock:
+            self._hand_over()
+        self._queue.join()
+        self._raise_error()
+
+    def close(self) -> None:
+        """ Write the remaining records and close the file. Raises a RuntimeError if the writer thread failed to
+        write records.
+        """
+        with self._lock:
+            file = self._file
+            if file is None:
+                return
+            # Later log calls raise instead of adding records which are never written
+            self._file = None
+            self._hand_over()
+            self._queue.put(None)
+        self._thread.join()
+        file.close()
+        self._raise_error()
+
+    def __enter__(self) -> PoseLogWriter:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
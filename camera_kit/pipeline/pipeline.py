@@ -0,0 +1,359 @@
+from __future__ import annotations
+
+# global
+import time
+import queue
+import logging
+from pathlib import Path
+from threading import Event, Lock, Thread, current_thread
+
+# local
+from camera_kit.view.user_event import EventObserver
+from camera_kit.pipeline.stages import (
+    CameraSource,
+    Detector,
+    DisplaySink,
+    Draw,
+    Grayscale,
+    ImageSink,
+    ImageSource,
+    Packet,
+    Resize,
+    SourceStage,
+    Stage,
+    Undistort,
+    VideoSink,
+    VideoSource,
+)
+
+# typing
+from typing import Any, Type
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Marks the end of the stream in the stage queues
+_END = None
+
+
+class StageStats:
+    """ Throughput counters of a stage
+
+        processed: Number of processed packets
+        dropped:   Number of packets which were dropped because the input queue was full
+        busy_time: Time spent in processing [s]
+    """
+
+    def __init__(self) -> None:
+        self.processed = 0
+        self.dropped = 0
+        self.busy_time = 0.0
+        self.t_first = float('nan')
+        self.t_last = float('nan')
+
+    def add(self, t_start: float, t_end: float) -> None:
+        if self.processed == 0:
+            self.t_first = t_start
+        self.processed += 1
+        self.busy_time += t_end - t_start
+        self.t_last = t_end
+
+    @property
+    def fps(self) -> float:
+        """ Processed packets per second between the first and the latest packet """
+        duration = self.t_last - self.t_first
+        return (self.processed - 1) / duration if self.processed > 1 and duration > 0.0 else 0.0
+
+    @property
+    def mean_time(self) -> float:
+        """ Mean processing time per packet [s] """
+        return self.busy_time / self.processed if self.processed > 0 else 0.0
+
+    @property
+    def load(self) -> float:
+        """ Share of time the stage was busy. Stages close to one are the bottleneck """
+        duration = self.t_last - self.t_first
+        return self.busy_time / duration if self.processed > 1 and duration > 0.0 else 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return {'processed': self.processed, 'dropped': self.dropped, 'fps': self.fps,
+                'mean_time': self.mean_time, 'load': self.load}
+
+    def __repr__(self) -> str:
+        return (f"{type(self).__name__}(processed={self.processed}, dropped={self.dropped}, fps={self.fps:.1f}, "
+                f"mean_time={1e3 * self.mean_time:.2f} ms, load={self.load:.2f})")
+
+
+class _Node:
+    """ Stage of the graph with its input queue and consumers """
+
+    def __init__(self, stage: Stage, queue_size: int, drop: bool) -> None:
+        self.stage = stage
+        self.inbox: queue.Queue[Packet | None] = queue.Queue(maxsize=queue_size)
+        self.drop = drop
+        self.children: list[_Node] = []
+        self.stats = StageStats()
+        self.thread: Thread | None = None
+        self._lock = Lock()
+
+    def put(self, packet: Packet | None, stop: Event) -> None:
+        if packet is _END:
+            # The end marker is never dropped
+            while not stop.is_set():
+                try:
+                    self.inbox.put(packet, timeout=0.1)
+                    return
+                except queue.Full:
+                    self._drop_oldest()
+            return
+        if self.drop:
+            with self._lock:
+                while True:
+                    try:
+                        self.inbox.put_nowait(packet)
+                        return
+                    except queue.Full:
+                        if not self._drop_oldest():
+                            return
+        while not stop.is_set():
+            try:
+                self.inbox.put(packet, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _drop_oldest(self) -> bool:
+        """ Drop the oldest queued packet. Returns False if the queue ends with the end marker """
+        try:
+            dropped = self.inbox.get_nowait()
+        except queue.Empty:
+            return True
+        if dropped is _END:
+            # Keep the end marker in place of the new packet
+            self.inbox.put_nowait(dropped)
+            return False
+        self.stats.dropped += 1
+        return True
+
+
+class Pipeline:
+    """ Executes a graph of stages which is described declaratively, e.g. in a YAML file:
+
+        queue_size: 2
+        stages:
+          - {name: cam, type: camera, camera: realsense, settings: {frame_size: [1280, 720]}}
+          - {name: aruco, type: detector, input: cam, detector: ArucoDetector, config: aruco.yaml}
+          - {name: overlay, type: draw, input: aruco, overlays: [{type: frame_axes, detector: aruco}]}
+          - {name: window, type: display, input: overlay, on_full: drop}
+          - {name: record, type: video_writer, input: cam, file: run.avi}
+
+        Every stage runs in its own thread and receives the output of its input stage through a bounded queue.
+        Stages with the same input form independent branches which run concurrently. With 'on_full: drop' a stage
+        drops its oldest queued packet instead of blocking the upstream stage. Display stages run in the thread
+        which calls run() since GUI functions must not be called from other threads.
+    """
+
+    # Stage classes by type id
+    stage_types: dict[str, Type[Stage]] = {
+        cls.type_id: cls for cls in (CameraSource, ImageSource, VideoSource, Undistort, Grayscale, Resize, Detector,
+                                     Draw, DisplaySink, VideoSink, ImageSink)}
+
+    def __init__(self, config: dict[str, Any], base_dir: Path | str = "") -> None:
+        """ Build the stage graph
+
+        Args:
+            config:   Pipeline description with the keys 'stages' and optionally 'queue_size'
+            base_dir: Directory which relative file paths of the configuration refer to. Default is the working
+                      directory
+        """
+        base_dir = Path(base_dir) if base_dir else Path.cwd()
+        queue_size = int(config.get('queue_size', 2))
+        self._nodes: dict[str, _Node] = {}
+        inputs: dict[str, str | None] = {}
+        for stage_cfg in config.get('stages', []):
+            stage_cfg = dict(stage_cfg)
+            name = str(stage_cfg.pop('name'))
+            type_id = str(stage_cfg.pop('type'))
+            if name in self._nodes:
+                raise ValueError(f"Stage name '{name}' is used twice")
+            if type_id not in self.stage_types:
+                raise KeyError(f"Unknown stage type '{type_id}'. Available types are: {list(self.stage_types)}")
+            inputs[name] = stage_cfg.pop('input', None)
+            drop = str(stage_cfg.pop('on_full', 'block')) == 'drop'
+            size = int(stage_cfg.pop('queue_size', queue_size))
+            stage = self.stage_types[type_id](name, base_dir, **stage_cfg)
+            self._nodes[name] = _Node(stage, size, drop)
+        for name, input_name in inputs.items():
+            node = self._nodes[name]
+            if isinstance(node.stage, SourceStage):
+                if input_name is not None:
+                    raise ValueError(f"Source stage '{name}' can't have an input")
+                continue
+            if input_name not in self._nodes:
+                raise ValueError(f"Input '{input_name}' of stage '{name}' doesn't exist")
+            self._nodes[input_name].children.append(node)
+        if not any(isinstance(n.stage, SourceStage) for n in self._nodes.values()):
+            raise ValueError("Pipeline has no source stage")
+        self._stop = Event()
+        self._running = False
+        # Exceptions of the stage threads by stage name
+        self._errors: dict[str, Exception] = {}
+        self._errors_lock = Lock()
+
+    @classmethod
+    def register_stage(cls, stage_class: Type[Stage]) -> Type[Stage]:
+        """ Make a stage class available in configurations by its type id. Can be used as class decorator. """
+        cls.stage_types[stage_class.type_id] = stage_class
+        return stage_class
+
+    @classmethod
+    def from_yaml(cls, file_path: Path | str) -> Pipeline:
+        """ Build the pipeline from a YAML file. Relative paths in the file refer to the directory of the file. """
+        import yaml
+        fp = Path(file_path)
+        with fp.open('r') as f:
+            config = yaml.safe_load(f)
+        return cls(config, fp.parent)
+
+    @property
+    def stages(self) -> dict[str, Stage]:
+        return {name: node.stage for name, node in self._nodes.items()}
+
+    def stats(self) -> dict[str, StageStats]:
+        """ Throughput counters of all stages """
+        return {name: node.stats for name, node in self._nodes.items()}
+
+    def report(self) -> str:
+        """ Table of the stage throughput """
+        lines = [f"{'stage':<16}{'type':<14}{'frames':>8}{'dropped':>9}{'fps':>8}{'ms/frame':>10}{'load':>7}"]
+        for name, node in self._nodes.items():
+            s = node.stats
+            lines.append(f"{name:<16}{node.stage.type_id:<14}{s.processed:>8}{s.dropped:>9}{s.fps:>8.1f}"
+                         f"{1e3 * s.mean_time:>10.2f}{s.load:>7.2f}")
+        return "\n".join(lines)
+
+    def _forward(self, node: _Node, packet: Packet | None) -> None:
+        for child in node.children:
+            child.put(packet, self._stop)
+
+    def _process(self, node: _Node, packet: Packet) -> None:
+        t_start = time.perf_counter()
+        out = node.stage.process(packet)
+        node.stats.add(t_start, time.perf_counter())
+        if out is not None:
+            self._forward(node, out)
+
+    def _fail(self, stage: Stage, error: Exception) -> None:
+        """ Record the exception of a stage thread and stop the pipeline. run() raises it again """
+        LOGGER.error(f"Stage '{stage.name}' failed: {error}")
+        with self._errors_lock:
+            self._errors.setdefault(stage.name, error)
+        self._stop.set()
+
+    def _run_source(self, node: _Node) -> None:
+        stage = node.stage
+        assert isinstance(stage, SourceStage)
+        try:
+            stage.setup()
+            packets = stage.packets()
+            t_start = time.perf_counter()
+            for packet in packets:
+                if self._stop.is_set():
+                    break
+                node.stats.add(t_start, time.perf_counter())
+                self._forward(node, packet)
+                t_start = time.perf_counter()
+        except Exception as e:
+            self._fail(stage, e)
+        finally:
+            self._forward(node, _END)
+            stage.close()
+
+    def _run_stage(self, node: _Node) -> None:
+        stage = node.stage
+        try:
+            stage.setup()
+            while True:
+                try:
+                    packet = node.inbox.get(timeout=0.1)
+                except queue.Empty:
+                    if self._stop.is_set():
+                        break
+                    continue
+                if packet is _END:
+                    break
+                self._process(node, packet)
+        except Exception as e:
+            self._fail(stage, e)
+        finally:
+            self._forward(node, _END)
+            stage.close()
+
+    def start(self) -> None:
+        """ Start the threads of all stages except display stages """
+        if self._running:
+            return
+        self._stop.clear()
+        self._running = True
+        with self._errors_lock:
+            self._errors.clear()
+        for node in self._nodes.values():
+            if isinstance(node.stage, DisplaySink):
+                continue
+            target = self._run_source if isinstance(node.stage, SourceStage) else self._run_stage
+            node.thread = Thread(target=target, args=(node,), name=f"pipeline-{node.stage.name}", daemon=True)
+            node.thread.start()
+
+    def run(self, duration: float | None = None) -> None:
+        """ Run the pipeline until all sources are exhausted, the duration expired or the user quits a display
+        window. Display stages are served by the calling thread. If a stage fails, the pipeline stops and run
+        raises a RuntimeError caused by the exception of the stage.
+
+        Args:
+            duration: Maximal run time [s]
+        """
+        self.start()
+        displays = [n for n in self._nodes.values() if isinstance(n.stage, DisplaySink)]
+        t_end = float('inf') if duration is None else time.perf_counter() + duration
+        open_displays = list(displays)
+        try:
+            while time.perf_counter() < t_end and not self._stop.is_set():
+                if not open_displays and not self._threads_alive():
+                    break
+                if not open_displays:
+                    time.sleep(0.01)
+                    continue
+                for node in list(open_displays):
+                    try:
+                        packet = node.inbox.get(timeout=0.01)
+                    except queue.Empty:
+                        continue
+                    if packet is _END:
+                        node.stage.close()
+                        open_displays.remove(node)
+                        continue
+                    self._process(node, packet)
+                    if EventObserver.state == EventObserver.Type.QUIT:
+                        self._stop.set()
+        finally:
+            self.stop()
+            for node in displays:
+                node.stage.close()
+        with self._errors_lock:
+            errors = dict(self._errors)
+        if errors:
+            name, error = next(iter(errors.items()))
+            others = f" (also failed: {', '.join(list(errors)[1:])})" if len(errors) > 1 else ""
+            raise RuntimeError(f"Pipeline stage '{name}' failed: {error}{others}") from error
+
+    def _threads_alive(self) -> bool:
+        return any(n.thread is not None and n.thread.is_alive() for n in self._nodes.values())
+
+    def stop(self) -> None:
+        """ Stop all stages and wait for their threads """
+        self._stop.set()
+        for node in self._nodes.values():
+            if node.thread is not None and node.thread is not current_thread():
+                node.thread.join()
+                node.thread = None
+        self._running = False
@@ -0,0 +1,442 @@
+from __future__ import annotations
+
+# global
+import abc
+import os
+import time
+import logging
+import importlib
+import cv2 as cv
+import numpy as np
+from pathlib import Path
+
+# local
+from camera_kit.view.drawing import Drawing
+from camera_kit.view.display import Display
+from camera_kit.camera import CameraCoefficient
+from camera_kit.camera.frameset import FrameSet
+from camera_kit.camera.camera_base import CameraBase
+from camera_kit.camera.camera_feed import CameraFeed
+from camera_kit.detector.pose_log import PoseLogWriter
+from camera_kit.detector.detector_base import DetectorBase
+
+# typing
+from typing import Any, Dict, Iterator, Type
+from numpy import typing as npt
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Data which flows through the pipeline. Common keys:
+#   seq_id:       Sequence id of the frame
+#   image:        Current image. Stages replace it instead of modifying it in place
+#   camera:       Camera which captured the frame
+#   intrinsic:    Intrinsic camera matrix of the current image. Stages which change the image geometry replace it
+#   distortion:   Distortion parameters of the current image
+#   hw_timestamp: Capture timestamp of the frame [ms]
+#   <stage name>: Result of a detector stage as dict with the keys 'found' and 'pose'
+Packet = Dict[str, Any]
+
+
+def _coefficients(packet: Packet) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """ Intrinsic matrix and distortion parameters of the packet image. Default are the camera coefficients """
+    if 'intrinsic' in packet:
+        return packet['intrinsic'], packet['distortion']
+    cc: CameraCoefficient = packet['camera'].cc
+    return cc.intrinsic, cc.distortion
+
+
+def _sync_coefficients(cc: CameraCoefficient, packet: Packet) -> None:
+    """ Set the coefficients of the packet image. Derived quantities stay cached while the values don't change """
+    intrinsic, distortion = _coefficients(packet)
+    if not np.array_equal(cc.intrinsic, intrinsic):
+        cc.intrinsic = np.array(intrinsic, dtype=np.float64)
+    if not np.array_equal(cc.distortion, distortion):
+        cc.distortion = np.array(distortion, dtype=np.float64)
+
+
+def _packet(frameset: FrameSet, camera: CameraBase) -> Packet:
+    """ Source packet of a frame set """
+    return {'seq_id': frameset.seq_id, 'image': frameset.color, 'frameset': frameset, 'camera': camera,
+            'intrinsic': camera.cc.intrinsic, 'distortion': camera.cc.distortion,
+            'hw_timestamp': frameset.hw_timestamp}
+
+
+class Stage(metaclass=abc.ABCMeta):
+    """ Node of the pipeline graph. Each stage runs in its own thread. """
+
+    type_id = ""
+
+    def __init__(self, name: str, base_dir: Path, **params: Any) -> None:
+        """ Stage initialization
+
+        Args:
+            name:     Unique name of the stage
+            base_dir: Directory which relative file paths of the configuration refer to
+            params:   Stage specific settings of the configuration
+        """
+        self.name = name
+        self.base_dir = base_dir
+        if params:
+            raise ValueError(f"Unknown settings {sorted(params)} of stage '{name}' ({self.type_id})")
+
+    def _path(self, path: Path | str) -> Path:
+        return self.base_dir.joinpath(path)
+
+    def setup(self) -> None:
+        """ Acquire resources. Called in the stage thread before the first packet """
+
+    @abc.abstractmethod
+    def process(self, packet: Packet) -> Packet | None:
+        """ Process a packet
+
+        Args:
+            packet: Input packet. Packets are shared between branches and must not be modified
+
+        Returns:
+            The output packet or None to drop the packet
+        """
+        raise NotImplementedError("Must be implemented in subclass")
+
+    def close(self) -> None:
+        """ Release resources. Called in the stage thread after the last packet """
+
+
+class SourceStage(Stage, metaclass=abc.ABCMeta):
+    """ Stage without input which produces the packets """
+
+    def process(self, packet: Packet) -> Packet | None:
+        return packet
+
+    @abc.abstractmethod
+    def packets(self) -> Iterator[Packet]:
+        """ Produce packets until the source is exhausted or the pipeline stops """
+        raise NotImplementedError("Must be implemented in subclass")
+
+
+class CameraSource(SourceStage):
+    """ Publishes every new frame set of a camera created by the camera factory """
+
+    type_id = "camera"
+
+    def __init__(self, name: str, base_dir: Path, camera: str, settings: dict[str, Any] | None = None,
+                 coefficients: str | None = None, **params: Any) -> None:
+        super().__init__(name, base_dir, **params)
+        self.camera_name = camera
+        self.settings = dict(settings or {})
+        self.coefficients = coefficients
+        self.camera: CameraBase | None = None
+
+    def setup(self) -> None:
+        from camera_kit.core import camera_factory
+        settings = dict(self.settings)
+        if 'frame_size' in settings:
+            settings['frame_size'] = tuple(settings['frame_size'])
+        self.camera = camera_factory.create(self.camera_name, **settings)
+        if self.coefficients is not None:
+            self.camera.load_coefficients(self._path(self.coefficients))
+
+    def packets(self) -> Iterator[Packet]:
+        cam = self.camera
+        assert cam is not None
+        seq_id = -1
+        while cam.alive:
+            frameset = cam.wait_frameset(seq_id)
+            if frameset.seq_id <= seq_id:
+                continue
+            seq_id = frameset.seq_id
+            yield _packet(frameset, cam)
+
+    def close(self) -> None:
+        if self.camera is not None:
+            self.camera.end()
+
+
+class _RecordingSource(SourceStage, metaclass=abc.ABCMeta):
+    """ Base of sources which read recorded frames. The frames are published through a camera feed. """
+
+    def __init__(self, name: str, base_dir: Path, camera: str = "recording", coefficients: str | None = None,
+                 fps: float = 0.0, latency: float = 0.0, **params: Any) -> None:
+        super().__init__(name, base_dir, **params)
+        self.camera = CameraFeed(camera)
+        if coefficients is not None:
+            self.camera.load_coefficients(self._path(coefficients))
+        self.fps = fps
+        # Emulated time between exposure and arrival of a frame [s]
+        self.latency = latency
+
+    @abc.abstractmethod
+    def frames(self) -> Iterator[npt.NDArray[np.uint8]]:
+        raise NotImplementedError("Must be implemented in subclass")
+
+    def packets(self) -> Iterator[Packet]:
+        period = 1.0 / self.fps if self.fps > 0.0 else 0.0
+        t_start = next_time = time.perf_counter()
+        for frame in self.frames():
+            # Emulate a device clock which ticks at the configured frame rate
+            frameset = self.camera.feed(frame, hw_timestamp=1e3 * (next_time - t_start),
+                                        capture_time=time.time() - self.latency)
+            yield _packet(frameset, self.camera)
+            next_time += period
+            if period > 0.0:
+                time.sleep(max(0.0, next_time - time.perf_counter()))
+
+
+class ImageSource(_RecordingSource):
+    """ Reads the images of a directory in file name order """
+
+    type_id = "images"
+
+    def __init__(self, name: str, base_dir: Path, directory: str, pattern: str = "*.png", **params: Any) -> None:
+        super().__init__(name, base_dir, **params)
+        self.directory = self._path(directory)
+        self.pattern = pattern
+
+    def frames(self) -> Iterator[npt.NDArray[np.uint8]]:
+        from camera_kit.detector.detector_farm import iter_images
+        return (img for _, img in iter_images(self.directory, self.pattern))
+
+
+class VideoSource(_RecordingSource):
+    """ Reads the frames of a video file """
+
+    type_id = "video"
+
+    def __init__(self, name: str, base_dir: Path, file: str, **params: Any) -> None:
+        super().__init__(name, base_dir, **params)
+        self.file = self._path(file)
+
+    def frames(self) -> Iterator[npt.NDArray[np.uint8]]:
+        from camera_kit.detector.detector_farm import iter_video
+        return (img for _, img in iter_video(self.file))
+
+
+class Undistort(Stage):
+    """ Removes the lens distortion with cached remapping maps. The output packet carries the intrinsic matrix of
+        the undistorted image and no distortion.
+    """
+
+    type_id = "undistort"
+
+    def __init__(self, name: str, base_dir: Path, alpha: float = 0.0, **params: Any) -> None:
+        super().__init__(name, base_dir, **params)
+        self.alpha = alpha
+        self.cc = CameraCoefficient(name)
+
+    def process(self, packet: Packet) -> Packet | None:
+        _sync_coefficients(self.cc, packet)
+        img = packet['image']
+        intrinsic, _ = self.cc.optimal_intrinsic((img.shape[1], img.shape[0]), self.alpha)
+        return {**packet, 'image': self.cc.undistort_image(img, self.alpha), 'intrinsic': intrinsic,
+                'distortion': np.zeros_like(self.cc.distortion)}
+
+
+class Grayscale(Stage):
+    """ Converts color images to single channel gray images """
+
+    type_id = "grayscale"
+
+    def process(self, packet: Packet) -> Packet | None:
+        img = packet['image']
+        if img.ndim == 2:
+            return packet
+        return {**packet, 'image': cv.cvtColor(img, cv.COLOR_BGR2GRAY)}
+
+
+class Resize(Stage):
+    """ Scales images by a factor. The intrinsic matrix of the output packet is scaled accordingly. """
+
+    type_id = "resize"
+
+    def __init__(self, name: str, base_dir: Path, scale: float, **params: Any) -> None:
+        super().__init__(name, base_dir, **params)
+        self.scale = scale
+
+    def process(self, packet: Packet) -> Packet | None:
+        interpolation = cv.INTER_AREA if self.scale < 1.0 else cv.INTER_LINEAR
+        src = packet['image']
+        img = cv.resize(src, None, fx=self.scale, fy=self.scale, interpolation=interpolation)
+        intrinsic, distortion = _coefficients(packet)
+        # Scale factors of the rounded image size. Pixel centers are at integer coordinates
+        scale = np.array([img.shape[1] / src.shape[1], img.shape[0] / src.shape[0]])
+        intrinsic = np.array(intrinsic, dtype=np.float64)
+        intrinsic[:2, :2] *= scale[:, None]
+        intrinsic[:2, 2] = (intrinsic[:2, 2] + 0.5) * scale - 0.5
+        return {**packet, 'image': img, 'intrinsic': intrinsic, 'distortion': distortion}
+
+
+class Detector(Stage):
+    """ Runs a detector on the stage input image. The result is added to the packet under the stage name.
+
+        tracking:    Optional settings of the pose tracker, see DetectorBase.enable_tracking
+        result_log:  Optional path of a pose log which the results are appended to
+        detector_id: Id of the detector in the pose log
+    """
+
+    type_id = "detector"
+
+    def __init__(self, name: str, base_dir: Path, detector: str, config: str,
+                 tracking: dict[str, Any] | None = None, result_log: str | None = None, detector_id: int = 0,
+                 **params: Any) -> None:
+        super().__init__(name, base_dir, **params)
+        self.detector_class = self._detector_class(detector)
+        self.config = self._path(config)
+        self.tracking = tracking
+        self.result_log = None if result_log is None else self._path(result_log)
+        self.detector_id = detector_id
+        self.detector: DetectorBase | None = None
+        self.feed: CameraFeed | None = None
+        self.writer: PoseLogWriter | None = None
+
+    @staticmethod
+    def _detector_class(detector: str) -> Type[DetectorBase]:
+        """ Get the detector class from a class name exported by camera_kit or an import path 'module:Class' """
+        if ':' in detector:
+            module_name, class_name = detector.split(':', 1)
+        else:
+            module_name, class_name = 'camera_kit', detector
+        detector_class = getattr(importlib.import_module(module_name), class_name)
+        if not (isinstance(detector_class, type) and issubclass(detector_class, DetectorBase)):
+            raise TypeError(f"Object '{detector}' is not a subclass of DetectorBase")
+        return detector_class  # type: ignore[no-any-return]
+
+    def process(self, packet: Packet) -> Packet | None:
+        camera: CameraBase = packet['camera']
+        if self.detector is None:
+            # The detector reads the stage input through its own camera feed
+            self.feed = CameraFeed(camera.name)
+            self.feed.is_calibrated = True
+            self.detector = self.detector_class(self.config)
+            self.detector.register_camera(self.feed)
+            if self.tracking is not None:
+                self.detector.enable_tracking(**self.tracking)
+            if self.result_log is not None:
+                self.writer = PoseLogWriter(self.result_log)
+                self.detector.enable_result_log(self.writer, self.detector_id)
+        assert self.feed is not None
+        # The coefficients follow the upstream stages, e.g. an undistorted or resized image
+        _sync_coefficients(self.feed.cc, packet)
+        self.feed.tracer = camera.tracer
+        frameset: FrameSet | None = packet.get('frameset')
+        capture_time = float('nan') if frameset is None else frameset.capture_time
+        frameset = self.feed.feed(packet['image'], packet.get('hw_timestamp', float('nan')), capture_time)
+        found, pose = self.detector.estimate_pose(frameset)
+        result: dict[str, Any] = {'found': found, 'pose': pose}
+        # Detections of marker based detectors
+        for key in ('corners', 'ids'):
+            if hasattr(self.detector, key):
+                result[key] = np.array(getattr(self.detector, key))
+        return {**packet, self.name: result}
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class Draw(Stage):
+    """ Draws overlays with the Drawing helpers on a copy of the image
+
+        overlays: List of overlays. Each overlay is a dict with the key 'type' and its settings:
+                  frame_axes: Axes of the pose found by the detector stage 'detector' with 'length' [m]
+                  markers:    Marker corners and ids found by the detector stage 'detector'
+                  text:       Text 'text' at 'position' [px]. Packet entries can be used as format fields,
+                              e.g. '{seq_id}'
+    """
+
+    type_id = "draw"
+
+    def __init__(self, name: str, base_dir: Path, overlays: list[dict[str, Any]], **params: Any) -> None:
+        super().__init__(name, base_dir, **params)
+        # Projects the overlays with the coefficients of the input image
+        self.feed = CameraFeed(name)
+        for overlay in overlays:
+            if overlay.get('type') not in ('frame_axes', 'markers', 'text'):
+                raise ValueError(f"Unknown overlay type '{overlay.get('type')}' of stage '{name}'")
+        self.overlays = overlays
+
+    def process(self, packet: Packet) -> Packet | None:
+        img = packet['image']
+        img = cv.cvtColor(img, cv.COLOR_GRAY2BGR) if img.ndim == 2 else np.array(img)
+        _sync_coefficients(self.feed.cc, packet)
+        for overlay in self.overlays:
+            if overlay['type'] == 'text':
+                txt = str(overlay['text']).format(**packet)
+                img = Drawing.add_text(img, txt, tuple(overlay.get('position', (10, 10))))
+                continue
+            result = packet.get(overlay['detector'], {})
+            if overlay['type'] == 'frame_axes' and result.get('found', False):
+                img = Drawing.frame_axes(self.feed, img, result['pose'], float(overlay.get('length', 0.05)))
+            elif overlay['type'] == 'markers':
+                for m_corners, m_id in zip(result.get('corners', []), result.get('ids', [])):
+                    img = Drawing.aruco_marker(img, m_corners, int(m_id))
+        return {**packet, 'image': img}
+
+
+class DisplaySink(Stage):
+    """ Shows the images in a window. Runs in the thread which runs the pipeline. """
+
+    type_id = "display"
+
+    def __init__(self, name: str, base_dir: Path, window: str = "", **params: Any) -> None:
+        super().__init__(name, base_dir, **params)
+        self.window = window or name
+        self.display: Display | None = None
+
+    def process(self, packet: Packet) -> Packet | None:
+        if self.display is None:
+            self.display = Display(self.window)
+        self.display.show(packet['image'])
+        return None
+
+    def close(self) -> None:
+        if self.display is not None:
+            self.display.destroy()
+            self.display = None
+
+
+class VideoSink(Stage):
+    """ Writes the images into a video file """
+
+    type_id = "video_writer"
+
+    def __init__(self, name: str, base_dir: Path, file: str, fps: float = 30.0, codec: str = "MJPG",
+                 **params: Any) -> None:
+        super().__init__(name, base_dir, **params)
+        self.file = self._path(file)
+        self.fps = fps
+        self.codec = codec
+        self.writer: cv.VideoWriter | None = None
+
+    def process(self, packet: Packet) -> Packet | None:
+        img = packet['image']
+        if self.writer is None:
+            self.file.parent.mkdir(parents=True, exist_ok=True)
+            self.writer = cv.VideoWriter(os.fspath(self.file), cv.VideoWriter_fourcc(*self.codec), self.fps,
+                                         (img.shape[1], img.shape[0]), img.ndim == 3)
+        self.writer.write(img)
+        return None
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+
+
+class ImageSink(Stage):
+    """ Writes every image into a directory """
+
+    type_id = "image_writer"
+
+    def __init__(self, name: str, base_dir: Path, directory: str, extension: str = "png", **params: Any) -> None:
+        super().__init__(name, base_dir, **params)
+        self.directory = self._path(directory)
+        self.extension = extension
+
+    def setup(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def process(self, packet: Packet) -> Packet | None:
+        cv.imwrite(os.fspath(self.directory.joinpath(f"frame_{packet['seq_id']:06}.{self.extension}")),
+                   packet['image'])
+        return None
@@ -2,13 +2,15 @@ from __future__ import annotations
 
 # global
 import numpy as np
-import spatialmath as sm
-from scipy.spatial.transform import Rotation as R
 
 # typing
-from typing import cast, Tuple
+from typing import cast, Tuple, TYPE_CHECKING
 from numpy import typing as npt
 from camera_kit.core import PosOrinType
+if TYPE_CHECKING:
+    import spatialmath as sm
+
+# spatialmath and scipy are slow to import. They are imported on first use of a conversion function.
 
 
 def pq_to_cv(pq: PosOrinType) -> tuple[npt.NDArray[np.float_], npt.NDArray[np.float_]]:
@@ -20,6 +22,7 @@ def pq_to_cv(pq: PosOrinType) -> tuple[npt.NDArray[np.float_], npt.NDArray[np.fl
     Returns:
         Rotation vector and translation vector as numpy arrays
     """
+    from scipy.spatial.transform import Rotation as R
     t_vec = np.reshape(pq[0], 3)
     r_vec = np.reshape(R.from_quat(pq[1]).as_rotvec(), 3)
     return r_vec, t_vec
@@ -49,6 +52,7 @@ def cv_to_pq(r_vec: npt.NDArray[np.float_], t_vec: npt.NDArray[np.float_]) -> Po
     Returns:
         Position vector in xyz order and quaternion in xyzw order
     """
+    from scipy.spatial.transform import Rotation as R
     p = cast(Tuple[float, float, float], tuple(np.reshape(t_vec, 3).tolist()))
     q = cast(Tuple[float, float, float, float], tuple(R.from_rotvec(np.reshape(r_vec, 3)).as_quat().tolist()))
     return p, q
@@ -64,6 +68,74 @@ def cv_to_se3(r_vec: npt.NDArray[np.float_], t_vec: npt.NDArray[np.float_]) -> s
     Returns:
         SE3 object
     """
+    import spatialmath as sm
     t = np.reshape(t_vec, 3)
     rot = sm.SO3.EulerVec(r_vec)
     return sm.SE3.Rt(rot, t)
+
+
+def matrices_to_pq(mats: npt.ArrayLike) -> npt.NDArray[np.float64]:
+    """ Convert many homogeneous matrices into position quaternion vectors at once
+
+    Args:
+        mats: Homogeneous transformation matrices with shape (N, 4, 4)
+
+    Returns:
+        Position in xyz order and quaternion in xyzw order with shape (N, 7)
+    """
+    m = np.asarray(mats, dtype=np.float64).reshape(-1, 4, 4)
+    rot = m[:, :3, :3]
+    # Compute the largest quaternion component first for numerical stability
+    diag = np.stack([rot[:, 0, 0], rot[:, 1, 1], rot[:, 2, 2]], axis=1)
+    trace = diag.sum(axis=1)
+    candidates = np.stack([1.0 + 2.0 * diag[:, 0] - trace, 1.0 + 2.0 * diag[:, 1] - trace,
+                           1.0 + 2.0 * diag[:, 2] - trace, 1.0 + trace], axis=1)
+    choice = np.argmax(candidates, axis=1)
+    q = np.empty((len(m), 4))
+    for i in range(4):
+        sel = choice == i
+        if not np.any(sel):
+            continue
+        r = rot[sel]
+        s = 2.0 * np.sqrt(candidates[sel, i])
+        if i == 3:
+            q[sel] = np.stack([r[:, 2, 1] - r[:, 1, 2], r[:, 0, 2] - r[:, 2, 0], r[:, 1, 0] - r[:, 0, 1],
+                               0.25 * s * s], axis=1) / s[:, None]
+        else:
+            j, k = (i + 1) % 3, (i + 2) % 3
+            q_sel = np.empty((len(r), 4))
+            q_sel[:, i] = 0.25 * s * s
+            q_sel[:, j] = r[:, j, i] + r[:, i, j]
+            q_sel[:, k] = r[:, k, i] + r[:, i, k]
+            q_sel[:, 3] = r[:, k, j] - r[:, j, k]
+            q[sel] = q_sel / s[:, None]
+    # Unique sign with non-negative w
+    q *= np.where(q[:, 3:4] < 0.0, -1.0, 1.0)
+    return np.concatenate([m[:, :3, 3], q], axis=1)
+
+
+def pq_to_matrices(pq: npt.ArrayLike) -> npt.NDArray[np.float64]:
+    """ Convert many position quaternion vectors into homogeneous matrices at once
+
+    Args:
+        pq: Position in xyz order and quaternion in xyzw order with shape (N, 7)
+
+    Returns:
+        Homogeneous transformation matrices with shape (N, 4, 4)
+    """
+    v = np.asarray(pq, dtype=np.float64).reshape(-1, 7)
+    norm = np.linalg.norm(v[:, 3:], axis=1, keepdims=True)
+    x, y, z, w = (v[:, 3:] / np.where(norm > 0.0, norm, 1.0)).T
+    m = np.zeros((len(v), 4, 4))
+    m[:, 0, 0] = 1.0 - 2.0 * (y * y + z * z)
+    m[:, 0, 1] = 2.0 * (x * y - z * w)
+    m[:, 0, 2] = 2.0 * (x * z + y * w)
+    m[:, 1, 0] = 2.0 * (x * y + z * w)
+    m[:, 1, 1] = 1.0 - 2.0 * (x * x + z * z)
+    m[:, 1, 2] = 2.0 * (y * z - x * w)
+    m[:, 2, 0] = 2.0 * (x * z - y * w)
+    m[:, 2, 1] = 2.0 * (y * z + x * w)
+    m[:, 2, 2] = 1.0 - 2.0 * (x * x + y * y)
+    m[:, :3, 3] = v[:, :3]
+    m[:, 3, 3] = 1.0
+    return m
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+# global
+import numpy as np
+
+# typing
+from typing import Any
+from numpy import typing as npt
+
+
+def rodrigues_batch(r_vecs: npt.ArrayLike) -> npt.NDArray[np.float64]:
+    """ Convert many rotation vectors into rotation matrices at once
+
+    Args:
+        r_vecs: Rotation vectors with axis-angle representation. Shape (N, 3)
+
+    Returns:
+        Rotation matrices with shape (N, 3, 3)
+    """
+    r = np.asarray(r_vecs, dtype=np.float64).reshape(-1, 3)
+    theta = np.linalg.norm(r, axis=1)
+    small = theta < 1e-12
+    k = r / np.where(small, 1.0, theta)[:, None]
+    kx, ky, kz = k[:, 0], k[:, 1], k[:, 2]
+    zeros = np.zeros_like(kx)
+    k_mat = np.stack([zeros, -kz, ky, kz, zeros, -kx, -ky, kx, zeros], axis=1).reshape(-1, 3, 3)
+    sin = np.sin(theta)[:, None, None]
+    cos = np.cos(theta)[:, None, None]
+    rot = np.eye(3) + sin * k_mat + (1.0 - cos) * (k_mat @ k_mat)
+    rot[small] = np.eye(3)
+    return rot  # type: ignore[no-any-return]
+
+
+def distort_normalized(xy: npt.NDArray[np.float64], distortion: npt.ArrayLike) -> npt.NDArray[np.float64]:
+    """ Apply the OpenCV distortion model to normalized image coordinates
+
+    Args:
+        xy:         Normalized (undistorted) image coordinates with shape (..., 2)
+        distortion: Distortion parameters (k1, k2, p1, p2[, k3[, k4, k5, k6[, s1, s2, s3, s4]]]). Tilt parameters
+                    are not supported
+
+    Returns:
+        Distorted normalized image coordinates with the same shape
+    """
+    d = np.zeros(12)
+    dist = np.asarray(distortion, dtype=np.float64).ravel()
+    if dist.size > 12 and np.any(dist[12:] != 0.0):
+        raise ValueError("Tilted sensor distortion parameters are not supported")
+    d[:min(dist.size, 12)] = dist[:12]
+    k1, k2, p1, p2, k3, k4, k5, k6, s1, s2, s3, s4 = d
+    x, y = xy[..., 0], xy[..., 1]
+    r2 = x * x + y * y
+    r4 = r2 * r2
+    r6 = r4 * r2
+    radial = (1.0 + k1 * r2 + k2 * r4 + k3 * r6) / (1.0 + k4 * r2 + k5 * r4 + k6 * r6)
+    xy2 = 2.0 * x * y
+    x_d = x * radial + p1 * xy2 + p2 * (r2 + 2.0 * x * x) + s1 * r2 + s2 * r4
+    y_d = y * radial + p1 * (r2 + 2.0 * y * y) + p2 * xy2 + s3 * r2 + s4 * r4
+    return np.stack([x_d, y_d], axis=-1)
+
+
+def undistort_normalized(xy_d: npt.NDArray[np.float64],
+                         distortion: npt.ArrayLike,
+                         iterations: int = 20) -> npt.NDArray[np.float64]:
+    """ Remove the OpenCV distortion model from normalized image coordinates by fixed point iteration
+
+    Args:
+        xy_d:       Distorted normalized image coordinates with shape (..., 2)
+        distortion: Distortion parameters (k1, k2, p1, p2[, k3[, k4, k5, k6[, s1, s2, s3, s4]]])
+        iterations: Number of fixed point iterations
+
+    Returns:
+        Undistorted normalized image coordinates with the same shape
+    """
+    d = np.zeros(12)
+    dist = np.asarray(distortion, dtype=np.float64).ravel()
+    if dist.size > 12 and np.any(dist[12:] != 0.0):
+        raise ValueError("Tilted sensor distortion parameters are not supported")
+    d[:min(dist.size, 12)] = dist[:12]
+    if not np.any(d):
+        return np.array(xy_d, dtype=np.float64)
+    k1, k2, p1, p2, k3, k4, k5, k6, s1, s2, s3, s4 = d
+    x_d, y_d = xy_d[..., 0], xy_d[..., 1]
+    x, y = x_d.copy(), y_d.copy()
+    for _ in range(iterations):
+        r2 = x * x + y * y
+        r4 = r2 * r2
+        r6 = r4 * r2
+        inv_radial = (1.0 + k4 * r2 + k5 * r4 + k6 * r6) / (1.0 + k1 * r2 + k2 * r4 + k3 * r6)
+        xy2 = 2.0 * x * y
+        delta_x = p1 * xy2 + p2 * (r2 + 2.0 * x * x) + s1 * r2 + s2 * r4
+        delta_y = p1 * (r2 + 2.0 * y * y) + p2 * xy2 + s3 * r2 + s4 * r4
+        x = (x_d - delta_x) * inv_radial
+        y = (y_d - delta_y) * inv_radial
+    return np.stack([x, y], axis=-1)
+
+
+def project_points_batch(obj_points: npt.ArrayLike,
+                         r_vecs: npt.ArrayLike,
+                         t_vecs: npt.ArrayLike,
+                         intrinsic: npt.NDArray[np.float64],
+                         distortion: npt.ArrayLike) -> npt.NDArray[np.float64]:
+    """ Project object points for many poses in a single vectorized pass. Equivalent to calling cv.projectPoints
+        for every pose.
+
+    Args:
+        obj_points: Object points with shape (M, 3) shared by all poses or (N, M, 3) for one set per pose
+        r_vecs:     Rotation vectors with shape (N, 3)
+        t_vecs:     Translation vectors with shape (N, 3)
+        intrinsic:  Intrinsic camera matrix
+        distortion: Distortion parameters
+
+    Returns:
+        Image points with shape (N, M, 2)
+    """
+    return project_points_transformed(obj_points, rodrigues_batch(r_vecs), t_vecs, intrinsic, distortion)
+
+
+def project_points_transformed(obj_points: npt.ArrayLike,
+                               rotations: npt.ArrayLike,
+                               t_vecs: npt.ArrayLike,
+                               intrinsic: npt.NDArray[np.float64],
+                               distortion: npt.ArrayLike) -> npt.NDArray[np.float64]:
+    """ Project object points for many poses given as rotation matrices and translation vectors
+
+    Args:
+        obj_points: Object points with shape (M, 3) shared by all poses or (N, M, 3) for one set per pose
+        rotations:  Rotation matrices with shape (N, 3, 3)
+        t_vecs:     Translation vectors with shape (N, 3)
+        intrinsic:  Intrinsic camera matrix
+        distortion: Distortion parameters
+
+    Returns:
+        Image points with shape (N, M, 2)
+    """
+    rot = np.asarray(rotations, dtype=np.float64).reshape(-1, 3, 3)
+    t = np.asarray(t_vecs, dtype=np.float64).reshape(-1, 1, 3)
+    pts: npt.NDArray[Any] = np.asarray(obj_points, dtype=np.float64)
+    if pts.ndim <= 2:
+        p_cam = np.einsum('nij,mj->nmi', rot, pts.reshape(-1, 3)) + t
+    else:
+        p_cam = np.einsum('nij,nmj->nmi', rot, pts.reshape(pts.shape[0], -1, 3)) + t
+    return project_camera_points(p_cam, intrinsic, distortion)
+
+
+def project_camera_points(points: npt.ArrayLike,
+                          intrinsic: npt.NDArray[np.float64],
+                          distortion: npt.ArrayLike) -> npt.NDArray[np.float64]:
+    """ Project points given in the camera frame into the image
+
+    Args:
+        points:     Points in the camera frame with shape (..., 3)
+        intrinsic:  Intrinsic camera matrix
+        distortion: Distortion parameters
+
+    Returns:
+        Image points with shape (..., 2)
+    """
+    p_cam = np.asarray(points, dtype=np.float64)
+    xy = distort_normalized(p_cam[..., :2] / p_cam[..., 2:3], distortion)
+    # Like OpenCV the skew entry of the intrinsic matrix is ignored
+    k = np.asarray(intrinsic, dtype=np.float64)
+    u = k[0, 0] * xy[..., 0] + k[0, 2]
+    v = k[1, 1] * xy[..., 1] + k[1, 2]
+    return np.stack([u, v], axis=-1)
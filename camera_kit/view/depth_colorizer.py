@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+# global
+import cv2 as cv
+import numpy as np
+
+# typing
+from numpy import typing as npt
+
+
+class DepthColorizer:
+    """ Colorizes raw 16-bit depth images with a lookup table. The table maps every raw depth value to a BGR color
+        and is rebuilt only if the range, the colormap or the depth scale changes. Colorizing uses an internal
+        buffer, so an instance must not be used by several threads at the same time.
+    """
+
+    def __init__(self,
+                 near: float = 0.0,
+                 far: float = 8.5,
+                 colormap: int = cv.COLORMAP_TURBO,
+                 depth_scale: float = 0.001,
+                 invalid_color: tuple[int, int, int] = (0, 0, 0)) -> None:
+        """ Depth colorizer initialization
+
+        Args:
+            near:          Depth which gets the first color of the colormap [m]. Closer values are clamped
+            far:           Depth which gets the last color of the colormap [m]. Further values are clamped
+            colormap:      OpenCV colormap id
+            depth_scale:   Factor to convert raw depth values into meters
+            invalid_color: BGR color of pixels without depth (raw value zero)
+        """
+        self._near = near
+        self._far = far
+        self._colormap = colormap
+        self._depth_scale = depth_scale
+        self._invalid_color = invalid_color
+        self._lut: npt.NDArray[np.uint8] | None = None
+        self._lut_packed: npt.NDArray[np.uint32] = np.empty(0, dtype=np.uint32)
+        self._packed: npt.NDArray[np.uint32] = np.empty((0, 0), dtype=np.uint32)
+        self._indices: npt.NDArray[np.intp] = np.empty((0, 0), dtype=np.intp)
+        self.set_range(near, far)
+
+    @property
+    def near(self) -> float:
+        return self._near
+
+    @property
+    def far(self) -> float:
+        return self._far
+
+    def set_range(self, near: float, far: float) -> None:
+        """ Set the depth range which is spread over the colormap [m] """
+        if far <= near:
+            raise ValueError(f"Far depth {far} must be greater than near depth {near}")
+        if (near, far) != (self._near, self._far):
+            self._near, self._far = near, far
+            self._lut = None
+
+    @property
+    def colormap(self) -> int:
+        return self._colormap
+
+    @colormap.setter
+    def colormap(self, colormap: int) -> None:
+        if colormap != self._colormap:
+            self._colormap = colormap
+            self._lut = None
+
+    @property
+    def depth_scale(self) -> float:
+        return self._depth_scale
+
+    @depth_scale.setter
+    def depth_scale(self, depth_scale: float) -> None:
+        if depth_scale != self._depth_scale:
+            self._depth_scale = depth_scale
+            self._lut = None
+
+    @property
+    def invalid_color(self) -> tuple[int, int, int]:
+        return self._invalid_color
+
+    @invalid_color.setter
+    def invalid_color(self, color: tuple[int, int, int]) -> None:
+        if color != self._invalid_color:
+            self._invalid_color = color
+            self._lut = None
+
+    @property
+    def lut(self) -> npt.NDArray[np.uint8]:
+        """ Lookup table of shape (65536, 3) which maps raw depth values to BGR colors """
+        if self._lut is None:
+            self._build_lut()
+        assert self._lut is not None
+        return self._lut
+
+    def _build_lut(self) -> None:
+        depth = np.arange(65536, dtype=np.float64) * self._depth_scale
+        levels = np.clip((depth - self._near) * (255.0 / (self._far - self._near)), 0.0, 255.0)
+        palette = cv.applyColorMap(np.arange(256, dtype=np.uint8).reshape(256, 1), self._colormap)
+        lut = palette.reshape(256, 3)[np.rint(levels).astype(np.uint8)]
+        lut[0] = self._invalid_color
+        self._lut = lut
+        # BGR colors padded to four bytes. Gathering 32-bit words is much faster than gathering pixel triples
+        packed = np.zeros((65536, 4), dtype=np.uint8)
+        packed[:, :3] = lut
+        self._lut_packed = packed.view(np.uint32).reshape(65536)
+
+    def colorize(self,
+                 depth: npt.NDArray[np.uint16],
+                 dst: npt.NDArray[np.uint8] | None = None) -> npt.NDArray[np.uint8]:
+        """ Colorize a raw depth image with a single table lookup per pixel
+
+        Args:
+            depth: Raw depth image of shape (height, width)
+            dst:   Optional output buffer of shape (height, width, 3)
+
+        Returns:
+            BGR image
+        """
+        if depth.dtype != np.uint16 or depth.ndim != 2:
+            raise TypeError(f"Depth image must be a single channel uint16 image")
+        if self._lut is None:
+            self._build_lut()
+        if self._packed.shape != depth.shape:
+            self._packed = np.empty(depth.shape, dtype=np.uint32)
+            self._indices = np.empty(depth.shape, dtype=np.intp)
+        # Take converts the indices to intp internally. A reused index buffer avoids this allocation
+        np.copyto(self._indices, depth)
+        np.take(self._lut_packed, self._indices, out=self._packed, mode='clip')
+        bgrx = self._packed.view(np.uint8).reshape(depth.shape + (4,))
+        return cv.cvtColor(bgrx, cv.COLOR_BGRA2BGR, dst=dst)  # type: ignore[no-any-return]
+
+    def __call__(self, depth: npt.NDArray[np.uint16], dst: npt.NDArray[np.uint8] | None = None
+                 ) -> npt.NDArray[np.uint8]:
+        return self.colorize(depth, dst)
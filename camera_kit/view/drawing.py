@@ -2,14 +2,15 @@ from __future__ import annotations
 # global
 import cv2 as cv
 import numpy as np
-import spatialmath as sm
 
 # local
 from camera_kit.camera.camera_base import CameraBase
-from camera_kit.utilities.converter import se3_to_cv
 
 # typing
+from typing import TYPE_CHECKING
 from numpy import typing as npt
+if TYPE_CHECKING:
+    import spatialmath as sm
 
 
 class Drawing:
@@ -156,15 +157,13 @@ class Drawing:
         Returns:
             The manipulated image
         """
-        r_vec, t_vec = se3_to_cv(mat)
-        t_vec = t_vec.astype(np.float32)
-        r_vec = r_vec.astype(np.float32)
-        cv.drawFrameAxes(img,
-                         cam.cc.intrinsic,
-                         cam.cc.distortion,
-                         r_vec, t_vec,
-                         length=frame_length,
-                         thickness=Drawing.frame_axes_thickness)
+        # Origin and tips of the x-, y- and z-axis
+        axes = np.vstack([np.zeros(3), frame_length * np.eye(3)])
+        img_pts = np.rint(cam.cc.project_poses(axes, mat)[0]).astype(int)
+        origin, x_tip, y_tip, z_tip = (tuple(pt) for pt in img_pts.tolist())
+        cv.line(img, origin, x_tip, (0, 0, 255), Drawing.frame_axes_thickness)
+        cv.line(img, origin, y_tip, (0, 255, 0), Drawing.frame_axes_thickness)
+        cv.line(img, origin, z_tip, (255, 0, 0), Drawing.frame_axes_thickness)
         return img
 
     @staticmethod
@@ -0,0 +1,73 @@
+# global
+import os
+import time
+import logging
+import argparse
+import tempfile
+import cv2 as cv
+import numpy as np
+import camera_kit as ck
+from pathlib import Path
+
+# typing
+from argparse import Namespace
+
+
+ARUCO_CONFIG = """dictionary: DICT_4X4_50
+marker_size: 0.04
+grid_board:
+  size: [4, 3]
+  separation: 0.01
+"""
+
+
+def benchmark(opt: Namespace) -> None:
+    ll = logging.DEBUG if opt.debug else logging.INFO
+    camera = ck.camera_factory.create('synthetic_farm', logger_level=ll, launch=False, board='aruco',
+                                      board_size=(4, 3), field_size=0.04, marker_separation=0.01,
+                                      aruco_dict=cv.aruco.DICT_4X4_50, frame_size=(1280, 720), noise_std=2.0)
+    poses = camera.random_poses(opt.frames, seed=0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config_fp = Path(tmp_dir).joinpath('aruco.yaml')
+        config_fp.write_text(ARUCO_CONFIG)
+        img_dir = Path(tmp_dir).joinpath('images')
+        img_dir.mkdir()
+        for i, pose in enumerate(poses):
+            cv.imwrite(os.fspath(img_dir.joinpath(f"frame_{i:05}.png")), camera.render_pose(pose))
+        images = [img for _, img in ck.detector_farm.iter_images(img_dir)]
+
+        # Reference: detector in the caller thread
+        detector = ck.ArucoDetector(config_fp)
+        detector.register_camera(camera)
+        t_start = time.perf_counter()
+        single = []
+        for img in images:
+            camera._publish(img)
+            single.append(detector._find_pose()[0])
+        t_single = time.perf_counter() - t_start
+
+        # Detector farm
+        with ck.DetectorFarm(ck.ArucoDetector, config_fp, camera=camera, n_workers=opt.workers) as farm:
+            # Let the workers start up before the measurement
+            farm.submit(images[0])
+            farm.next_result()
+            t_start = time.perf_counter()
+            results = list(farm.map(((i, img) for i, img in enumerate(images))))
+            t_farm = time.perf_counter() - t_start
+        ordered = [r.source for r in results] == list(range(len(images)))
+        errors = [np.linalg.norm(r.matrix[:3, 3] - np.asarray(camera._as_matrix(p))[:3, 3])
+                  for r, p in zip(results, poses) if r.found]
+    print(f"Caller thread: {len(images) / t_single:.1f} fps, found {sum(single)} / {len(images)}")
+    print(f"Farm with {farm.n_workers} workers: {len(images) / t_farm:.1f} fps, found {len(errors)} / {len(images)}, "
+          f"in order: {ordered}")
+    if errors:
+        print(f"Maximal position error: {1e3 * max(errors):.2f} mm")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Detector farm benchmark with synthetic ArUco images")
+    parser.add_argument('--frames', type=int, default=200, help='Number of rendered frames')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('--debug', action='store_true', help='Set logging level to debug')
+    args = parser.parse_args()
+    benchmark(args)
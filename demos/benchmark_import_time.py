@@ -0,0 +1,52 @@
+# global
+import sys
+import time
+import argparse
+import subprocess
+
+# typing
+from typing import List
+from argparse import Namespace
+
+
+# Modules which must not be imported by 'import camera_kit'
+HEAVY_MODULES = ['pyrealsense2', 'spatialmath', 'scipy', 'tqdm', 'yaml']
+
+
+def measure_import_time() -> float:
+    """ Import camera_kit in a fresh interpreter and return the import time in seconds """
+    code = ("import sys, time\n"
+            "t = time.perf_counter()\n"
+            "import camera_kit\n"
+            "print(time.perf_counter() - t)\n")
+    out = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def loaded_heavy_modules() -> List[str]:
+    """ Import camera_kit in a fresh interpreter and return the heavy modules which got loaded """
+    code = ("import sys\n"
+            "import camera_kit\n"
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n")
+    out = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True)
+    return [m for m in out.stdout.strip().split(',') if m]
+
+
+def benchmark(opt: Namespace) -> None:
+    loaded = loaded_heavy_modules()
+    times = sorted(measure_import_time() for _ in range(opt.runs))
+    median = times[len(times) // 2]
+    print(f"Import time of camera_kit: median {1e3 * median:.1f} ms, min {1e3 * times[0]:.1f} ms "
+          f"over {opt.runs} runs")
+    if loaded:
+        sys.exit(f"Heavy modules imported eagerly: {loaded}")
+    if median > opt.max_time:
+        sys.exit(f"Import time {1e3 * median:.1f} ms exceeds limit of {1e3 * opt.max_time:.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Import time benchmark")
+    parser.add_argument('--runs', type=int, default=5, help='Number of fresh interpreter runs')
+    parser.add_argument('--max_time', type=float, default=0.5, help='Upper limit of the median import time [s]')
+    args = parser.parse_args()
+    benchmark(args)
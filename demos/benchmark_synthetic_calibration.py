@@ -0,0 +1,54 @@
+# global
+import os
+import time
+import logging
+import argparse
+import tempfile
+import cv2 as cv
+import numpy as np
+import camera_kit as ck
+from pathlib import Path
+from camera_kit.camera import CameraCoefficient
+
+# typing
+from argparse import Namespace
+
+
+def benchmark(opt: Namespace) -> None:
+    ll = logging.DEBUG if opt.debug else logging.INFO
+    # Ground truth camera coefficients
+    cc = CameraCoefficient('synthetic_calib')
+    cc.intrinsic = np.array([[900.0, 0.0, 640.0], [0.0, 900.0, 360.0], [0.0, 0.0, 1.0]])
+    cc.distortion = np.array([-0.2, 0.05, 0.001, -0.001, 0.0])
+    camera = ck.camera_factory.create('synthetic_calib', logger_level=ll, launch=False, cc=cc, board_size=(10, 7),
+                                      field_size=0.03, noise_std=opt.noise, blur_size=opt.blur, seed=opt.seed)
+    poses = camera.random_poses(opt.views, seed=opt.seed)
+    chessboard = ck.ChessboardDescription((10, 7), 30)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        t_start = time.perf_counter()
+        for i, pose in enumerate(poses):
+            cv.imwrite(os.fspath(Path(tmp_dir).joinpath(f"calib_img_{i:03}.png")), camera.render_pose(pose))
+        t_render = time.perf_counter() - t_start
+        t_start = time.perf_counter()
+        result, report = ck.CameraCalibration.find_coeffs_report(camera, chessboard, dir_path=tmp_dir,
+                                                                     outlier_factor=3.0)
+        t_calib = time.perf_counter() - t_start
+    gt, est = cc.intrinsic, result.intrinsic
+    print(f"Rendered {opt.views} views in {t_render:.2f} s ({opt.views / t_render:.1f} fps)")
+    print(f"Calibration took {t_calib:.2f} s")
+    if report is not None:
+        print(f"Re-projection error: {report.rms:.3f} px. Rejected views: {len(report.rejected)}")
+    print(f"Focal length error: {est[0, 0] - gt[0, 0]:.2f} px, {est[1, 1] - gt[1, 1]:.2f} px")
+    print(f"Principal point error: {est[0, 2] - gt[0, 2]:.2f} px, {est[1, 2] - gt[1, 2]:.2f} px")
+    print(f"Distortion error: {np.round(np.ravel(result.distortion)[:5] - cc.distortion, 4).tolist()}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Calibration benchmark with synthetic images")
+    parser.add_argument('--views', type=int, default=40, help='Number of rendered views')
+    parser.add_argument('--noise', type=float, default=2.0, help='Standard deviation of the pixel noise')
+    parser.add_argument('--blur', type=int, default=0, help='Kernel size of the gaussian blur')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random poses')
+    parser.add_argument('--debug', action='store_true', help='Set logging level to debug')
+    args = parser.parse_args()
+    benchmark(args)
@@ -11,16 +11,29 @@ def calibrate(opt: Namespace) -> None:
 
     ll = logging.DEBUG if opt.debug else logging.INFO
     with ck.camera_manager(name='build_in_calib', logger_level=ll) as camera:
-        # Record some images
-        ck.CameraCalibration().record_images(camera)
-        # Run calibration
         chessboard = ck.ChessboardDescription((11, 17), 16)
-        cc = ck.CameraCalibration().find_coeffs(camera, chessboard, display=True)
+        if opt.live:
+            # Record images and solve coefficients at the same time
+            cc = ck.CameraCalibration().calibrate_live(camera, chessboard)
+        else:
+            # Record some images
+            if opt.auto:
+                ck.CameraCalibration().record_images(camera, board=chessboard)
+            else:
+                ck.CameraCalibration().record_images(camera)
+            # Run calibration. Reject outlier images and save the report next to the coefficients
+            cc = ck.CameraCalibration().find_coeffs(camera, chessboard, display=True,
+                                                    outlier_factor=opt.outlier_factor,
+                                                    report_dir=str(camera.coeffs_path.parent))
         camera.save_coefficients(cc)
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Calibration demo")
+    parser.add_argument('--auto', action='store_true', help='Record calibration images automatically')
+    parser.add_argument('--live', action='store_true', help='Solve coefficients while recording')
+    parser.add_argument('--outlier_factor', type=float, default=3.0,
+                        help='Reject images whose error exceeds this factor of the median error. Zero keeps all')
     parser.add_argument('--debug', action='store_true', help='Set logging level to debug')
     args = parser.parse_args()
     calibrate(args)
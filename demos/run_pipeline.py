@@ -0,0 +1,23 @@
+# global
+import logging
+import argparse
+import camera_kit as ck
+
+# typing
+from argparse import Namespace
+
+
+def run_pipeline(opt: Namespace) -> None:
+    ck.logger.set_logging_level(logging.DEBUG if opt.debug else logging.INFO)
+    pipeline = ck.Pipeline.from_yaml(opt.config)
+    pipeline.run(duration=opt.duration)
+    print(pipeline.report())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run a pipeline described by a YAML file")
+    parser.add_argument('config', type=str, help='Pipeline YAML file')
+    parser.add_argument('--duration', type=float, default=None, help='Maximal run time [s]')
+    parser.add_argument('--debug', action='store_true', help='Set logging level to debug')
+    args = parser.parse_args()
+    run_pipeline(args)
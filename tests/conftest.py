@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+# global
+import sys
+import pytest
+
+# local
+from tests import pyrealsense2_stub as rs
+
+# typing
+from typing import Iterator
+
+
+@pytest.fixture
+def rs_stub(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    """ Run the RealSense backend with the pyrealsense2 stub """
+    monkeypatch.setitem(sys.modules, 'pyrealsense2', rs)
+    from camera_kit.camera import camera_realsense
+    monkeypatch.setattr(camera_realsense, 'rs', rs)
+    yield
+    cam = camera_realsense.CameraRealSense._instance
+    if cam is not None:
+        cam.end()
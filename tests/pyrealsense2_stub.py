@@ -0,0 +1,314 @@
+""" Minimal stand-in for the pyrealsense2 module
+
+The stub implements the part of the pyrealsense2 API used by CameraRealSense. It records the configuration calls
+and delivers synthetic color and depth frames, which allows to check the stream configuration logic without a
+device or librealsense. The stub is part of the tests and not installed with the package. Install it before the
+RealSense backend gets imported:
+
+    from tests import pyrealsense2_stub
+    pyrealsense2_stub.install()
+    cam = camera_kit.camera_factory.create('realsense', depth_size=(640, 480), align='on_demand')
+"""
+from __future__ import annotations
+
+# global
+import sys
+import time
+import numpy as np
+from enum import Enum
+
+# typing
+from typing import Any
+from numpy import typing as npt
+
+
+class camera_info(Enum):
+    name = 0
+    product_line = 1
+    serial_number = 2
+
+
+class stream(Enum):
+    any = 0
+    depth = 1
+    color = 2
+
+
+class format(Enum):
+    any = 0
+    z16 = 1
+    bgr8 = 2
+
+
+class option(Enum):
+    filter_magnitude = 0
+    filter_smooth_alpha = 1
+    filter_smooth_delta = 2
+    holes_fill = 3
+
+
+class timestamp_domain(Enum):
+    hardware_clock = 0
+    system_time = 1
+    global_time = 2
+
+
+class frame_metadata_value(Enum):
+    frame_timestamp = 0
+    sensor_timestamp = 1
+    time_of_arrival = 2
+    actual_exposure = 3
+
+
+# Stub settings which can be changed to emulate other devices
+depth_scale = 0.001
+# Clock of the frame timestamps and time between exposure and arrival of a frame [s]
+frame_timestamp_domain = timestamp_domain.hardware_clock
+transfer_latency = 0.0
+product_line = "D400"
+has_rgb_sensor = True
+# Number of frames after which wait_for_frames raises a RuntimeError. Negative values disable the failure
+fail_after_frames = -1
+
+
+class frame:
+
+    def __init__(self, data: npt.NDArray[Any], stream_type: stream, timestamp: float, frame_number: int,
+                 metadata: dict[frame_metadata_value, int] | None = None) -> None:
+        self._data = data
+        self._stream_type = stream_type
+        self._timestamp = timestamp
+        self._frame_number = frame_number
+        self._domain = frame_timestamp_domain
+        self._metadata = metadata or {}
+
+    def __bool__(self) -> bool:
+        return self._data is not None
+
+    def get_data(self) -> npt.NDArray[Any]:
+        return self._data
+
+    def get_timestamp(self) -> float:
+        return self._timestamp
+
+    def get_frame_number(self) -> int:
+        return self._frame_number
+
+    def get_frame_timestamp_domain(self) -> timestamp_domain:
+        return self._domain
+
+    def supports_frame_metadata(self, value: frame_metadata_value) -> bool:
+        return value in self._metadata
+
+    def get_frame_metadata(self, value: frame_metadata_value) -> int:
+        if value not in self._metadata:
+            raise RuntimeError(f"Metadata {value} is not supported")
+        return self._metadata[value]
+
+    def get_width(self) -> int:
+        return int(self._data.shape[1])
+
+    def get_height(self) -> int:
+        return int(self._data.shape[0])
+
+    def keep(self) -> None:
+        pass
+
+    def as_frameset(self) -> composite_frame:
+        assert isinstance(self, composite_frame)
+        return self
+
+
+class depth_frame(frame):
+
+    def get_distance(self, x: int, y: int) -> float:
+        return float(self._data[y, x]) * depth_scale
+
+
+class composite_frame(frame):
+
+    def __init__(self, color: frame | None, depth: depth_frame | None, timestamp: float, frame_number: int) -> None:
+        super().__init__(np.zeros(0), stream.any, timestamp, frame_number)
+        self._color = color
+        self._depth = depth
+
+    def get_color_frame(self) -> frame | None:
+        return self._color
+
+    def get_depth_frame(self) -> depth_frame | None:
+        return self._depth
+
+
+class sensor:
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+
+    def get_info(self, info: camera_info) -> str:
+        return self._name
+
+
+class depth_sensor(sensor):
+
+    def get_depth_scale(self) -> float:
+        return depth_scale
+
+
+class device:
+
+    def __init__(self) -> None:
+        self.sensors: list[sensor] = [depth_sensor('Stereo Module')]
+        if has_rgb_sensor:
+            self.sensors.append(sensor('RGB Camera'))
+
+    def get_info(self, info: camera_info) -> str:
+        return product_line if info == camera_info.product_line else "Intel RealSense Stub"
+
+    def first_depth_sensor(self) -> depth_sensor:
+        return next(s for s in self.sensors if isinstance(s, depth_sensor))
+
+
+class pipeline_profile:
+
+    def __init__(self) -> None:
+        self._device = device()
+
+    def get_device(self) -> device:
+        return self._device
+
+
+class config:
+
+    def __init__(self) -> None:
+        # Enabled streams as (stream, width, height, format, fps)
+        self.streams: list[tuple[stream, int, int, format, int]] = []
+
+    def enable_stream(self, stream_type: stream, width: int, height: int, fmt: format, fps: int) -> None:
+        self.streams.append((stream_type, width, height, fmt, fps))
+
+    def resolve(self, wrapper: pipeline_wrapper) -> pipeline_profile:
+        return pipeline_profile()
+
+
+class pipeline:
+
+    def __init__(self) -> None:
+        self.started = False
+        self._cfg: config | None = None
+        self._count = 0
+        self._t_start = 0.0
+
+    def start(self, cfg: config) -> pipeline_profile:
+        self.started = True
+        self._cfg = cfg
+        self._count = 0
+        self._t_start = time.time()
+        return pipeline_profile()
+
+    def stop(self) -> None:
+        self.started = False
+
+    def wait_for_frames(self, timeout_ms: int = 5000) -> composite_frame:
+        if not self.started or self._cfg is None:
+            raise RuntimeError("Pipeline is not started")
+        if 0 <= fail_after_frames <= self._count:
+            raise RuntimeError("Frame didn't arrive within 5000")
+        streams = {s[0]: s for s in self._cfg.streams}
+        fps = max([s[4] for s in self._cfg.streams] + [1])
+        time.sleep(1.0 / fps)
+        self._count += 1
+        arrival = time.time()
+        exposed_at = arrival - transfer_latency
+        timestamp = 1e3 * (exposed_at if frame_timestamp_domain == timestamp_domain.global_time
+                           else exposed_at - self._t_start)
+        metadata = {frame_metadata_value.time_of_arrival: int(1e3 * arrival),
+                    frame_metadata_value.sensor_timestamp: int(1e6 * (exposed_at - self._t_start))}
+        color = None
+        if stream.color in streams:
+            _, width, height, _, _ = streams[stream.color]
+            color = frame(np.full((height, width, 3), self._count % 256, dtype=np.uint8), stream.color,
+                          timestamp, self._count, metadata)
+        depth = None
+        if stream.depth in streams:
+            _, width, height, _, _ = streams[stream.depth]
+            data = np.tile(np.linspace(300, 3000, width, dtype=np.uint16), (height, 1))
+            depth = depth_frame(data, stream.depth, timestamp, self._count)
+        return composite_frame(color, depth, timestamp, self._count)
+
+
+class pipeline_wrapper:
+
+    def __init__(self, pipe: pipeline) -> None:
+        self.pipeline = pipe
+
+
+def _resize_nearest(data: npt.NDArray[Any], width: int, height: int) -> npt.NDArray[Any]:
+    rows = np.arange(height) * data.shape[0] // height
+    cols = np.arange(width) * data.shape[1] // width
+    return data[rows[:, None], cols]
+
+
+class align:
+    """ Resamples the other stream into the viewport of the target stream. Counts the processed frames. """
+
+    def __init__(self, align_to: stream) -> None:
+        self.align_to = align_to
+        self.n_processed = 0
+
+    def process(self, frames: composite_frame) -> composite_frame:
+        self.n_processed += 1
+        color, depth = frames.get_color_frame(), frames.get_depth_frame()
+        if color is None or depth is None:
+            return frames
+        if self.align_to == stream.color:
+            data = _resize_nearest(depth.get_data(), color.get_width(), color.get_height())
+            depth = depth_frame(data, stream.depth, depth.get_timestamp(), depth.get_frame_number())
+        else:
+            data = _resize_nearest(color.get_data(), depth.get_width(), depth.get_height())
+            color = frame(data, stream.color, color.get_timestamp(), color.get_frame_number())
+        return composite_frame(color, depth, frames.get_timestamp(), frames.get_frame_number())
+
+
+class filter:
+
+    def __init__(self, *args: Any) -> None:
+        self.options: dict[option, float] = {}
+        self.n_processed = 0
+
+    def set_option(self, opt: option, value: float) -> None:
+        self.options[opt] = value
+
+    def process(self, frames: frame) -> frame:
+        self.n_processed += 1
+        return frames
+
+
+class decimation_filter(filter):
+
+    def process(self, frames: frame) -> frame:
+        self.n_processed += 1
+        if not isinstance(frames, composite_frame) or frames.get_depth_frame() is None:
+            return frames
+        depth = frames.get_depth_frame()
+        assert depth is not None
+        step = int(self.options.get(option.filter_magnitude, 2))
+        data = depth.get_data()[::step, ::step]
+        depth = depth_frame(data, stream.depth, depth.get_timestamp(), depth.get_frame_number())
+        return composite_frame(frames.get_color_frame(), depth, frames.get_timestamp(), frames.get_frame_number())
+
+
+class spatial_filter(filter):
+    pass
+
+
+class temporal_filter(filter):
+    pass
+
+
+class disparity_transform(filter):
+    pass
+
+
+def install() -> None:
+    """ Register this stub as pyrealsense2 module """
+    sys.modules['pyrealsense2'] = sys.modules[__name__]
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+# global
+import time
+import pytest
+import numpy as np
+
+# local
+import camera_kit as ck
+from tests import pyrealsense2_stub as rs
+
+# typing
+from typing import Any
+
+
+def create(**kwargs: Any) -> Any:
+    kwargs.setdefault('frame_size', (64, 48))
+    kwargs.setdefault('fps', 120)
+    return ck.camera_factory.create('realsense', **kwargs)
+
+
+def wait_frameset(cam: Any) -> ck.FrameSet:
+    frameset = cam.wait_frameset(0, timeout=2.0)
+    assert frameset.seq_id > 0
+    return cam.get_frameset()
+
+
+@pytest.mark.parametrize('align', ["none", "depth_to_color", "color_to_depth", "on_demand"])
+@pytest.mark.parametrize('depth_size', [None, (32, 24)])
+def test_alignment_modes(rs_stub: None, align: str, depth_size: tuple[int, int] | None) -> None:
+    cam = create(align=align, depth_size=depth_size)
+    frameset = wait_frameset(cam)
+    color_shape = (48, 64)
+    depth_shape = (24, 32) if depth_size else color_shape
+    assert frameset.depth is not None
+    if align == "none":
+        assert cam._align is None
+        assert frameset.color.shape[:2] == color_shape
+        assert frameset.depth.shape == depth_shape
+    elif align == "color_to_depth":
+        # Color is resampled into the depth viewport
+        assert cam._align.align_to == rs.stream.depth
+        assert frameset.color.shape[:2] == frameset.depth.shape == depth_shape
+    else:
+        assert cam._align.align_to == rs.stream.color
+        assert frameset.color.shape[:2] == frameset.depth.shape == color_shape
+    assert cam.get_depth_frame().shape == frameset.depth.shape + (3,)
+
+
+def test_on_demand_aligns_only_requested_frames(rs_stub: None) -> None:
+    cam = create(align="on_demand", depth_size=(32, 24))
+    wait_frameset(cam)
+    n_aligned = cam._align.n_processed
+    seq_id = cam.seq_id
+    time.sleep(0.1)
+    # Frames which nobody requested aren't aligned
+    assert cam.seq_id > seq_id
+    assert cam._align.n_processed == n_aligned
+    frameset = cam.get_frameset()
+    assert cam._align.n_processed == n_aligned + 1
+    assert frameset.depth is not None and frameset.depth.shape == (48, 64)
+    assert cam.last_frameset is frameset
+
+
+@pytest.mark.parametrize('depth_size, depth_fps', [(None, None), ((32, 24), None), ((32, 24), 60)])
+def test_stream_profiles(rs_stub: None, depth_size: tuple[int, int] | None, depth_fps: int | None) -> None:
+    cam = create(depth_size=depth_size, depth_fps=depth_fps)
+    streams = {s[0]: s[1:] for s in cam._rs_cfg.streams}
+    assert streams[rs.stream.color] == (64, 48, rs.format.bgr8, 120)
+    width, height = depth_size or (64, 48)
+    assert streams[rs.stream.depth] == (width, height, rs.format.z16, depth_fps or 120)
+
+
+@pytest.mark.parametrize('decimation', [0, 2])
+@pytest.mark.parametrize('spatial_filter', [False, True])
+@pytest.mark.parametrize('temporal_filter', [False, True])
+def test_depth_filters(rs_stub: None, decimation: int, spatial_filter: bool, temporal_filter: bool) -> None:
+    cam = create(align="none", decimation=decimation, spatial_filter=spatial_filter,
+                 temporal_filter=temporal_filter)
+    expected: list[type] = [rs.decimation_filter] if decimation else []
+    if spatial_filter or temporal_filter:
+        expected.append(rs.disparity_transform)
+        expected += [rs.spatial_filter] if spatial_filter else []
+        expected += [rs.temporal_filter] if temporal_filter else []
+        expected.append(rs.disparity_transform)
+    assert [type(f) for f in cam._filters] == expected
+    frameset = wait_frameset(cam)
+    assert frameset.depth is not None
+    assert frameset.depth.shape == ((24, 32) if decimation else (48, 64))
+    assert all(f.n_processed > 0 for f in cam._filters)
+
+
+def test_reconfiguration_restarts_stream(rs_stub: None) -> None:
+    cam = create(align="none")
+    pipeline = cam._rs_pipeline
+    assert create(align="none") is cam and cam._rs_pipeline is pipeline
+    create(align="depth_to_color")
+    assert cam._rs_pipeline is not pipeline and not pipeline.started
+    assert cam.align_mode == "depth_to_color" and cam._align is not None
+
+
+def test_invalid_settings(rs_stub: None) -> None:
+    with pytest.raises(ValueError):
+        create(align="sideways")
+    with pytest.raises(ValueError):
+        create(fps=0)
+    with pytest.raises(ValueError):
+        create(depth_fps=-1)
+
+
+def test_device_without_color_sensor(rs_stub: None, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(rs, 'has_rgb_sensor', False)
+    with pytest.raises(RuntimeError):
+        create()
+
+
+@pytest.mark.parametrize('align', ["depth_to_color", "on_demand"])
+def test_depth_frame_is_not_a_reused_buffer(rs_stub: None, align: str) -> None:
+    cam = create(align=align)
+    wait_frameset(cam)
+    depth = cam.get_depth_frame()
+    assert depth is not cam.depth_frame and depth.flags.writeable
+    expected = depth.copy()
+    # Changes of the copy don't reach the buffer pool
+    depth[:] = 0
+    assert not np.shares_memory(depth, cam.depth_frame)
+    kept = cam.get_depth_frame()
+    seq_id = cam.seq_id
+    cam.wait_frameset(seq_id + 5, timeout=2.0)
+    cam.get_depth_frame()
+    # Later frames don't overwrite a kept image
+    assert np.array_equal(kept, expected)
+    view = cam.get_depth_frame(roi=(0, 0, 16, 16))
+    assert not view.flags.writeable
+
+
+def test_stale_depth_request(rs_stub: None, monkeypatch: pytest.MonkeyPatch) -> None:
+    cam = create(align="depth_to_color")
+    wait_frameset(cam)
+    cam.stale_policy = "raise"
+    monkeypatch.setattr(rs, 'fail_after_frames', 0)
+    time.sleep(cam.stale_timeout + 0.1)
+    with pytest.raises(ck.StaleFrameError):
+        cam.get_depth_frame()
+
+
+def test_restart_stops_capture_thread(rs_stub: None) -> None:
+    cam = create(align="none")
+    wait_frameset(cam)
+    thread, pipeline = cam._thread, cam._rs_pipeline
+    cam._restarting = True
+    try:
+        cam.end()
+        # The capture loop has exited before the device is released
+        assert not thread.is_alive()
+        assert not pipeline.started
+        cam.start()
+    finally:
+        cam._restarting = False
+    assert cam._thread is not thread and cam._thread.is_alive()
+    assert wait_frameset(cam).seq_id > 0
+
+
+def test_on_demand_keeps_newer_pending_frames(rs_stub: None, monkeypatch: pytest.MonkeyPatch) -> None:
+    cam = create(align="on_demand", depth_size=(32, 24))
+    wait_frameset(cam)
+    process = cam._align.process
+    published = []
+
+    def process_and_publish(frames: Any) -> Any:
+        # The capture thread publishes a new frame set while the consumer aligns the previous one
+        with cam._pending_lock:
+            cam._pending = (cam._pending[0], frames)
+            published.append(cam._pending)
+        return process(frames)
+
+    monkeypatch.setattr(cam._align, 'process', process_and_publish)
+    deadline = time.time() + 2.0
+    while cam._pending is None and time.time() < deadline:
+        time.sleep(0.001)
+    cam._align_pending()
+    assert published and cam._pending is not None
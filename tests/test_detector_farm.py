@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+# global
+import pytest
+import numpy as np
+from pathlib import Path
+from concurrent.futures import wait
+from multiprocessing import shared_memory
+
+# local
+import camera_kit as ck
+
+# typing
+from typing import Any, Iterator, TYPE_CHECKING
+if TYPE_CHECKING:
+    import spatialmath as sm
+
+
+# Brightness of frames the test detector fails on
+FAILING_BRIGHTNESS = 200
+
+
+class BrightnessDetector(ck.DetectorBase):
+    """ Test detector. The x-position of the pose is the mean brightness of the frame """
+
+    def _find_pose(self) -> tuple[bool, sm.SE3]:
+        import spatialmath as sm
+        brightness = float(np.mean(self._color_frame()))
+        if brightness == FAILING_BRIGHTNESS:
+            raise ValueError("Detector broke down")
+        return brightness > 0.0, sm.SE3.Trans(brightness, 0.0, 0.0)
+
+
+@pytest.fixture
+def config_file(tmp_path: Path) -> Path:
+    fp = tmp_path.joinpath('detector.yaml')
+    fp.write_text("{}\n")
+    return fp
+
+
+@pytest.fixture
+def farm(config_file: Path) -> Iterator[ck.DetectorFarm]:
+    camera = ck.CameraFeed('farm_test')
+    camera.cc.intrinsic = np.array([[100.0, 0.0, 32.0], [0.0, 100.0, 24.0], [0.0, 0.0, 1.0]])
+    camera.is_calibrated = True
+    with ck.DetectorFarm(BrightnessDetector, config_file, camera, n_workers=2, max_pending=2) as farm:
+        yield farm
+
+
+def frame(value: int, shape: tuple[int, int, int] = (48, 64, 3)) -> np.ndarray[Any, Any]:
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def slot_exists(name: str) -> bool:
+    try:
+        slot = shared_memory.SharedMemory(name)
+    except FileNotFoundError:
+        return False
+    slot.close()
+    return True
+
+
+def test_results_in_sequence_order(farm: ck.DetectorFarm) -> None:
+    results = list(farm.map((i, frame(i)) for i in range(20)))
+    assert [r.source for r in results] == list(range(20))
+    assert [r.seq_id for r in results] == list(range(20))
+    # The workers see the frames which were copied into the shared memory slots
+    assert [r.found for r in results] == [i > 0 for i in range(20)]
+    assert np.allclose([r.matrix[0, 3] for r in results], np.arange(20))
+    assert len(farm) == 0
+
+
+def test_failed_frame_doesnt_block_later_results(farm: ck.DetectorFarm) -> None:
+    values = [1, 2, FAILING_BRIGHTNESS, 3, 4]
+    for value in values:
+        farm.submit(frame(value))
+    results = [farm.next_result(), farm.next_result()]
+    with pytest.raises(ValueError):
+        farm.next_result()
+    results += [farm.next_result(), farm.next_result()]
+    assert [r.seq_id for r in results if r is not None] == [0, 1, 3, 4]
+    assert np.allclose([r.matrix[0, 3] for r in results if r is not None], [1, 2, 3, 4])
+    assert farm.next_result() is None and len(farm) == 0
+
+
+def test_slots_are_reused(farm: ck.DetectorFarm) -> None:
+    list(farm.map((i, frame(i)) for i in range(20)))
+    names = {slot.name for slot in farm._slots}
+    list(farm.map((i, frame(i)) for i in range(20)))
+    assert {slot.name for slot in farm._slots} == names
+    assert len(names) <= 2 * farm.max_pending
+    assert len(farm._free_slots) == len(farm._slots)
+
+
+def test_replaced_slots_are_unlinked(farm: ck.DetectorFarm) -> None:
+    list(farm.map((i, frame(i)) for i in range(4)))
+    small_names = [slot.name for slot in farm._slots]
+    assert small_names and all(slot_exists(name) for name in small_names)
+    results = list(farm.map((i, frame(i, (96, 128, 3))) for i in range(4)))
+    assert np.allclose([r.matrix[0, 3] for r in results], np.arange(4))
+    # Slots of the smaller frames are released when larger frames arrive
+    assert not any(slot_exists(name) for name in small_names)
+    assert all(slot.size >= 96 * 128 * 3 for slot in farm._slots)
+    large_names = [slot.name for slot in farm._slots]
+    farm.shutdown()
+    assert not any(slot_exists(name) for name in large_names)
+
+
+def test_latest_result_skips_older_results(farm: ck.DetectorFarm) -> None:
+    for i in range(4):
+        farm.submit(frame(i))
+    wait(list(farm._pending.values()))
+    result = farm.latest_result()
+    assert result is not None and result.seq_id == 3
+    assert farm.latest_result() is None and len(farm) == 0
+    with pytest.raises(ValueError):
+        farm.submit(frame(1), seq_id=2)
+
+
+def test_invalid_inputs(config_file: Path, tmp_path: Path) -> None:
+    with pytest.raises(FileNotFoundError):
+        ck.DetectorFarm(BrightnessDetector, tmp_path.joinpath('missing.yaml'), ck.CameraFeed('farm_test'))
+    with pytest.raises(ValueError):
+        ck.DetectorFarm(BrightnessDetector, config_file)
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+# global
+import gc
+import tracemalloc
+import numpy as np
+from collections import deque
+
+# local
+import camera_kit as ck
+from camera_kit.camera.frame_buffer import FrameBufferPool
+from tests import pyrealsense2_stub as rs
+
+# typing
+from typing import Any, Callable, Deque
+
+
+def test_released_buffer_is_reused() -> None:
+    pool = FrameBufferPool(size=2)
+    first = pool.get((4, 4))
+    address = first.ctypes.data
+    del first
+    held = pool.get((4, 4))
+    # The oldest released buffer is handed out first
+    assert held.ctypes.data != address
+    assert pool.get((4, 4)).ctypes.data == address
+    assert len(pool) == 2
+
+
+def test_held_buffer_is_not_reused() -> None:
+    pool = FrameBufferPool(size=1, max_size=2)
+    held = pool.get((4, 4))
+    # Views of a published frame set keep the buffer in use after the buffer itself is dropped
+    frameset = ck.FrameSet(held)
+    view = frameset.color_view(roi=(1, 1, 2, 2))
+    address = held.ctypes.data
+    del held, frameset
+    grown = pool.get((4, 4))
+    assert len(pool) == 2 and not np.shares_memory(grown, view)
+    # The pool is full. Further requests get temporary buffers
+    temporary = pool.get((4, 4))
+    assert len(pool) == 2 and not np.shares_memory(temporary, view)
+    del view
+    assert pool.get((4, 4)).ctypes.data == address
+
+
+def test_format_change_discards_buffers() -> None:
+    pool = FrameBufferPool(size=2)
+    old = pool.get((4, 4))
+    new = pool.get((4, 4, 3))
+    assert new.shape == (4, 4, 3) and pool.n_free == 1
+    del old
+    # Buffers of the previous format don't return to the pool
+    assert pool.n_free == 1
+    assert pool.get((4, 4, 3), np.uint16).dtype == np.uint16
+
+
+def test_zeroed_buffers() -> None:
+    pool = FrameBufferPool(size=1, zeroed=True)
+    assert not pool.get((4, 4)).any()
+
+
+def bytes_per_frame(publish: Callable[[], Any], n_frames: int = 20, n_consumers: int = 3) -> float:
+    """ Mean number of bytes allocated while one frame is processed and published """
+    held: Deque[Any] = deque(maxlen=n_consumers)
+    # Fill the buffer pools
+    for _ in range(n_consumers + 5):
+        held.append(publish())
+    gc.collect()
+    allocated = 0
+    for _ in range(n_frames):
+        tracemalloc.start()
+        held.append(publish())
+        # The peak covers every temporary image of the processing chain
+        allocated += tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return allocated / n_frames
+
+
+def test_build_in_capture_reuses_buffers() -> None:
+    cam = ck.camera_factory.create('build_in', frame_size=(320, 240), launch=False)
+    raw_frame = np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    assert bytes_per_frame(lambda: cam._publish_raw(raw_frame)) < 0.05 * 320 * 240 * 3
+    assert len(cam._color_buffers) <= 5
+
+
+def test_realsense_capture_reuses_buffers(rs_stub: None) -> None:
+    cam = ck.camera_factory.create('realsense', frame_size=(320, 240), launch=False)
+    pipeline, config = rs.pipeline(), rs.config()
+    cam._configure_streams(config)
+    pipeline.start(config)
+    frames = pipeline.wait_for_frames()
+    color_frame, depth_frame = frames.get_color_frame(), frames.get_depth_frame()
+    allocated = bytes_per_frame(lambda: cam._publish_frames(color_frame, depth_frame))
+    assert allocated < 0.05 * 320 * 240 * 3
+    assert len(cam._color_buffers) <= 5 and len(cam._depth_buffers) <= 5
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+# global
+import time
+import pytest
+import numpy as np
+import spatialmath as sm
+from pathlib import Path
+
+# local
+import camera_kit as ck
+
+# typing
+from typing import Iterator
+
+
+def frameset(capture_time: float) -> ck.FrameSet:
+    return ck.FrameSet(np.zeros((4, 4, 3), dtype=np.uint8), host_timestamp=capture_time, capture_time=capture_time)
+
+
+def test_summary_statistics() -> None:
+    tracer = ck.LatencyTracer()
+    fs = frameset(100.0)
+    for k in range(1, 101):
+        tracer.record('cam', 'publish', fs, 100.0 + 1e-3 * k)
+    summary = tracer.summary()[('cam', 'publish')]
+    assert summary['count'] == 100
+    assert summary['mean'] == pytest.approx(50.5)
+    assert summary['p50'] == pytest.approx(50.5)
+    assert summary['p90'] == pytest.approx(90.1)
+    assert summary['p99'] == pytest.approx(99.01)
+    assert summary['max'] == pytest.approx(100.0)
+    assert "publish" in tracer.report()
+
+
+def test_samples_keep_the_latest_values() -> None:
+    tracer = ck.LatencyTracer(capacity=10)
+    for k in range(25):
+        tracer.record('cam', 'consume', frameset(0.0), float(k))
+    assert np.array_equal(tracer.samples('cam', 'consume'), np.arange(15.0, 25.0))
+    assert tracer.summary()[('cam', 'consume')]['count'] == 10
+    # Frame sets without capture time aren't recorded
+    tracer.record('cam', 'arrival', frameset(float('nan')), 1.0)
+    assert len(tracer.samples('cam', 'arrival')) == 0
+    tracer.reset()
+    assert tracer.summary() == {}
+
+
+def test_summary_in_stage_order() -> None:
+    tracer = ck.LatencyTracer()
+    for stage in ('render', 'custom', 'pose ArucoDetector:0', 'consume', 'publish', 'arrival'):
+        for source in ('cam_b', 'cam_a'):
+            tracer.record(source, stage, frameset(0.0), 1.0)
+    assert list(tracer.summary()) == [
+        (source, stage) for source in ('cam_a', 'cam_b')
+        for stage in ('arrival', 'publish', 'consume', 'pose ArucoDetector:0', 'render', 'custom')]
+
+
+def test_device_clock() -> None:
+    clock = ck.DeviceClock()
+    # Device time starts at 5 s. Transfers take between 10 and 30 ms
+    for i, transfer in enumerate([0.03, 0.01, 0.02]):
+        clock.to_host(5000.0 + 1e3 * i, 1000.0 + i + transfer)
+    # The fastest transfer defines the offset
+    assert clock.to_host(8000.0, 1003.05) == pytest.approx(1003.01)
+    # A restarted device clock doesn't inherit the old offset
+    assert clock.to_host(0.0, 1004.02) == pytest.approx(1004.02)
+
+
+class PoseDetector(ck.DetectorBase):
+    """ Test detector which always finds the identity pose """
+
+    def _find_pose(self) -> tuple[bool, sm.SE3]:
+        return True, sm.SE3()
+
+
+@pytest.fixture
+def synthetic_camera() -> Iterator[ck.CameraBase]:
+    cam = ck.camera_factory.create('synthetic', frame_size=(64, 48), fps=100.0, latency=0.03, seed=0)
+    yield cam
+    cam.end()
+
+
+def test_camera_stages(synthetic_camera: ck.CameraBase) -> None:
+    tracer = synthetic_camera.enable_tracing()
+    seq_id = -1
+    for _ in range(5):
+        seq_id = synthetic_camera.wait_frameset(seq_id, timeout=2.0).seq_id
+    synthetic_camera.disable_tracing()
+    summary = tracer.summary()
+    name = synthetic_camera.name
+    assert list(summary) == [(name, 'arrival'), (name, 'publish'), (name, 'consume')]
+    # The emulated transfer time is part of every stage
+    arrival, publish, consume = summary.values()
+    assert 30.0 <= arrival['p50'] < 100.0
+    assert arrival['p50'] <= publish['p50'] <= consume['p50']
+
+
+def test_detector_pose_stage(tmp_path: Path) -> None:
+    config_file = tmp_path.joinpath('detector.yaml')
+    config_file.write_text("{}\n")
+    camera = ck.CameraFeed('latency_test')
+    camera.is_calibrated = True
+    tracer = camera.enable_tracing()
+    detector = PoseDetector(config_file)
+    detector.register_camera(camera)
+    detector.detector_id = 3
+    exposed_at = time.time() - 0.05
+    detector.estimate_pose(camera.feed(np.zeros((48, 64, 3), dtype=np.uint8), capture_time=exposed_at))
+    samples = tracer.samples('latency_test', 'pose PoseDetector:3')
+    assert len(samples) == 1 and 0.05 <= samples[0] < 1.0
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+# global
+import time
+import pytest
+import cv2 as cv
+import numpy as np
+from pathlib import Path
+
+# local
+import camera_kit as ck
+from camera_kit.pipeline.stages import Packet, SourceStage
+
+# typing
+from typing import Any, Iterator
+
+
+INTRINSIC = np.array([[150.0, 0.0, 79.5], [0.0, 150.0, 59.5], [0.0, 0.0, 1.0]])
+DISTORTION = np.array([-0.3, 0.1, 0.0, 0.0, 0.0])
+# Normalized image coordinates of a bright dot in the test frames
+DOT = np.array([0.3, 0.2])
+
+
+def dot_frame() -> np.ndarray[Any, Any]:
+    """ Frame of the distorted camera with a bright dot """
+    img = np.zeros((120, 160, 3), dtype=np.uint8)
+    px, _ = cv.projectPoints(np.array([[DOT[0], DOT[1], 1.0]]), np.zeros(3), np.zeros(3), INTRINSIC, DISTORTION)
+    center = tuple(int(round(v)) for v in px.ravel())
+    cv.circle(img, center, 2, (255, 255, 255), -1)
+    return img
+
+
+def dot_position(img: np.ndarray[Any, Any]) -> np.ndarray[Any, Any]:
+    """ Intensity weighted centroid of the bright dot [px] """
+    gray = img if img.ndim == 2 else cv.cvtColor(img, cv.COLOR_BGR2GRAY)
+    weights = gray.astype(np.float64)
+    v, u = np.indices(gray.shape)
+    return np.array([np.sum(u * weights), np.sum(v * weights)]) / np.sum(weights)
+
+
+class ListSource(SourceStage):
+    """ Publishes dot frames. An infinite stream if n_frames is negative """
+
+    type_id = "test_source"
+
+    def __init__(self, name: str, base_dir: Path, n_frames: int = 10, fail_at: int = -1, **params: Any) -> None:
+        super().__init__(name, base_dir, **params)
+        self.n_frames = n_frames
+        self.fail_at = fail_at
+        self.camera = ck.CameraFeed('pipeline_test')
+
+    def packets(self) -> Iterator[Packet]:
+        img = dot_frame()
+        seq_id = 0
+        while self.n_frames < 0 or seq_id < self.n_frames:
+            if seq_id == self.fail_at:
+                raise IOError("Source broke down")
+            yield {'seq_id': seq_id, 'image': img, 'camera': self.camera, 'intrinsic': INTRINSIC,
+                   'distortion': DISTORTION}
+            seq_id += 1
+
+
+class CollectSink(ck.Stage):
+    """ Keeps all packets. Optionally slow or failing """
+
+    type_id = "test_sink"
+
+    def __init__(self, name: str, base_dir: Path, delay: float = 0.0, fail_at: int = -1, **params: Any) -> None:
+        super().__init__(name, base_dir, **params)
+        self.delay = delay
+        self.fail_at = fail_at
+        self.packets: list[Packet] = []
+
+    def process(self, packet: Packet) -> Packet | None:
+        if packet['seq_id'] == self.fail_at:
+            raise ValueError("Sink broke down")
+        time.sleep(self.delay)
+        self.packets.append(packet)
+        return None
+
+
+@pytest.fixture(autouse=True)
+def test_stages(monkeypatch: pytest.MonkeyPatch) -> None:
+    for stage_class in (ListSource, CollectSink):
+        monkeypatch.setitem(ck.Pipeline.stage_types, stage_class.type_id, stage_class)
+
+
+def build(*stages: dict[str, Any], **config: Any) -> ck.Pipeline:
+    return ck.Pipeline({'stages': list(stages), **config})
+
+
+def test_packets_reach_all_branches() -> None:
+    pipeline = build({'name': 'src', 'type': 'test_source'},
+                     {'name': 'a', 'type': 'test_sink', 'input': 'src'},
+                     {'name': 'gray', 'type': 'grayscale', 'input': 'src'},
+                     {'name': 'b', 'type': 'test_sink', 'input': 'gray'})
+    pipeline.run(duration=5.0)
+    stages = pipeline.stages
+    assert [p['seq_id'] for p in stages['a'].packets] == list(range(10))
+    assert all(p['image'].ndim == 3 for p in stages['a'].packets)
+    assert all(p['image'].ndim == 2 for p in stages['b'].packets)
+    assert pipeline.stats()['gray'].processed == 10
+
+
+@pytest.mark.parametrize('on_full', ['block', 'drop'])
+def test_queue_policy(on_full: str) -> None:
+    pipeline = build({'name': 'src', 'type': 'test_source', 'n_frames': 20},
+                     {'name': 'sink', 'type': 'test_sink', 'input': 'src', 'delay': 0.02, 'on_full': on_full,
+                      'queue_size': 1})
+    pipeline.run(duration=5.0)
+    stats = pipeline.stats()['sink']
+    n_received = len(pipeline.stages['sink'].packets)
+    assert stats.processed == n_received
+    if on_full == 'block':
+        assert n_received == 20 and stats.dropped == 0
+    else:
+        # The slow sink drops queued packets instead of slowing down the source
+        assert stats.dropped > 0 and n_received + stats.dropped == 20
+        assert pipeline.stages['sink'].packets[-1]['seq_id'] == 19
+
+
+def test_stage_error_stops_pipeline() -> None:
+    pipeline = build({'name': 'src', 'type': 'test_source', 'n_frames': -1},
+                     {'name': 'sink', 'type': 'test_sink', 'input': 'src', 'fail_at': 5})
+    with pytest.raises(RuntimeError, match="'sink'") as exc_info:
+        pipeline.run(duration=5.0)
+    assert isinstance(exc_info.value.__cause__, ValueError)
+    # The endless source stopped as well
+    assert not pipeline._threads_alive()
+
+
+def test_source_error_stops_pipeline() -> None:
+    pipeline = build({'name': 'src', 'type': 'test_source', 'fail_at': 3},
+                     {'name': 'sink', 'type': 'test_sink', 'input': 'src'})
+    with pytest.raises(RuntimeError, match="'src'") as exc_info:
+        pipeline.run(duration=5.0)
+    assert isinstance(exc_info.value.__cause__, IOError)
+    assert len(pipeline.stages['sink'].packets) <= 3
+
+
+def test_resize_scales_intrinsic() -> None:
+    pipeline = build({'name': 'src', 'type': 'test_source', 'n_frames': 1},
+                     {'name': 'small', 'type': 'resize', 'input': 'src', 'scale': 0.5},
+                     {'name': 'sink', 'type': 'test_sink', 'input': 'small'})
+    pipeline.run(duration=5.0)
+    packet = pipeline.stages['sink'].packets[0]
+    assert packet['image'].shape == (60, 80, 3)
+    intrinsic = packet['intrinsic']
+    assert np.allclose(intrinsic[:2, :2], 0.5 * INTRINSIC[:2, :2])
+    # The pixel grid shrinks around the corner of the first pixel
+    assert np.allclose(intrinsic[:2, 2], (INTRINSIC[:2, 2] + 0.5) * 0.5 - 0.5)
+    assert np.array_equal(packet['distortion'], DISTORTION)
+    # The source intrinsic isn't modified
+    assert INTRINSIC[0, 0] == 150.0
+
+
+def test_undistort_updates_coefficients() -> None:
+    pipeline = build({'name': 'src', 'type': 'test_source', 'n_frames': 1},
+                     {'name': 'undistort', 'type': 'undistort', 'input': 'src'},
+                     {'name': 'sink', 'type': 'test_sink', 'input': 'undistort'},
+                     {'name': 'small', 'type': 'resize', 'input': 'undistort', 'scale': 0.5},
+                     {'name': 'small_sink', 'type': 'test_sink', 'input': 'small'})
+    pipeline.run(duration=5.0)
+    for sink in ('sink', 'small_sink'):
+        packet = pipeline.stages[sink].packets[0]
+        assert not np.any(packet['distortion'])
+        # The dot appears where the pinhole model of the output intrinsic projects it
+        expected = (packet['intrinsic'] @ np.array([DOT[0], DOT[1], 1.0]))[:2]
+        assert np.allclose(dot_position(packet['image']), expected, atol=0.5)
+
+
+def test_invalid_graphs() -> None:
+    with pytest.raises(KeyError):
+        build({'name': 'src', 'type': 'unknown'})
+    with pytest.raises(ValueError):
+        build({'name': 'sink', 'type': 'test_sink'})
+    with pytest.raises(ValueError):
+        build({'name': 'src', 'type': 'test_source'}, {'name': 'sink', 'type': 'test_sink', 'input': 'missing'})
+    with pytest.raises(ValueError):
+        build({'name': 'src', 'type': 'test_source'}, {'name': 'src', 'type': 'test_sink', 'input': 'src'})
+    with pytest.raises(ValueError):
+        build({'name': 'src', 'type': 'test_source', 'rate': 5})
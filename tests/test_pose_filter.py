@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+# global
+import pytest
+import numpy as np
+import spatialmath as sm
+
+# local
+import camera_kit as ck
+
+# typing
+from typing import Any
+
+
+VELOCITY = np.array([0.1, -0.05, 0.02])
+ANGULAR_VELOCITY = 0.5
+START = sm.SE3.Trans(0.0, 0.0, 0.5) * sm.SE3.Rx(0.2)
+
+
+def true_pose(t: float) -> sm.SE3:
+    """ Target moving with constant linear velocity and rotating about the camera z-axis """
+    return sm.SE3.Trans(*(VELOCITY * t)) * sm.SE3.Rz(ANGULAR_VELOCITY * t) * START
+
+
+def rotation_error(a: Any, b: Any) -> float:
+    return float(np.linalg.norm(sm.SO3(a.R.T @ b.R, check=False).log(twist=True)))
+
+
+def converged_filter(duration: float = 2.0, rate: float = 30.0) -> ck.PoseFilter:
+    pose_filter = ck.PoseFilter()
+    for t in np.arange(0.0, duration, 1.0 / rate):
+        assert pose_filter.update(true_pose(t), t)
+    return pose_filter
+
+
+def test_filter_predicts_constant_motion() -> None:
+    pose_filter = converged_filter()
+    assert np.allclose(pose_filter.velocity, VELOCITY, atol=1e-3)
+    assert np.allclose(pose_filter.angular_velocity, [0.0, 0.0, ANGULAR_VELOCITY], atol=1e-2)
+    t = pose_filter.timestamp + 0.2
+    pose_filter.predict(t)
+    predicted = sm.SE3(pose_filter.pose_matrix, check=False)
+    assert np.linalg.norm(predicted.t - true_pose(t).t) < 1e-3
+    assert rotation_error(predicted, true_pose(t)) < 5e-3
+
+
+def test_prediction_increases_uncertainty() -> None:
+    pose_filter = converged_filter()
+    position_std, rotation_std = pose_filter.position_std, pose_filter.rotation_std
+    t = pose_filter.timestamp
+    pose_filter.predict(t + 0.5)
+    assert pose_filter.position_std > position_std and pose_filter.rotation_std > rotation_std
+    # Times before the state time don't change the state
+    pose = pose_filter.pose_matrix
+    pose_filter.predict(t)
+    assert np.array_equal(pose_filter.pose_matrix, pose) and pose_filter.timestamp == t + 0.5
+
+
+def test_filter_rejects_outliers() -> None:
+    pose_filter = converged_filter()
+    t = pose_filter.timestamp + 1.0 / 30.0
+    assert not pose_filter.update(sm.SE3.Trans(0.3, 0.0, 0.0) * true_pose(t), t)
+    # The rejected measurement leaves the predicted state
+    assert np.linalg.norm(pose_filter.pose_matrix[:3, 3] - true_pose(t).t) < 1e-3
+    assert pose_filter.update(true_pose(t), t)
+
+
+def feed_camera() -> ck.CameraFeed:
+    camera = ck.CameraFeed('pose_filter_test', frame_size=(640, 480))
+    camera.cc.intrinsic = np.array([[600.0, 0.0, 319.5], [0.0, 600.0, 239.5], [0.0, 0.0, 1.0]])
+    camera.is_calibrated = True
+    return camera
+
+
+@pytest.mark.parametrize('detect_every', [1, 5])
+def test_tracker_detects_every_nth_frame(detect_every: int) -> None:
+    camera = feed_camera()
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    tracker = ck.PoseTracker(detect_every=detect_every, max_position_std=1.0, max_rotation_std=1.0)
+    detected_at: list[float] = []
+    for i in range(60):
+        t = i / 30.0
+        frameset = camera.feed(frame, capture_time=t)
+
+        def detect() -> tuple[bool, sm.SE3]:
+            detected_at.append(t)
+            return True, true_pose(t)
+
+        found, pose = tracker.step(frameset, detect)
+        assert found
+        # Repeated requests of the same frame set don't run the detector again
+        assert tracker.step(frameset, detect)[1] == pose
+        if i > 30:
+            # Predicted poses between detections follow the motion
+            assert np.linalg.norm(pose.t - true_pose(t).t) < 2e-3
+    assert tracker.n_frames == 60
+    assert len(detected_at) == tracker.n_detections == 60 // detect_every
+
+
+def test_tracker_reinitializes_after_jump() -> None:
+    camera = feed_camera()
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    tracker = ck.PoseTracker(detect_every=1, max_misses=2)
+    jump = sm.SE3.Trans(0.2, 0.0, 0.0)
+    for i in range(40):
+        t = i / 30.0
+        pose = true_pose(t) if i < 20 else jump * true_pose(t)
+        found, tracked = tracker.step(camera.feed(frame, capture_time=t), lambda: (True, pose))
+        assert found
+        if 20 <= i < 22:
+            # Measurements after the jump are rejected until the target counts as lost
+            assert np.linalg.norm(tracked.t - pose.t) > 0.1
+    assert np.linalg.norm(tracked.t - pose.t) < 2e-3
+
+
+def test_tracker_loses_target_without_detections() -> None:
+    camera = feed_camera()
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    tracker = ck.PoseTracker(detect_every=1, max_misses=2)
+    tracker.step(camera.feed(frame, capture_time=0.0), lambda: (True, true_pose(0.0)))
+    results = [tracker.step(camera.feed(frame, capture_time=i / 30.0), lambda: (False, sm.SE3()))[0]
+               for i in range(1, 5)]
+    assert results == [True, True, False, False]
+
+
+def test_predicted_roi_contains_target() -> None:
+    camera = feed_camera()
+    tracker = ck.PoseTracker(roi_margin=0.2)
+    target_points = np.array([[0.0, 0.0, 0.0], [0.05, 0.0, 0.0], [0.05, 0.05, 0.0], [0.0, 0.05, 0.0]])
+    assert tracker.predicted_roi(camera, target_points) is None
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    tracker.step(camera.feed(frame, capture_time=0.0), lambda: (True, START))
+    roi = tracker.predicted_roi(camera, target_points)
+    assert roi is not None
+    x, y, w, h = roi
+    pts = camera.cc.project_poses(target_points, START.A)[0]
+    assert np.all(pts >= [x, y]) and np.all(pts <= [x + w, y + h])
+    # The region covers the target with a margin, not the whole image
+    assert w < 0.5 * 640 and h < 0.5 * 480
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+# global
+import pytest
+import numpy as np
+import spatialmath as sm
+from pathlib import Path
+
+# local
+import camera_kit as ck
+from camera_kit.detector.pose_log import HEADER_DTYPE, RECORD_DTYPES, pose_matrices, read_pose_log
+
+
+def random_poses(n_poses: int) -> list[sm.SE3]:
+    rng = np.random.default_rng(0)
+    return [sm.SE3.Trans(*rng.uniform(-1.0, 1.0, 3)) * sm.SE3.RPY(*rng.uniform(-np.pi, np.pi, 3))
+            for _ in range(n_poses)]
+
+
+@pytest.mark.parametrize('pose_format', ['matrix', 'pq'])
+def test_round_trip(tmp_path: Path, pose_format: str) -> None:
+    fp = tmp_path.joinpath('poses.bin')
+    poses = random_poses(10)
+    # A small chunk size hands over several chunks to the writer thread
+    with ck.PoseLogWriter(fp, pose_format, chunk_size=3) as writer:
+        for i, pose in enumerate(poses):
+            writer.log(i, i % 2 == 0, pose, host_timestamp=100.0 + i, hw_timestamp=5.0 * i, detector_id=7,
+                       capture_time=99.0 + i)
+    records = read_pose_log(fp)
+    assert records.dtype == RECORD_DTYPES[pose_format] and len(records) == len(poses)
+    assert np.array_equal(records['seq_id'], np.arange(10))
+    assert np.array_equal(records['found'], np.arange(10) % 2 == 0)
+    assert np.allclose(records['host_timestamp'], 100.0 + np.arange(10))
+    assert np.allclose(records['hw_timestamp'], 5.0 * np.arange(10))
+    assert np.allclose(records['capture_time'], 99.0 + np.arange(10))
+    assert np.all(records['detector_id'] == 7)
+    assert np.allclose(pose_matrices(records), np.stack([p.A for p in poses]))
+
+
+def test_pq_records_store_position_and_quaternion(tmp_path: Path) -> None:
+    fp = tmp_path.joinpath('poses.bin')
+    pose = sm.SE3.Trans(0.1, 0.2, 0.3) * sm.SE3.Rz(np.pi / 2)
+    with ck.PoseLogWriter(fp, 'pq') as writer:
+        writer.log(0, True, pose)
+    pq = read_pose_log(fp)['pose'][0]
+    assert np.allclose(pq[:3], [0.1, 0.2, 0.3])
+    # Quaternion in xyzw order, up to the sign
+    assert np.allclose(np.abs(pq[3:]), [0.0, 0.0, np.sqrt(0.5), np.sqrt(0.5)])
+
+
+def test_partial_record_is_truncated(tmp_path: Path) -> None:
+    fp = tmp_path.joinpath('poses.bin')
+    poses = random_poses(3)
+    with ck.PoseLogWriter(fp) as writer:
+        for i, pose in enumerate(poses[:2]):
+            writer.log(i, True, pose)
+    # Emulate a crash in the middle of a record
+    with fp.open('ab') as f:
+        f.write(b'\x01' * (RECORD_DTYPES['matrix'].itemsize // 2))
+    assert len(read_pose_log(fp)) == 2
+    # Appending drops the partial record first
+    with ck.PoseLogWriter(fp) as writer:
+        writer.log(2, True, poses[2])
+    records = read_pose_log(fp)
+    assert fp.stat().st_size == HEADER_DTYPE.itemsize + 3 * RECORD_DTYPES['matrix'].itemsize
+    assert np.array_equal(records['seq_id'], [0, 1, 2])
+    assert np.allclose(pose_matrices(records), np.stack([p.A for p in poses]))
+
+
+def test_format_mismatch(tmp_path: Path) -> None:
+    fp = tmp_path.joinpath('poses.bin')
+    ck.PoseLogWriter(fp, 'matrix').close()
+    with pytest.raises(ValueError):
+        ck.PoseLogWriter(fp, 'pq')
+    fp.write_bytes(b'no pose log')
+    with pytest.raises(ValueError):
+        read_pose_log(fp)
+
+
+def test_log_after_close_raises(tmp_path: Path) -> None:
+    writer = ck.PoseLogWriter(tmp_path.joinpath('poses.bin'))
+    writer.log(0, True, np.eye(4))
+    writer.close()
+    with pytest.raises(RuntimeError):
+        writer.log(1, True, np.eye(4))
+    # Closing twice is fine
+    writer.close()
+    assert len(read_pose_log(writer.file_path)) == 1
+
+
+def test_log_during_close_raises(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    writer = ck.PoseLogWriter(tmp_path.joinpath('poses.bin'))
+    join = writer._thread.join
+    late_errors = []
+
+    def join_with_late_log() -> None:
+        # A detection thread logs while the writer thread is finishing
+        try:
+            writer.log(1, True, np.eye(4))
+        except RuntimeError as e:
+            late_errors.append(e)
+        join()
+
+    monkeypatch.setattr(writer._thread, 'join', join_with_late_log)
+    writer.log(0, True, np.eye(4))
+    writer.close()
+    assert len(late_errors) == 1
+    assert len(read_pose_log(writer.file_path)) == 1